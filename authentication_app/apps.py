@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class AuthenticationAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'authentication_app'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,18 @@
+"""Async version of the profile endpoint (see backend.async_api)."""
+from rest_framework import status
+from rest_framework.response import Response
+
+from backend.async_api import async_api_view
+
+from .serializers import UserSerializer
+
+
+@async_api_view
+async def get_user(request):
+    user = request.user
+    deferred = user.get_deferred_fields()
+    if deferred:
+        # A TokenUser only carries its token claims; load the rest of the profile.
+        await user.arefresh_from_db(fields=list(deferred))
+    serializer = UserSerializer(user)
+    return Response(serializer.data, status=status.HTTP_200_OK)
@@ -0,0 +1,113 @@
+"""
+Stateless JWT authentication.
+
+Access tokens carry the claims most requests need (see TOKEN_CLAIMS), so the
+authenticated user is rebuilt from the token instead of being loaded from the
+database on every request. Claims are fixed for the token's lifetime, which
+would let a deactivated user keep working until it expires; a short-lived
+per-process cache of each user's active flag and level closes that gap at the
+cost of one small query per user every JWT_USER_CACHE_TTL seconds.
+"""
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from .models import TokenUser, User
+
+TOKEN_CLAIMS = ('username', 'level', 'is_active')
+
+# user id -> (expires_at, {'is_active': ..., 'level': ...})
+_user_state = {}
+_USER_STATE_MAX_ENTRIES = 10000
+
+
+def add_user_claims(token, user):
+    """Copy the claims StatelessJWTAuthentication reads onto a refresh or access token."""
+    for claim in TOKEN_CLAIMS:
+        token[claim] = getattr(user, claim)
+    return token
+
+
+def get_user_state(user_id):
+    """The user's current active flag and level, or None if the user no longer exists."""
+    now = time.monotonic()
+    cached = _user_state.get(user_id)
+    if cached is not None and cached[0] > now:
+        return cached[1]
+
+    state = User.objects.filter(pk=user_id).values('is_active', 'level').first()
+    if len(_user_state) >= _USER_STATE_MAX_ENTRIES:
+        _user_state.clear()
+    _user_state[user_id] = (now + settings.JWT_USER_CACHE_TTL, state)
+    return state
+
+
+async def aget_user_state(user_id):
+    now = time.monotonic()
+    cached = _user_state.get(user_id)
+    if cached is not None and cached[0] > now:
+        return cached[1]
+
+    state = await User.objects.filter(pk=user_id).values('is_active', 'level').afirst()
+    if len(_user_state) >= _USER_STATE_MAX_ENTRIES:
+        _user_state.clear()
+    _user_state[user_id] = (now + settings.JWT_USER_CACHE_TTL, state)
+    return state
+
+
+def forget_user_state(user_id):
+    _user_state.pop(user_id, None)
+
+
+class StatelessJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication that returns a TokenUser built from the token claims.
+    Tokens issued before the claims were added fall back to the regular lookup.
+    """
+
+    def get_user(self, validated_token):
+        if any(claim not in validated_token for claim in TOKEN_CLAIMS):
+            return super().get_user(validated_token)
+        return self.build_user(validated_token, get_user_state(self.get_user_id(validated_token)))
+
+    async def aauthenticate(self, request):
+        """Async counterpart of authenticate() for the async views (backend.async_api)."""
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+        validated_token = self.get_validated_token(raw_token)
+        return await self.aget_user(validated_token), validated_token
+
+    async def aget_user(self, validated_token):
+        if any(claim not in validated_token for claim in TOKEN_CLAIMS):
+            return await sync_to_async(super().get_user)(validated_token)
+        return self.build_user(validated_token, await aget_user_state(self.get_user_id(validated_token)))
+
+    def get_user_id(self, validated_token):
+        try:
+            return validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+    def build_user(self, validated_token, state):
+        if state is None:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+        if api_settings.CHECK_USER_IS_ACTIVE and not state['is_active']:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        values = {
+            api_settings.USER_ID_FIELD: self.get_user_id(validated_token),
+            'username': validated_token['username'],
+            **state,
+        }
+        fields = [field.attname for field in User._meta.concrete_fields if field.attname in values]
+        return TokenUser.from_db(DEFAULT_DB_ALIAS, fields, [values[name] for name in fields])
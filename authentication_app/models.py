@@ -14,3 +14,19 @@ class User(AbstractUser):
 
     def __str__(self):
         return self.username
+
+
+class TokenUser(User):
+    """
+    A User rebuilt from access token claims without a query. Only the claimed
+    fields are loaded; touching any other field loads the rest of the row in
+    one query, so views that need the full profile still get it.
+    """
+    class Meta:
+        proxy = True
+
+    def refresh_from_db(self, using=None, fields=None, **kwargs):
+        deferred = self.get_deferred_fields()
+        if fields is not None and deferred and set(fields) <= deferred:
+            fields = list(deferred)
+        super().refresh_from_db(using, fields, **kwargs)
@@ -1,6 +1,9 @@
 from django.contrib.auth.password_validation import validate_password
 from rest_framework.serializers import ModelSerializer, ValidationError
 from rest_framework import serializers
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+
+from .authentication import add_user_claims
 from .models import User
 
 
@@ -45,4 +48,10 @@ class RegisterSerializer(ModelSerializer):
     def create(self, validated_data):
         # Remove confirm_password from validated_data as it's not needed for user creation
         validated_data.pop('confirm_password')
-        return User.objects.create_user(**validated_data)
\ No newline at end of file
+        return User.objects.create_user(**validated_data)
+
+
+class ClaimsTokenObtainPairSerializer(TokenObtainPairSerializer):
+    @classmethod
+    def get_token(cls, user):
+        return add_user_claims(super().get_token(user), user)
@@ -1,3 +1,115 @@
-from django.test import TestCase
+import json
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.test import RequestFactory, TestCase
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from . import async_views
+from .authentication import add_user_claims, forget_user_state
+from .models import User
+
+
+class AuthenticationQueryTests(TestCase):
+    """Query budgets of the authentication endpoints and of authenticating a JWT request."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user('meera', email='meera@example.com', password='secret-pass-123')
+        forget_user_state(self.user.id)
+
+    def authenticate(self, claims=True):
+        refresh = RefreshToken.for_user(self.user)
+        if claims:
+            add_user_claims(refresh, self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+
+    def test_stateless_authentication(self):
+        self.authenticate()
+        # The user's active flag and level, then the profile fields the token does not carry
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/auth/user')
+        self.assertEqual(response.data['email'], 'meera@example.com')
+        # The active flag is cached, so only the profile is loaded
+        with self.assertNumQueries(1):
+            self.client.get('/api/auth/user')
+
+    def test_token_without_claims_loads_user(self):
+        self.authenticate(claims=False)
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/auth/user')
+        self.assertEqual(response.data['email'], 'meera@example.com')
+
+    def test_deactivated_user_is_rejected(self):
+        self.authenticate()
+        self.assertEqual(self.client.get('/api/auth/user').status_code, 200)
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get('/api/auth/user').status_code, 401)
+
+    def test_user_list(self):
+        self.authenticate()
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/auth/users/')
+        self.assertEqual(len(response.data), 1)
+
+    def test_user_retrieve(self):
+        self.authenticate()
+        with self.assertNumQueries(2):
+            response = self.client.get(f'/api/auth/users/{self.user.id}/')
+        self.assertEqual(response.data['username'], 'meera')
+
+    def test_login(self):
+        with self.assertNumQueries(1):
+            response = self.client.post('/api/auth/login/', {'username': 'meera', 'password': 'secret-pass-123'}, format='json')
+        self.assertEqual(response.status_code, 200)
+
+    def test_register(self):
+        with self.assertNumQueries(2):
+            response = self.client.post('/api/auth/register/', {
+                'username': 'arjun', 'email': 'arjun@example.com', 'password': 'secret-pass-123',
+                'confirm_password': 'secret-pass-123', 'first_name': 'Arjun', 'last_name': 'Rao',
+            }, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+
+    def test_token_obtain_adds_claims(self):
+        response = self.client.post('/api/auth/token/', {'username': 'meera', 'password': 'secret-pass-123'}, format='json')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {response.data["access"]}')
+        forget_user_state(self.user.id)
+        with self.assertNumQueries(2):
+            self.assertEqual(self.client.get('/api/auth/user').status_code, 200)
+
+
+class AsyncGetUserTests(TestCase):
+    """The async profile endpoint (settings.ASYNC_READ_VIEWS) and its token user lookup."""
+
+    def setUp(self):
+        self.user = User.objects.create_user('meera', email='meera@example.com', password='secret-pass-123')
+        forget_user_state(self.user.id)
+
+    def get(self, claims=True):
+        refresh = RefreshToken.for_user(self.user)
+        if claims:
+            add_user_claims(refresh, self.user)
+        request = RequestFactory().get('/api/auth/user', HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+        return async_to_sync(async_views.get_user)(request)
+
+    def test_token_user_loads_the_rest_of_the_profile(self):
+        # The user's active flag and level, then the profile fields the token does not carry
+        with self.assertNumQueries(2):
+            response = self.get()
+        self.assertEqual(response.status_code, 200, response.content)
+        data = json.loads(response.content)
+        self.assertEqual((data['username'], data['email']), ('meera', 'meera@example.com'))
+        with self.assertNumQueries(1):
+            self.assertEqual(json.loads(self.get().content), data)
+
+    def test_token_without_claims_loads_user(self):
+        with self.assertNumQueries(1):
+            response = self.get(claims=False)
+        self.assertEqual(json.loads(response.content)['email'], 'meera@example.com')
+
+    def test_deactivated_user_is_rejected(self):
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.get().status_code, 401)
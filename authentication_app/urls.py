@@ -1,5 +1,8 @@
+from django.conf import settings
 from django.urls import path
 from .views import *
+from . import async_views
+from backend.async_api import with_sync_fallback
 from rest_framework.routers import DefaultRouter
 from django.urls import include
 from rest_framework_simplejwt.views import (
@@ -20,6 +23,6 @@ urlpatterns = [
     path('register/', RegisterView.as_view(), name='register'),
     path('login/', LoginView.as_view(), name='login'),
     path('get_all_users/', get_all_users, name='users'),
-    path('user',get_user),
+    path('user', with_sync_fallback(async_views.get_user, get_user) if 'user' in settings.ASYNC_READ_VIEWS else get_user),
     path('', include(router.urls)),
 ]
@@ -10,6 +10,8 @@ from rest_framework.viewsets import ModelViewSet
 from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework.permissions import IsAuthenticated
 from .models import *
+from .authentication import add_user_claims
+from prajnayana_dashboard.mixins import SparseFieldsetMixin
 
 
 User = get_user_model()
@@ -22,7 +24,7 @@ class RegisterView(APIView):
             user = serializer.save()
             
             # Generate tokens for the new user
-            refresh = RefreshToken.for_user(user)
+            refresh = add_user_claims(RefreshToken.for_user(user), user)
             
             # Serialize the user data for the response
             user_data = UserSerializer(user).data
@@ -50,7 +52,7 @@ class LoginView(APIView):
 
         if user is not None:
             # Generate JWT tokens
-            refresh = RefreshToken.for_user(user)
+            refresh = add_user_claims(RefreshToken.for_user(user), user)
             return Response({
                 'message': 'Login successful',
                 "refresh": str(refresh),
@@ -61,7 +63,7 @@ class LoginView(APIView):
             return Response({"error": "Invalid credentials"}, status=status.HTTP_401_UNAUTHORIZED)
     
 
-class UserViewSet(ModelViewSet):
+class UserViewSet(SparseFieldsetMixin, ModelViewSet):
     serializer_class = UserSerializer
 
 
@@ -0,0 +1,128 @@
+"""
+Plumbing for native async read views.
+
+DRF views are synchronous, so under ASGI each one occupies a worker thread
+for the whole request. The views built with ``async_api_view`` run on the
+event loop instead: they authenticate through the authentication classes'
+``aauthenticate`` where available, query with the async ORM and render the
+same JSON a DRF view would. ``with_sync_fallback`` puts one in front of an
+existing route for GET requests only, and the routes listed in
+settings.ASYNC_READ_VIEWS are switched over that way (see the app urls).
+
+Sync-only middleware such as WhiteNoiseMiddleware still costs a thread hop per
+request; serve static files separately under uvicorn to avoid it.
+"""
+import functools
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import AnonymousUser
+from rest_framework import exceptions
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.views import exception_handler
+
+
+def get_authenticators():
+    return [authenticator() for authenticator in api_settings.DEFAULT_AUTHENTICATION_CLASSES]
+
+
+async def authenticate(request):
+    """Run the default authentication classes against ``request`` and record the result on it."""
+    for authenticator in get_authenticators():
+        if hasattr(authenticator, 'aauthenticate'):
+            result = await authenticator.aauthenticate(request)
+        else:
+            result = await sync_to_async(authenticator.authenticate)(request)
+        if result is not None:
+            request.user, request.auth = result
+            return authenticator
+    request.user, request.auth = AnonymousUser(), None
+    return None
+
+
+def render(response):
+    renderer = api_settings.DEFAULT_RENDERER_CLASSES[0]()
+    response.accepted_renderer = renderer
+    response.accepted_media_type = renderer.media_type
+    response.renderer_context = {}
+    return response.render()
+
+
+def handle_exception(exc, request, args, kwargs):
+    """APIView.handle_exception without the view instance."""
+    if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+        authenticators = get_authenticators()
+        auth_header = authenticators[0].authenticate_header(request) if authenticators else None
+        if auth_header:
+            exc.auth_header = auth_header
+        else:
+            exc.status_code = 403
+
+    response = exception_handler(exc, {'request': request, 'args': args, 'kwargs': kwargs})
+    if response is None:
+        raise exc
+    return response
+
+
+def async_api_view(view, require_authentication=True):
+    """
+    Wrap a coroutine ``view(request, *args, **kwargs)`` that receives a DRF
+    Request and returns a DRF Response, handling errors like APIView does.
+    """
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        request = Request(request, authenticators=())
+        try:
+            authenticator = await authenticate(request)
+            if require_authentication and authenticator is None:
+                raise exceptions.NotAuthenticated()
+            response = await view(request, *args, **kwargs)
+        except exceptions.APIException as exc:
+            response = handle_exception(exc, request, args, kwargs)
+        return render(response)
+
+    wrapper.csrf_exempt = True
+    return wrapper
+
+
+async def render_list(request, viewset_class, basename, get_queryset=None):
+    """
+    The ``list`` action of ``viewset_class`` run natively async: the ViewSet
+    still provides the queryset, eager loading, serializer, paginator and,
+    when it has one, its response cache (keyed by the router ``basename``, so
+    both share cached responses and ETags). ``get_queryset(request)`` is a
+    coroutine replacing the ViewSet's queryset when it returns one.
+    """
+    view = viewset_class(request=request, args=(), kwargs={}, action='list', format_kwarg=None, headers={}, basename=basename)
+    for permission in view.get_permissions():
+        if not permission.has_permission(request, view):
+            raise exceptions.PermissionDenied()
+
+    async def list_response(request):
+        queryset = None if get_queryset is None else await get_queryset(request)
+        queryset = view.filter_queryset(view.get_queryset() if queryset is None else queryset)
+        page = None
+        if view.paginator is not None:
+            page = await view.paginator.apaginate_queryset(queryset, request, view=view)
+        if page is None:
+            page = [row async for row in queryset]
+            return Response(view.get_serializer(page, many=True).data)
+        return view.paginator.get_paginated_response(view.get_serializer(page, many=True).data)
+
+    if hasattr(view, 'acached_response'):
+        return await view.acached_response(list_response, request)
+    return await list_response(request)
+
+
+def with_sync_fallback(async_view, sync_view):
+    """A view serving GET from ``async_view`` and every other method from ``sync_view``."""
+    sync_view = sync_to_async(sync_view)
+
+    async def view(request, *args, **kwargs):
+        if request.method == 'GET':
+            return await async_view(request, *args, **kwargs)
+        return await sync_view(request, *args, **kwargs)
+
+    view.csrf_exempt = True
+    return view
@@ -0,0 +1,101 @@
+"""
+Primary/replica database routing.
+
+When DATABASE_REPLICAS lists replica aliases, reads are spread across them
+and every write goes to the primary (``default``). Reads stay on the primary:
+
+* for the rest of a request, command or thread once it has written, so
+  signal handlers and responses see the rows just saved;
+* inside a transaction on the primary;
+* for DATABASE_PRIMARY_PIN_SECONDS after a client's last write, so a journal
+  entry that was just created is not missing from the next list request
+  while the replicas catch up. Clients are told apart by their credentials
+  (Authorization header or session cookie) and the pin is kept in the cache,
+  which needs to be shared (CACHE_URL) when running more than one worker.
+"""
+import contextvars
+import hashlib
+import random
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# Whether the current request or thread has written to the primary
+_wrote = contextvars.ContextVar('db_router_wrote', default=False)
+# Whether the current request must read from the primary from the start
+_pinned = contextvars.ContextVar('db_router_pinned', default=False)
+
+
+def _pin_key(request):
+    credentials = request.headers.get('Authorization') or request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+    if not credentials:
+        return None
+    return 'db-primary-pin:%s' % hashlib.md5(credentials.encode()).hexdigest()
+
+
+def use_primary():
+    return _wrote.get() or _pinned.get() or connections[DEFAULT_DB_ALIAS].in_atomic_block
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if not settings.DATABASE_REPLICAS or use_primary():
+            return DEFAULT_DB_ALIAS
+        return random.choice(settings.DATABASE_REPLICAS)
+
+    def db_for_write(self, model, **hints):
+        _wrote.set(True)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas receive the schema through replication.
+        return db == DEFAULT_DB_ALIAS
+
+
+class PrimaryPinningMiddleware:
+    """Scopes the router's read-your-writes state to each request."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+
+        key = _pin_key(request) if settings.DATABASE_REPLICAS else None
+        cache = caches[settings.API_CACHE_ALIAS]
+        tokens = _wrote.set(False), _pinned.set(bool(key) and cache.get(key) is not None)
+        try:
+            response = self.get_response(request)
+            if key and _wrote.get():
+                cache.set(key, True, settings.DATABASE_PRIMARY_PIN_SECONDS)
+            return response
+        finally:
+            _wrote.reset(tokens[0])
+            _pinned.reset(tokens[1])
+
+    async def __acall__(self, request):
+        key = _pin_key(request) if settings.DATABASE_REPLICAS else None
+        cache = caches[settings.API_CACHE_ALIAS]
+        tokens = _wrote.set(False), _pinned.set(bool(key) and await cache.aget(key) is not None)
+        try:
+            response = await self.get_response(request)
+            if key and _wrote.get():
+                await cache.aset(key, True, settings.DATABASE_PRIMARY_PIN_SECONDS)
+            return response
+        finally:
+            _wrote.reset(tokens[0])
+            _pinned.reset(tokens[1])
@@ -0,0 +1,154 @@
+"""
+Per-request query budget instrumentation.
+
+QueryBudgetMiddleware counts and times every SQL query a request runs, flags
+statements repeated with different parameters (the signature of an N+1), and
+times rendering the response body. Each request gets a Server-Timing header
+and one JSON log line on the ``backend.requests`` logger, and is recorded in
+the metrics served at /metrics (backend.metrics). Requests over
+QUERY_BUDGET_SLOW_MS or QUERY_BUDGET_MAX_QUERIES are logged as warnings
+together with their slowest queries.
+
+Queries are captured with a database execute wrapper installed on every
+connection, so this works with DEBUG off and adds a clock read per query.
+"""
+import collections
+import contextvars
+import json
+import logging
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from rest_framework.renderers import JSONRenderer
+
+from . import metrics
+
+logger = logging.getLogger('backend.requests')
+
+_stats = contextvars.ContextVar('request_stats', default=None)
+
+
+class RequestStats:
+    def __init__(self):
+        self.queries = []
+        self.render_time = 0.0
+
+    @property
+    def db_time(self):
+        return sum(duration for _, duration in self.queries)
+
+    def duplicates(self):
+        """(sql, count) of statements run more than once, most repeated first."""
+        counts = collections.Counter(sql for sql, _ in self.queries)
+        return [(sql, count) for sql, count in counts.most_common() if count > 1]
+
+    def slowest(self, limit):
+        return sorted(self.queries, key=lambda query: query[1], reverse=True)[:limit]
+
+
+def record_query(execute, sql, params, many, context):
+    stats = _stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.queries.append((sql, time.perf_counter() - start))
+
+
+def install_query_recorder(connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+class TimedJSONRenderer(JSONRenderer):
+    """JSONRenderer that reports the time spent serializing the response body."""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        start = time.perf_counter()
+        try:
+            return super().render(data, accepted_media_type, renderer_context)
+        finally:
+            stats = _stats.get()
+            if stats is not None:
+                stats.render_time += time.perf_counter() - start
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 2)
+
+
+class QueryBudgetMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        # Connections opened from now on, in any thread; those already open
+        # in a request's thread are covered in start().
+        connection_created.connect(install_query_recorder, dispatch_uid='backend.instrumentation')
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        stats, token, start = self.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            _stats.reset(token)
+            metrics.request_finished()
+        return self.finish(request, response, stats, time.perf_counter() - start)
+
+    async def __acall__(self, request):
+        stats, token, start = self.start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _stats.reset(token)
+            metrics.request_finished()
+        return self.finish(request, response, stats, time.perf_counter() - start)
+
+    def start(self):
+        for connection in connections.all(initialized_only=True):
+            install_query_recorder(connection)
+        metrics.request_started()
+        stats = RequestStats()
+        return stats, _stats.set(stats), time.perf_counter()
+
+    def finish(self, request, response, stats, duration):
+        metrics.observe_request(request, response.status_code, duration, len(stats.queries))
+        duplicates = stats.duplicates()
+        response['Server-Timing'] = ', '.join([
+            f'db;dur={_ms(stats.db_time)};desc="{len(stats.queries)} queries"',
+            f'render;dur={_ms(stats.render_time)}',
+            f'total;dur={_ms(duration)}',
+        ])
+
+        record = {
+            'method': request.method,
+            'route': metrics.route_label(request),
+            'path': request.path,
+            'status': response.status_code,
+            'duration_ms': _ms(duration),
+            'queries': len(stats.queries),
+            'db_ms': _ms(stats.db_time),
+            'duplicate_queries': sum(count - 1 for _, count in duplicates),
+            'render_ms': _ms(stats.render_time),
+            'response_bytes': None if response.streaming else len(response.content),
+        }
+
+        if duration * 1000 >= settings.QUERY_BUDGET_SLOW_MS or len(stats.queries) > settings.QUERY_BUDGET_MAX_QUERIES:
+            limit = settings.QUERY_BUDGET_WORST_QUERIES
+            record['slowest_queries'] = [{'sql': sql, 'ms': _ms(duration)} for sql, duration in stats.slowest(limit)]
+            record['repeated_queries'] = [{'sql': sql, 'count': count} for sql, count in duplicates[:limit]]
+            logger.warning(json.dumps(record))
+        else:
+            logger.info(json.dumps(record))
+        return response
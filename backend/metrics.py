@@ -0,0 +1,250 @@
+"""
+Prometheus metrics, exported as text at /metrics.
+
+Each process keeps its metrics in memory and, when METRICS_DIR is set, writes
+them to ``<METRICS_DIR>/<pid>.json`` at most every METRICS_FLUSH_SECONDS.
+/metrics sums the files of every worker, so whichever process answers the
+scrape reports the whole deployment. Counters and histograms of workers that
+have exited are kept, as Prometheus expects counters never to go backwards;
+process gauges are only reported for live workers. Point METRICS_DIR at an
+empty directory that is cleared when the deployment (not a worker) restarts.
+
+Request metrics are recorded by backend.instrumentation.QueryBudgetMiddleware
+and labelled with the URL pattern that matched, never the raw path. Per
+worker (gunicorn worker process, labelled by pid) it also reports requests
+served and in flight, and the number of live and busy workers, for sizing
+the worker pool.
+
+/metrics needs METRICS_TOKEN as a bearer token. Without one it is only
+served while DEBUG is on.
+"""
+import json
+import os
+import re
+import resource
+import threading
+import time
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+METRICS = {
+    'http_requests_total': ('counter', 'Requests served, by route, method and status.'),
+    'http_request_errors_total': ('counter', 'Requests answered with a 5xx status, by route and method.'),
+    'http_request_duration_seconds': ('histogram', 'Request latency in seconds, by route and method.'),
+    'http_request_db_queries': ('histogram', 'SQL queries run per request, by route and method.'),
+    'api_response_cache_requests_total': ('counter', 'Cached API responses looked up, by view and result.'),
+}
+
+_lock = threading.Lock()
+_counters = {}
+_histograms = {}
+_worker = {'requests': 0, 'in_flight': 0}
+_last_flush = 0.0
+_PROCESS_START = time.time()
+
+
+def _key(name, labels):
+    return json.dumps([name, sorted(labels.items())])
+
+
+def inc(name, labels, amount=1):
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + amount
+
+
+def observe(name, labels, value, buckets):
+    key = _key(name, labels)
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = {'buckets': list(buckets), 'counts': [0] * len(buckets), 'sum': 0, 'count': 0}
+        for index, bound in enumerate(histogram['buckets']):
+            if value <= bound:
+                histogram['counts'][index] += 1
+        histogram['sum'] += value
+        histogram['count'] += 1
+
+
+def request_started():
+    with _lock:
+        _worker['in_flight'] += 1
+
+
+def request_finished():
+    with _lock:
+        _worker['in_flight'] -= 1
+        _worker['requests'] += 1
+
+
+def route_label(request):
+    """The URL pattern a request matched, e.g. ``api/journal/{pk}/``."""
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unmatched'
+    route = re.sub(r'\(\?P<(\w+)>[^)]*\)', r'{\1}', match.route)
+    return route.replace('^', '').replace('$', '').replace('\\', '')
+
+
+def observe_request(request, status, duration, queries):
+    labels = {'route': route_label(request), 'method': request.method}
+    inc('http_requests_total', {**labels, 'status': str(status)})
+    if status >= 500:
+        inc('http_request_errors_total', labels)
+    observe('http_request_duration_seconds', labels, duration, LATENCY_BUCKETS)
+    observe('http_request_db_queries', labels, queries, QUERY_COUNT_BUCKETS)
+    flush()
+
+
+def process_stats():
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    stats = {
+        'process_cpu_seconds_total': usage.ru_utime + usage.ru_stime,
+        'process_start_time_seconds': _PROCESS_START,
+        'process_resident_memory_bytes': usage.ru_maxrss * 1024,
+    }
+    try:
+        with open('/proc/self/statm') as statm:
+            stats['process_resident_memory_bytes'] = int(statm.read().split()[1]) * resource.getpagesize()
+        stats['process_open_fds'] = len(os.listdir('/proc/self/fd'))
+    except OSError:
+        pass
+    return stats
+
+
+def _snapshot():
+    with _lock:
+        return {
+            'pid': os.getpid(),
+            'counters': dict(_counters),
+            'histograms': {key: dict(value, counts=list(value['counts'])) for key, value in _histograms.items()},
+            'process': process_stats(),
+            'worker': dict(_worker),
+        }
+
+
+def flush(force=False):
+    global _last_flush
+    directory = settings.METRICS_DIR
+    now = time.monotonic()
+    if not directory or (not force and now - _last_flush < settings.METRICS_FLUSH_SECONDS):
+        return
+    _last_flush = now
+    path = os.path.join(directory, f'{os.getpid()}.json')
+    with open(path + '.tmp', 'w') as file:
+        json.dump(_snapshot(), file)
+    os.replace(path + '.tmp', path)
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def collect():
+    """Snapshots of every worker process, this one always current."""
+    if not settings.METRICS_DIR:
+        return [_snapshot()]
+
+    flush(force=True)
+    snapshots = []
+    for name in os.listdir(settings.METRICS_DIR):
+        if not name.endswith('.json'):
+            continue
+        try:
+            with open(os.path.join(settings.METRICS_DIR, name)) as file:
+                snapshots.append(json.load(file))
+        except (OSError, ValueError):
+            continue
+    return snapshots
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    return '{%s}' % ','.join('%s="%s"' % (name, str(value).replace('\\', '\\\\').replace('"', '\\"')) for name, value in labels)
+
+
+def render(snapshots):
+    counters, histograms = {}, {}
+    for snapshot in snapshots:
+        for key, value in snapshot['counters'].items():
+            counters[key] = counters.get(key, 0) + value
+        for key, value in snapshot['histograms'].items():
+            total = histograms.setdefault(key, {'buckets': value['buckets'], 'counts': [0] * len(value['counts']), 'sum': 0, 'count': 0})
+            total['counts'] = [a + b for a, b in zip(total['counts'], value['counts'])]
+            total['sum'] += value['sum']
+            total['count'] += value['count']
+
+    series = {}
+    for key, value in counters.items():
+        name, labels = json.loads(key)
+        series.setdefault(name, []).append(f'{name}{_labels(labels)} {value}')
+    for key, value in histograms.items():
+        name, labels = json.loads(key)
+        lines = series.setdefault(name, [])
+        for bound, count in zip(value['buckets'], value['counts']):
+            lines.append(f'{name}_bucket{_labels(labels + [["le", bound]])} {count}')
+        lines.append(f'{name}_bucket{_labels(labels + [["le", "+Inf"]])} {value["count"]}')
+        lines.append(f'{name}_sum{_labels(labels)} {value["sum"]}')
+        lines.append(f'{name}_count{_labels(labels)} {value["count"]}')
+
+    output = []
+    for name, (kind, help_text) in METRICS.items():
+        output += [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}'] + sorted(series.get(name, []))
+
+    cache = {}
+    for key, value in counters.items():
+        name, labels = json.loads(key)
+        if name == 'api_response_cache_requests_total':
+            cache[dict(labels)['result']] = cache.get(dict(labels)['result'], 0) + value
+    lookups = sum(cache.values())
+    output += [
+        '# HELP api_response_cache_hit_ratio Share of cached API response lookups served from the cache.',
+        '# TYPE api_response_cache_hit_ratio gauge',
+        f'api_response_cache_hit_ratio {(lookups - cache.get("miss", 0)) / lookups if lookups else 0}',
+    ]
+
+    live = [snapshot for snapshot in snapshots if _alive(snapshot['pid'])]
+    for name, kind in (
+        ('process_cpu_seconds_total', 'counter'),
+        ('process_resident_memory_bytes', 'gauge'),
+        ('process_open_fds', 'gauge'),
+        ('process_start_time_seconds', 'gauge'),
+    ):
+        output.append(f'# TYPE {name} {kind}')
+        output += [f'{name}{{pid="{snapshot["pid"]}"}} {snapshot["process"][name]}' for snapshot in live if name in snapshot['process']]
+    for name, field, kind, help_text in (
+        ('worker_requests_total', 'requests', 'counter', 'Requests served by each worker process.'),
+        ('worker_in_flight_requests', 'in_flight', 'gauge', 'Requests each worker process is serving.'),
+    ):
+        output += [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}']
+        output += [f'{name}{{pid="{snapshot["pid"]}"}} {snapshot["worker"][field]}' for snapshot in live if 'worker' in snapshot]
+    busy = sum(1 for snapshot in live if snapshot.get('worker', {}).get('in_flight'))
+    output.append(f'# TYPE worker_processes gauge\nworker_processes {len(live)}')
+    output.append(f'# TYPE worker_busy_processes gauge\nworker_busy_processes {busy}')
+    return '\n'.join(output) + '\n'
+
+
+def metrics_view(request):
+    if settings.METRICS_TOKEN:
+        authorization = request.headers.get('Authorization', '')
+        if not authorization:
+            response = HttpResponse(status=401)
+            response['WWW-Authenticate'] = 'Bearer'
+            return response
+        if not constant_time_compare(authorization, f'Bearer {settings.METRICS_TOKEN}'):
+            return HttpResponseForbidden()
+    elif not settings.DEBUG:
+        return HttpResponseForbidden('Set METRICS_TOKEN to serve /metrics.')
+    return HttpResponse(render(collect()), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
 import os
+import sys
 import dj_database_url
 from pathlib import Path
 from datetime import timedelta
@@ -53,6 +54,8 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
+    'backend.instrumentation.QueryBudgetMiddleware',
+    'backend.db_router.PrimaryPinningMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',  # Add whitenoise middleware
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -102,6 +105,55 @@ if 'DATABASE_URL' in os.environ:
         conn_health_checks=True,
     )
 
+# Optional read replicas: a comma-separated list of database URLs. Reads are
+# spread across them and writes go to the primary (backend.db_router); a
+# client's reads stay on the primary for DATABASE_PRIMARY_PIN_SECONDS after it
+# writes, which should cover the replication lag.
+DATABASE_REPLICAS = []
+for index, url in enumerate(filter(None, os.environ.get('DATABASE_REPLICA_URLS', '').split(',')), start=1):
+    alias = f'replica_{index}'
+    DATABASES[alias] = dj_database_url.parse(url.strip(), conn_max_age=600, conn_health_checks=True)
+    DATABASES[alias]['TEST'] = {'MIRROR': 'default'}
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['backend.db_router.PrimaryReplicaRouter']
+DATABASE_PRIMARY_PIN_SECONDS = int(os.environ.get('DATABASE_PRIMARY_PIN_SECONDS', 5))
+
+
+# Cache
+# Local memory by default, which is only correct for a single process. Set
+# CACHE_URL to redis://host:port/db (needs the redis package) or
+# file:///absolute/path when running more than one worker process, so response
+# cache invalidations, ETags and primary pins are shared by all of them;
+# `manage.py check --deploy` warns while it is unset.
+CACHE_URL = os.environ.get('CACHE_URL', '')
+
+if CACHE_URL.startswith(('redis://', 'rediss://')):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': CACHE_URL,
+        }
+    }
+elif CACHE_URL.startswith('file://'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': CACHE_URL[len('file://'):],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'prajnayana',
+        }
+    }
+
+# Cache alias and lifetime (seconds) for cached API responses (prajnayana_dashboard.response_cache)
+API_CACHE_ALIAS = 'default'
+API_CACHE_TIMEOUT = int(os.environ.get('API_CACHE_TIMEOUT', 300))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -124,10 +176,50 @@ AUTH_PASSWORD_VALIDATORS = [
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'authentication_app.authentication.StatelessJWTAuthentication',
+    ),
+    'DEFAULT_RENDERER_CLASSES': (
+        'backend.instrumentation.TimedJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
     ),
 }
 
+# Per-request query budget (backend.instrumentation). Requests slower than
+# QUERY_BUDGET_SLOW_MS or running more than QUERY_BUDGET_MAX_QUERIES queries
+# are logged as warnings with their QUERY_BUDGET_WORST_QUERIES slowest and
+# most repeated statements.
+QUERY_BUDGET_SLOW_MS = int(os.environ.get('QUERY_BUDGET_SLOW_MS', 500))
+QUERY_BUDGET_MAX_QUERIES = int(os.environ.get('QUERY_BUDGET_MAX_QUERIES', 25))
+QUERY_BUDGET_WORST_QUERIES = 5
+
+# Prometheus metrics at /metrics (backend.metrics). With several worker
+# processes set METRICS_DIR to a directory they all share. The scraper sends
+# METRICS_TOKEN as a bearer token; without one /metrics is only served with
+# DEBUG on, never publicly in production.
+METRICS_DIR = os.environ.get('METRICS_DIR', '')
+METRICS_FLUSH_SECONDS = float(os.environ.get('METRICS_FLUSH_SECONDS', 1))
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+# Read endpoints served by native async views (backend.async_api) when running
+# under ASGI, as a comma-separated subset of: journal, habit_tracking, articles, user
+ASYNC_READ_VIEWS = [name for name in os.environ.get('ASYNC_READ_VIEWS', '').split(',') if name]
+
+# Default page size for the cursor paginators in prajnayana_dashboard.pagination
+API_PAGE_SIZE = int(os.environ.get('API_PAGE_SIZE', 20))
+API_MAX_PAGE_SIZE = int(os.environ.get('API_MAX_PAGE_SIZE', 100))
+
+# Maximum number of changes returned by one delta sync pull (prajnayana_dashboard.sync)
+SYNC_PAGE_SIZE = int(os.environ.get('SYNC_PAGE_SIZE', 500))
+
+# Seconds a sync change has to be old before a pull's token moves past it. Ids
+# are allocated before commit, so a change can become visible after one with
+# a higher id; this must exceed the longest transaction that writes changes.
+SYNC_SETTLE_SECONDS = int(os.environ.get('SYNC_SETTLE_SECONDS', 10))
+
+# Maximum number of ranked matches returned by full-text search (prajnayana_dashboard.search);
+# paginated search results say `"truncated": true` when more rows matched
+SEARCH_RESULTS_LIMIT = int(os.environ.get('SEARCH_RESULTS_LIMIT', 200))
+
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(minutes=300),
     "REFRESH_TOKEN_LIFETIME": timedelta(days=7),
@@ -135,8 +227,13 @@ SIMPLE_JWT = {
     "ALGORITHM": "HS256",
     "SIGNING_KEY": SECRET_KEY,
     "AUTH_HEADER_TYPES": ("Bearer",),
+    "TOKEN_OBTAIN_SERIALIZER": "authentication_app.serializers.ClaimsTokenObtainPairSerializer",
 }
 
+# How long, in seconds, each process trusts a user's cached active flag and
+# level before re-reading them (authentication_app.authentication)
+JWT_USER_CACHE_TTL = int(os.environ.get('JWT_USER_CACHE_TTL', 60))
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/4.2/topics/i18n/
@@ -186,4 +283,31 @@ if not DEBUG:
             'handlers': ['console'],
             'level': 'WARNING',
         },
-    }
\ No newline at end of file
+        'loggers': {
+            # One line per request from backend.instrumentation
+            'backend.requests': {
+                'handlers': ['console'],
+                'level': 'INFO',
+                'propagate': False,
+            },
+        },
+    }
+
+# Keep the per-request log lines out of test output; tests of them use
+# assertLogs, which attaches its own handler.
+if sys.argv[1:2] == ['test']:
+    LOGGING = {
+        'version': 1,
+        'disable_existing_loggers': False,
+        'handlers': {
+            'null': {
+                'class': 'logging.NullHandler',
+            },
+        },
+        'loggers': {
+            'backend.requests': {
+                'handlers': ['null'],
+                'propagate': False,
+            },
+        },
+    }
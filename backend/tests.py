@@ -0,0 +1,177 @@
+import json
+import os
+import tempfile
+import time
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from rest_framework.test import APIClient
+
+from authentication_app.models import User
+
+from . import metrics
+from .db_router import PrimaryPinningMiddleware, PrimaryReplicaRouter
+
+
+@override_settings(DATABASE_REPLICAS=['replica_1'], DATABASE_PRIMARY_PIN_SECONDS=1)
+class PrimaryReplicaRoutingTests(TransactionTestCase):
+    """
+    Where PrimaryReplicaRouter sends reads and writes, with and without
+    PrimaryPinningMiddleware. A TransactionTestCase, as TestCase's wrapping
+    transaction would keep every read on the primary.
+    """
+
+    def setUp(self):
+        self.router = PrimaryReplicaRouter()
+        caches[settings.API_CACHE_ALIAS].clear()
+
+    def request(self, view, token='client-a'):
+        """Run ``view(router)`` as a request through the middleware, returning what it returned."""
+        result = {}
+
+        def get_response(request):
+            result['value'] = view(self.router)
+            return HttpResponse()
+
+        PrimaryPinningMiddleware(get_response)(RequestFactory().get('/', HTTP_AUTHORIZATION=f'Bearer {token}'))
+        return result['value']
+
+    def read(self, router):
+        return router.db_for_read(User)
+
+    def write_then_read(self, router):
+        return router.db_for_write(User), router.db_for_read(User)
+
+    def test_reads_go_to_replica_and_writes_to_primary(self):
+        self.assertEqual(self.request(self.read), 'replica_1')
+        self.assertEqual(self.request(lambda router: router.db_for_write(User)), DEFAULT_DB_ALIAS)
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_without_replicas_everything_uses_primary(self):
+        self.assertEqual(self.request(self.read), DEFAULT_DB_ALIAS)
+
+    def test_reads_after_a_write_stay_on_primary(self):
+        self.assertEqual(self.request(self.write_then_read), (DEFAULT_DB_ALIAS, DEFAULT_DB_ALIAS))
+
+    def test_reads_inside_atomic_stay_on_primary(self):
+        def read_in_transaction(router):
+            with transaction.atomic():
+                return router.db_for_read(User)
+
+        self.assertEqual(self.request(read_in_transaction), DEFAULT_DB_ALIAS)
+
+    def test_pin_follows_the_client_and_expires(self):
+        self.request(self.write_then_read)
+        # The client's next request still reads from the primary...
+        self.assertEqual(self.request(self.read), DEFAULT_DB_ALIAS)
+        # ...other clients do not...
+        self.assertEqual(self.request(self.read, token='client-b'), 'replica_1')
+        # ...and the pin lapses after DATABASE_PRIMARY_PIN_SECONDS
+        time.sleep(1.1)
+        self.assertEqual(self.request(self.read), 'replica_1')
+
+    def test_async_requests_are_pinned_too(self):
+        def middleware(view):
+            async def get_response(request):
+                view(self.router)
+                return HttpResponse()
+            return PrimaryPinningMiddleware(get_response)
+
+        request = RequestFactory().get('/', HTTP_AUTHORIZATION='Bearer client-a')
+        async_to_sync(middleware(self.write_then_read))(request)
+        reads = []
+        async_to_sync(middleware(lambda router: reads.append(router.db_for_read(User))))(request)
+        self.assertEqual(reads, [DEFAULT_DB_ALIAS])
+
+
+@override_settings(METRICS_DIR='', METRICS_TOKEN='scrape-token')
+class MetricsTests(SimpleTestCase):
+    """The /metrics exposition and who may read it."""
+
+    def scrape(self, **headers):
+        return self.client.get('/metrics', **headers)
+
+    def test_token_is_required(self):
+        response = self.scrape()
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response['WWW-Authenticate'], 'Bearer')
+        self.assertEqual(self.scrape(HTTP_AUTHORIZATION='Bearer wrong').status_code, 403)
+        self.assertEqual(self.scrape(HTTP_AUTHORIZATION='Bearer scrape-token').status_code, 200)
+
+    @override_settings(METRICS_TOKEN='')
+    def test_without_a_token_only_served_in_debug(self):
+        self.assertEqual(self.scrape().status_code, 403)
+        with override_settings(DEBUG=True):
+            self.assertEqual(self.scrape().status_code, 200)
+
+    def test_requests_are_labelled_by_route(self):
+        self.client.get('/api/journal/12345/')
+        body = self.scrape(HTTP_AUTHORIZATION='Bearer scrape-token').content.decode()
+        self.assertIn('# TYPE http_requests_total counter', body)
+        self.assertIn('http_requests_total{method="GET",route="api/journal/{pk}/",status="401"}', body)
+        self.assertIn('http_request_duration_seconds_bucket{method="GET",route="api/journal/{pk}/",le="+Inf"}', body)
+        self.assertIn('http_request_db_queries_count{method="GET",route="api/journal/{pk}/"}', body)
+        self.assertNotIn('12345', body)
+        self.assertIn(f'worker_requests_total{{pid="{os.getpid()}"}}', body)
+        # The scrape itself is in flight while it renders
+        self.assertIn(f'worker_in_flight_requests{{pid="{os.getpid()}"}} 1', body)
+        self.assertIn('worker_busy_processes 1', body)
+
+    def test_workers_are_summed_from_metrics_dir(self):
+        metrics.inc('api_response_cache_requests_total', {'view': 'summed', 'result': 'hit'})
+        exited = dict(metrics._snapshot(), pid=2 ** 22 + 1)
+        with tempfile.TemporaryDirectory() as directory, override_settings(METRICS_DIR=directory):
+            with open(os.path.join(directory, f'{exited["pid"]}.json'), 'w') as file:
+                json.dump(exited, file)
+            body = metrics.render(metrics.collect())
+        # Counted once by this process and once by the exited worker's file...
+        self.assertIn('api_response_cache_requests_total{result="hit",view="summed"} 2', body)
+        # ...but only live workers report process and worker gauges
+        self.assertIn('worker_processes 1', body)
+        self.assertNotIn(f'pid="{exited["pid"]}"', body)
+
+
+class QueryBudgetMiddlewareTests(TestCase):
+    """The Server-Timing header and log line QueryBudgetMiddleware adds to each request."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user(username='timed', email='timed@example.com', password='pw'))
+
+    def test_server_timing_header(self):
+        response = self.client.get('/api/journal/')
+        self.assertEqual(response.status_code, 200)
+        db, render, total = response['Server-Timing'].split(', ')
+        self.assertRegex(db, r'^db;dur=[\d.]+;desc="\d+ queries"$')
+        self.assertRegex(render, r'^render;dur=[\d.]+$')
+        self.assertRegex(total, r'^total;dur=[\d.]+$')
+
+    def test_requests_within_budget_log_at_info(self):
+        with self.assertLogs('backend.requests', 'INFO') as logs:
+            self.client.get('/api/journal/')
+        [record] = logs.records
+        self.assertEqual(record.levelname, 'INFO')
+        line = json.loads(record.getMessage())
+        self.assertEqual((line['method'], line['route'], line['path'], line['status']), ('GET', 'api/journal/', '/api/journal/', 200))
+        self.assertGreater(line['queries'], 0)
+        self.assertNotIn('slowest_queries', line)
+
+    @override_settings(QUERY_BUDGET_MAX_QUERIES=0, QUERY_BUDGET_WORST_QUERIES=2)
+    def test_requests_over_the_query_budget_log_a_warning(self):
+        with self.assertLogs('backend.requests', 'INFO') as logs:
+            self.client.get('/api/journal/')
+        [record] = logs.records
+        self.assertEqual(record.levelname, 'WARNING')
+        line = json.loads(record.getMessage())
+        self.assertEqual(len(line['slowest_queries']), min(line['queries'], 2))
+        self.assertIn('repeated_queries', line)
+
+    @override_settings(QUERY_BUDGET_SLOW_MS=0)
+    def test_slow_requests_log_a_warning(self):
+        with self.assertLogs('backend.requests', 'WARNING') as logs:
+            self.client.get('/api/journal/')
+        self.assertIn('slowest_queries', json.loads(logs.records[0].getMessage()))
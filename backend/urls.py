@@ -4,6 +4,8 @@ from django.urls import path
 from django.urls.conf import include
 from django.contrib.auth import views as auth_views
 
+from backend.metrics import metrics_view
+
 
 from django.urls import path, re_path
 from rest_framework import permissions
@@ -29,6 +31,7 @@ schema_view = get_schema_view(
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('metrics', metrics_view, name='metrics'),
     path("swagger/", schema_view.with_ui("swagger", cache_timeout=0), name="swagger-ui"),
     path("redoc/", schema_view.with_ui("redoc", cache_timeout=0), name="redoc"),
     re_path(r"^swagger(?P<format>\.json|\.yaml)$", schema_view.without_ui(cache_timeout=0), name="schema-json"),
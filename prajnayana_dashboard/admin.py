@@ -22,6 +22,14 @@ class HabitsAdmin(admin.ModelAdmin):
 class HabitTrackingAdmin(admin.ModelAdmin):
     pass
 
+@admin.register(HabitStats)
+class HabitStatsAdmin(admin.ModelAdmin):
+    pass
+
+@admin.register(HabitCalendar)
+class HabitCalendarAdmin(admin.ModelAdmin):
+    pass
+
 
 @admin.register(KnowledgeHub)
 class KnowledgeHubAdmin(admin.ModelAdmin):
@@ -31,10 +39,26 @@ class KnowledgeHubAdmin(admin.ModelAdmin):
 class ArticleAdmin(admin.ModelAdmin):
     pass
 
+@admin.register(Tag)
+class TagAdmin(admin.ModelAdmin):
+    pass
+
+@admin.register(SeenArticle)
+class SeenArticleAdmin(admin.ModelAdmin):
+    pass
+
 @admin.register(JournalEntry)
 class JournalEntryAdmin(admin.ModelAdmin):
     pass
 
+@admin.register(MoodDay)
+class MoodDayAdmin(admin.ModelAdmin):
+    pass
+
 @admin.register(VisionBoard)
 class VisionBoardAdmin(admin.ModelAdmin):
-    pass
\ No newline at end of file
+    pass
+
+@admin.register(SyncChange)
+class SyncChangeAdmin(admin.ModelAdmin):
+    pass
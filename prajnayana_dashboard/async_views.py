@@ -0,0 +1,48 @@
+"""
+Async versions of the busiest read endpoints (see backend.async_api). Each
+renders exactly what the matching ViewSet's list action would, through the
+same response cache and with the same ETags.
+"""
+from asgiref.sync import sync_to_async
+
+from backend.async_api import async_api_view, render_list
+
+from . import search
+from .models import Article
+from .views import ArticleViewSet, HabitTrackingViewSet, JournalEntryViewSet, filter_articles
+
+
+@async_api_view
+async def journal_list(request):
+    return await render_list(request, JournalEntryViewSet, 'journal')
+
+
+@async_api_view
+async def habit_tracking_list(request):
+    return await render_list(request, HabitTrackingViewSet, 'habit_tracking')
+
+
+def _search_articles(request, search_query):
+    articles = search.search(Article.objects.all(), search_query, ['title', 'summary', 'content', 'tags'])
+    return filter_articles(articles, request)
+
+
+async def _article_queryset(request):
+    search_query = request.GET.get('search', '')
+    if search_query:
+        # The index lookup is raw SQL, which has no async API.
+        return await sync_to_async(_search_articles)(request, search_query)
+    return None
+
+
+@async_api_view
+async def article_list(request):
+    return await render_list(request, ArticleViewSet, 'article', _article_queryset)
+
+
+# Name in settings.ASYNC_READ_VIEWS -> (route, async view, ViewSet whose list route it replaces)
+ASYNC_LIST_VIEWS = {
+    'journal': ('journal/', journal_list, JournalEntryViewSet),
+    'habit_tracking': ('habit_tracking/', habit_tracking_list, HabitTrackingViewSet),
+    'articles': ('articles/', article_list, ArticleViewSet),
+}
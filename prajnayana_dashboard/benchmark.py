@@ -0,0 +1,146 @@
+"""
+In-process API benchmark, run by the benchmark_api command.
+
+A dataset from scale_data is seeded into a throwaway test database and every
+endpoint in ENDPOINTS is requested through the Django test client with a real
+JWT, so authentication, middleware, rendering and the response cache all take
+part. Results are plain JSON so runs from different commits can be compared
+with compare().
+"""
+import collections
+import datetime
+import json
+import math
+import re
+import statistics
+import time
+
+from django.test import Client
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from authentication_app.authentication import add_user_claims
+from authentication_app.models import User
+
+from . import scale_data
+from .models import Article, Habits
+
+ARTICLES = 300
+
+# name -> (method, path, body); paths and bodies are formatted with the user's seeded ids
+ENDPOINTS = {
+    'auth_user': ('GET', '/api/auth/user', None),
+    'dashboard': ('GET', '/api/dashboard/', None),
+    'journal_list': ('GET', '/api/journal/', None),
+    'journal_by_date': ('GET', '/api/journal/?search={yesterday}', None),
+    'journal_search': ('GET', '/api/journal/?search=calm', None),
+    'journal_mood_counts': ('GET', '/api/journal/moods/?search=calm', None),
+    'journal_mood_trends': ('GET', '/api/journal/mood-trends/?granularity=day&date_from={year_ago}', None),
+    'journal_create': ('POST', '/api/journal/', {'content': 'Benchmark entry', 'mood': 'Happy'}),
+    'habits_list': ('GET', '/api/habits/', None),
+    'habit_tracking_list': ('GET', '/api/habit_tracking/', None),
+    'habit_tracking_stats': ('GET', '/api/habit_tracking/stats/', None),
+    'habit_tracking_heatmap': ('GET', '/api/habit_tracking/heatmap/', None),
+    'habit_tracking_bulk': ('POST', '/api/habit_tracking/bulk/', 'check_ins'),
+    'vision_board_list': ('GET', '/api/vision-board/', None),
+    'test_sessions_list': ('GET', '/api/test_sessions/', None),
+    'user_responses_list': ('GET', '/api/user_responses/', None),
+    'knowledge_hub_list': ('GET', '/api/knowledge-hub/', None),
+    'articles_list': ('GET', '/api/articles/', None),
+    'articles_search': ('GET', '/api/articles/?search=breath', None),
+    'articles_by_tag': ('GET', '/api/articles/?tag=mindfulness', None),
+    'article_tags': ('GET', '/api/articles/tags/', None),
+    'article_feed': ('GET', '/api/articles/feed/', None),
+    'article_detail': ('GET', '/api/articles/{article}/', None),
+    'sync_pull': ('GET', '/api/sync/', None),
+}
+
+
+def seed(rng, users, days):
+    """Generate ``users`` users with ``days`` days of history each (see scale_data). Returns one context dict per user."""
+    scale_data.generate(users, seed=rng.getrandbits(32), prefix='bench', history_days=(days, days), articles=ARTICLES)
+    yesterday = timezone.localdate() - datetime.timedelta(days=1)
+    year_ago = timezone.localdate() - datetime.timedelta(days=364)
+    articles = list(Article.objects.values_list('id', flat=True))
+    habits = collections.defaultdict(list)
+    for user_id, habit_id in Habits.objects.filter(user__username__startswith='bench').values_list('user_id', 'id'):
+        habits[user_id].append(habit_id)
+
+    return [
+        {
+            'user': user,
+            'format': {'yesterday': yesterday, 'year_ago': year_ago, 'article': rng.choice(articles)},
+            'check_ins': {'check_ins': [{'habit_id': habit_id, 'is_done': True} for habit_id in habits[user.id]]},
+        }
+        for user in User.objects.filter(username__startswith='bench').order_by('id')
+    ]
+
+
+def _percentile(sorted_values, percent):
+    """Nearest-rank percentile of an already sorted list."""
+    return sorted_values[max(0, math.ceil(percent / 100 * len(sorted_values)) - 1)]
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 3)
+
+
+def summarize(durations, queries, errors):
+    durations = sorted(durations)
+    return {
+        'requests': len(durations),
+        'errors': errors,
+        'p50_ms': _ms(_percentile(durations, 50)),
+        'p95_ms': _ms(_percentile(durations, 95)),
+        'p99_ms': _ms(_percentile(durations, 99)),
+        'mean_ms': _ms(statistics.mean(durations)),
+        'max_ms': _ms(durations[-1]),
+        'throughput_rps': round(len(durations) / sum(durations), 1),
+        'queries_per_request': round(statistics.mean(queries), 2),
+    }
+
+
+def run(contexts, endpoints, requests, warmup, rng):
+    """Request each endpoint ``warmup + requests`` times, rotating through the seeded users."""
+    client = Client()
+    tokens = {
+        context['user'].id: str(add_user_claims(RefreshToken.for_user(context['user']), context['user']).access_token)
+        for context in contexts
+    }
+
+    results = {}
+    for name in endpoints:
+        method, path, body = ENDPOINTS[name]
+        durations, queries, errors = [], [], 0
+        for iteration in range(warmup + requests):
+            context = rng.choice(contexts)
+            data = context[body] if isinstance(body, str) else body
+            start = time.perf_counter()
+            response = client.generic(
+                method, path.format(**context['format']),
+                data=None if data is None else json.dumps(data), content_type='application/json',
+                HTTP_AUTHORIZATION=f'Bearer {tokens[context["user"].id]}',
+            )
+            duration = time.perf_counter() - start
+            if iteration < warmup:
+                continue
+            durations.append(duration)
+            # Counted by backend.instrumentation.QueryBudgetMiddleware
+            match = re.search(r'desc="(\d+) queries"', response.get('Server-Timing', ''))
+            queries.append(int(match.group(1)) if match else 0)
+            errors += response.status_code >= 400
+        results[name] = summarize(durations, queries, errors)
+    return results
+
+
+def compare(baseline, current):
+    """Rows of (endpoint, metric, baseline, current, change %) for the endpoints both runs measured."""
+    rows = []
+    for name, result in current['endpoints'].items():
+        before = baseline['endpoints'].get(name)
+        if before is None:
+            continue
+        for metric in ('p50_ms', 'p95_ms', 'p99_ms', 'throughput_rps', 'queries_per_request'):
+            change = (result[metric] - before[metric]) / before[metric] * 100 if before[metric] else 0.0
+            rows.append((name, metric, before[metric], result[metric], round(change, 1)))
+    return rows
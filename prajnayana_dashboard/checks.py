@@ -0,0 +1,25 @@
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+
+# Cache backends whose entries only the process that wrote them can see
+PROCESS_LOCAL_CACHES = {
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+}
+
+
+@register(Tags.caches, deploy=True)
+def check_shared_api_cache(app_configs, **kwargs):
+    """
+    Response cache versions (response_cache) and primary pins (backend.db_router)
+    have to be seen by every worker: with a per-process cache one worker keeps
+    serving responses another worker's writes invalidated.
+    """
+    backend = settings.CACHES.get(settings.API_CACHE_ALIAS, {}).get('BACKEND')
+    if backend not in PROCESS_LOCAL_CACHES:
+        return []
+    return [Warning(
+        f"The API cache ({settings.API_CACHE_ALIAS!r}) uses {backend}, which is not shared between processes.",
+        hint="Set CACHE_URL to a redis:// or file:// cache unless the site runs as a single process.",
+        id='prajnayana_dashboard.W001',
+    )]
@@ -0,0 +1,111 @@
+"""
+The level-aware article feed.
+
+ArticleRank holds every article's score for readers of each level in LEVELS,
+so a feed page is one indexed range scan of the reader's level instead of
+scoring the catalog per request. Scores are the article's date_added as a day
+number plus bonuses for matching the reader, which makes a match worth that
+many days of recency and keeps scores fixed as time passes: only a change to
+an article's level, hub or date, or to its hub's level, re-ranks it.
+Articles in the reader's SeenArticle set are left out of the feed.
+"""
+import itertools
+
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef
+
+from .models import Article, ArticleRank, SeenArticle
+
+LEVELS = (1, 2, 3)
+
+# Days of recency an article's level is worth, by its distance from the reader's level
+LEVEL_BONUS_DAYS = {0: 180, 1: 60}
+
+# Days of recency for an article in a knowledge hub meant for the reader's level
+CATEGORY_BONUS_DAYS = 30
+
+
+def reader_level(user):
+    """The ranking level for ``user``: their level, clamped to LEVELS."""
+    return min(max(user.level or LEVELS[0], LEVELS[0]), LEVELS[-1])
+
+
+def score(level, article_level, hub_level, date_added):
+    bonus = LEVEL_BONUS_DAYS.get(abs(article_level - level), 0)
+    if hub_level == level:
+        bonus += CATEGORY_BONUS_DAYS
+    return date_added.toordinal() + bonus
+
+
+def _ranks(rows):
+    for article_id, article_level, hub_id, hub_level, date_added in rows:
+        for level in LEVELS:
+            yield ArticleRank(
+                level=level, article_id=article_id, knowledgehub_id=hub_id,
+                score=score(level, article_level, hub_level, date_added),
+            )
+
+
+def _rows(articles):
+    return articles.values_list('id', 'level', 'knowledgehub_id', 'knowledgehub__level', 'date_added')
+
+
+def refresh(article_ids, batch_size=1000):
+    """Recompute the ranks of ``article_ids`` in place."""
+    article_ids = list(article_ids)
+    if not article_ids:
+        return
+    ArticleRank.objects.bulk_create(
+        _ranks(_rows(Article.objects.filter(id__in=article_ids))), batch_size=batch_size,
+        update_conflicts=True, unique_fields=['level', 'article'], update_fields=['knowledgehub', 'score'],
+    )
+
+
+def sync_article(article):
+    """Re-rank ``article`` when a field its score depends on changed since it was loaded or last ranked."""
+    state = article.ranked_state()
+    if getattr(article, '_ranked', None) == state:
+        return
+    article._ranked = state
+    refresh([article.id])
+
+
+def sync_knowledgehub(hub, created=False):
+    """Re-rank the articles of ``hub`` when its level changed."""
+    previous = getattr(hub, '_ranked_level', None)
+    hub._ranked_level = hub.level
+    if not created and previous != hub.level:
+        refresh(Article.objects.filter(knowledgehub=hub).values_list('id', flat=True))
+
+
+def feed(user, knowledgehub_id=None):
+    """
+    The articles ranked for ``user``, best first, as an Article queryset
+    annotated with their ``feed_score`` and ``feed_article`` (the rank's copy
+    of the id, so paging by both walks the rank index without a sort); only
+    ``knowledgehub_id``'s articles when given.
+    """
+    ranks = {'ranks__level': reader_level(user)}
+    if knowledgehub_id is not None:
+        ranks['ranks__knowledgehub'] = knowledgehub_id
+    seen = SeenArticle.objects.filter(user=user, article=OuterRef('pk'))
+    # One filter() call, so the score is read from the same ArticleRank join
+    return Article.objects.filter(~Exists(seen), **ranks).annotate(
+        feed_score=F('ranks__score'), feed_article=F('ranks__article'),
+    )
+
+
+def mark_seen(user, article_ids):
+    SeenArticle.objects.bulk_create(
+        [SeenArticle(user=user, article_id=article_id) for article_id in article_ids], ignore_conflicts=True,
+    )
+
+
+def rebuild(batch_size=1000):
+    """Recreate every article's ranks. Returns the number of articles ranked."""
+    with transaction.atomic():
+        ArticleRank.objects.all().delete()
+        ranks = _ranks(_rows(Article.objects.order_by('id')).iterator(chunk_size=batch_size))
+        while batch := list(itertools.islice(ranks, batch_size)):
+            ArticleRank.objects.bulk_create(batch)
+    return Article.objects.count()
@@ -0,0 +1,109 @@
+"""
+Year-long completion bitmaps behind the habit heatmap.
+
+A HabitCalendar row stores a habit's done days for one year in 46 bytes, so
+a year of a habit is one primary-key lookup instead of up to 366 tracking rows.
+"""
+import datetime
+
+from django.db import transaction
+
+from .models import HabitCalendar, HabitTracking
+
+YEAR_BYTES = (366 + 7) // 8
+
+
+def _day_index(date):
+    return date.timetuple().tm_yday - 1
+
+
+def decode(days, year):
+    """Dates set in a year bitmap, in order."""
+    bits = int.from_bytes(bytes(days or b''), 'little')
+    start = datetime.date(year, 1, 1)
+    dates = []
+    while bits:
+        low = bits & -bits
+        dates.append(start + datetime.timedelta(days=low.bit_length() - 1))
+        bits ^= low
+    return dates
+
+
+def set_day(user_id, habit_id, date, done):
+    with transaction.atomic():
+        if done:
+            calendar, _ = HabitCalendar.objects.select_for_update().get_or_create(
+                user_id=user_id, habit_id=habit_id, year=date.year
+            )
+        else:
+            calendar = HabitCalendar.objects.select_for_update().filter(
+                user_id=user_id, habit_id=habit_id, year=date.year
+            ).first()
+            if calendar is None:
+                return
+
+        _set_day(calendar, date, done)
+        # update() rather than save() so a calendar that is being cascade-deleted
+        # together with its habit or user is never recreated.
+        HabitCalendar.objects.filter(pk=calendar.pk).update(days=calendar.days)
+
+
+def _set_day(calendar, date, done):
+    bits = int.from_bytes(bytes(calendar.days or b''), 'little')
+    bit = 1 << _day_index(date)
+    bits = bits | bit if done else bits & ~bit
+    calendar.days = bits.to_bytes(YEAR_BYTES, 'little')
+
+
+def apply_days(user_id, changes):
+    """Batch form of set_day for one user's (habit_id, date, is_done) changes."""
+    if not changes:
+        return
+
+    with transaction.atomic():
+        calendars = {
+            (calendar.habit_id, calendar.year): calendar
+            for calendar in HabitCalendar.objects.select_for_update().filter(
+                user_id=user_id,
+                habit_id__in={habit_id for habit_id, _, _ in changes},
+                year__in={date.year for _, date, _ in changes},
+            )
+        }
+        for habit_id, date, is_done in changes:
+            key = (habit_id, date.year)
+            if key not in calendars:
+                calendars[key] = HabitCalendar(user_id=user_id, habit_id=habit_id, year=date.year)
+            _set_day(calendars[key], date, is_done)
+
+        HabitCalendar.objects.bulk_update([calendar for calendar in calendars.values() if calendar.pk], ['days'])
+        HabitCalendar.objects.bulk_create([calendar for calendar in calendars.values() if not calendar.pk])
+
+
+def rebuild(user_ids=None, batch_size=1000):
+    """Recreate every HabitCalendar row from HabitTracking in a single ordered pass."""
+    rows = HabitTracking.objects.filter(is_done=True, user__isnull=False)
+    calendars = HabitCalendar.objects.all()
+    if user_ids:
+        rows = rows.filter(user_id__in=user_ids)
+        calendars = calendars.filter(user_id__in=user_ids)
+    rows = rows.order_by('user_id', 'habit_id', 'date').values_list('user_id', 'habit_id', 'date').distinct()
+
+    created = 0
+    with transaction.atomic():
+        calendars.delete()
+        batch, key, bits = [], None, 0
+        for user_id, habit_id, date in rows.iterator(chunk_size=batch_size):
+            if (user_id, habit_id, date.year) != key:
+                if key is not None:
+                    batch.append(HabitCalendar(user_id=key[0], habit_id=key[1], year=key[2], days=bits.to_bytes(YEAR_BYTES, 'little')))
+                key, bits = (user_id, habit_id, date.year), 0
+            bits |= 1 << _day_index(date)
+            if len(batch) >= batch_size:
+                HabitCalendar.objects.bulk_create(batch)
+                created += len(batch)
+                batch = []
+        if key is not None:
+            batch.append(HabitCalendar(user_id=key[0], habit_id=key[1], year=key[2], days=bits.to_bytes(YEAR_BYTES, 'little')))
+        HabitCalendar.objects.bulk_create(batch)
+        created += len(batch)
+    return created
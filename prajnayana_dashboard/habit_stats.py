@@ -0,0 +1,230 @@
+"""
+Incremental maintenance of HabitStats.
+
+Marking a day done after the latest done day, the everyday case, updates the
+summary in place. Anything that can shorten a run or join two runs (undoing
+a day, back-filling an older one) recomputes that single habit's summary
+from its tracking history instead.
+"""
+from django.db import transaction
+
+from . import habit_calendar
+from .models import HabitStats, HabitTracking
+
+# Days covered by HabitStats.recent_days, enough for a 365-day rate ending today
+# while the anchor is still yesterday.
+WINDOW_DAYS = 366
+WINDOW_BYTES = (WINDOW_DAYS + 7) // 8
+WINDOW_MASK = (1 << WINDOW_DAYS) - 1
+
+
+def _bits(stats):
+    return int.from_bytes(bytes(stats.recent_days or b''), 'little')
+
+
+def _set_bits(stats, bits):
+    stats.recent_days = (bits & WINDOW_MASK).to_bytes(WINDOW_BYTES, 'little')
+
+
+def compute(dates):
+    """Summary fields for a sorted list of distinct done dates."""
+    longest = run = 0
+    previous = None
+    for date in dates:
+        run = run + 1 if previous is not None and (date - previous).days == 1 else 1
+        longest = max(longest, run)
+        previous = date
+
+    bits = 0
+    for date in dates:
+        offset = (previous - date).days
+        if offset < WINDOW_DAYS:
+            bits |= 1 << offset
+
+    return {
+        'total_done': len(dates),
+        'first_done': dates[0] if dates else None,
+        'current_streak': run,
+        'current_streak_end': previous,
+        'longest_streak': longest,
+        'recent_days': bits.to_bytes(WINDOW_BYTES, 'little'),
+        'recent_anchor': previous,
+    }
+
+
+def _done_dates(user_id, habit_id):
+    return list(
+        HabitTracking.objects.filter(user_id=user_id, habit_id=habit_id, is_done=True)
+        .order_by('date').values_list('date', flat=True).distinct()
+    )
+
+
+def _day_done_count(user_id, habit_id, date):
+    return HabitTracking.objects.filter(user_id=user_id, habit_id=habit_id, date=date, is_done=True).count()
+
+
+def recompute(user_id, habit_id):
+    # update() rather than save() so a summary that is being cascade-deleted
+    # together with its habit or user is never recreated.
+    HabitStats.objects.filter(user_id=user_id, habit_id=habit_id).update(**compute(_done_dates(user_id, habit_id)))
+
+
+def _advance(stats, date):
+    """
+    Record ``date`` as done on an in-memory summary. Returns False, leaving
+    ``stats`` untouched, when the day is not after the latest done day and the
+    summary has to be recomputed instead.
+    """
+    end = stats.current_streak_end
+    if end is not None and date <= end:
+        return False
+
+    stats.current_streak = stats.current_streak + 1 if end is not None and (date - end).days == 1 else 1
+    stats.current_streak_end = date
+    stats.longest_streak = max(stats.longest_streak, stats.current_streak)
+    stats.total_done += 1
+    stats.first_done = stats.first_done or date
+
+    bits = _bits(stats)
+    if stats.recent_anchor is not None:
+        bits <<= (date - stats.recent_anchor).days
+    _set_bits(stats, bits | 1)
+    stats.recent_anchor = date
+    return True
+
+
+def mark_done(user_id, habit_id, date):
+    with transaction.atomic():
+        stats, _ = HabitStats.objects.select_for_update().get_or_create(user_id=user_id, habit_id=habit_id)
+        if not _advance(stats, date):
+            return recompute(user_id, habit_id)
+        stats.save()
+
+
+def mark_undone(user_id, habit_id, date):
+    with transaction.atomic():
+        if HabitStats.objects.select_for_update().filter(user_id=user_id, habit_id=habit_id).exists():
+            recompute(user_id, habit_id)
+
+
+def record_change(previous, current):
+    """
+    Apply a HabitTracking change to the derived habit summaries (HabitStats
+    and HabitCalendar) given the row's (user_id, habit_id, date, is_done)
+    state before and after; either side is None for creates and deletes.
+    """
+    was_done = previous is not None and previous[3] and previous[0] is not None
+    is_done = current is not None and current[3] and current[0] is not None
+    same_day = previous is not None and current is not None and previous[:3] == current[:3]
+
+    # A day counts once however many done rows it has, so only the first row
+    # to mark it and the last row to unmark it change the summaries.
+    if was_done and not (is_done and same_day) and _day_done_count(*previous[:3]) == 0:
+        mark_undone(*previous[:3])
+        habit_calendar.set_day(*previous[:3], done=False)
+    if is_done and not (was_done and same_day) and _day_done_count(*current[:3]) == 1:
+        mark_done(*current[:3])
+        habit_calendar.set_day(*current[:3], done=True)
+
+
+def apply_days(user_id, changes):
+    """
+    Batch form of mark_done/mark_undone for one user. ``changes`` holds
+    (habit_id, date, is_done) for days whose state flipped; the affected
+    summaries are read, updated and written back with a fixed number of queries.
+    """
+    if not changes:
+        return
+    habit_ids = {habit_id for habit_id, _, _ in changes}
+
+    with transaction.atomic():
+        summaries = {
+            stats.habit_id: stats
+            for stats in HabitStats.objects.select_for_update().filter(user_id=user_id, habit_id__in=habit_ids)
+        }
+        for habit_id in habit_ids - set(summaries):
+            summaries[habit_id] = HabitStats(user_id=user_id, habit_id=habit_id)
+
+        stale = set()
+        for habit_id, date, is_done in sorted(changes, key=lambda change: change[1]):
+            if habit_id not in stale and not (is_done and _advance(summaries[habit_id], date)):
+                stale.add(habit_id)
+
+        if stale:
+            dates = {habit_id: [] for habit_id in stale}
+            rows = (
+                HabitTracking.objects.filter(user_id=user_id, habit_id__in=stale, is_done=True)
+                .order_by('habit_id', 'date').values_list('habit_id', 'date').distinct()
+            )
+            for habit_id, date in rows:
+                dates[habit_id].append(date)
+            for habit_id in stale:
+                for field, value in compute(dates[habit_id]).items():
+                    setattr(summaries[habit_id], field, value)
+
+        fields = list(compute([]))
+        HabitStats.objects.bulk_update([stats for stats in summaries.values() if stats.pk], fields)
+        HabitStats.objects.bulk_create([stats for stats in summaries.values() if not stats.pk])
+
+
+def current_streak(stats, today):
+    """The stored streak only counts while its last day is today or yesterday."""
+    end = stats.current_streak_end
+    if end is None or (today - end).days > 1:
+        return 0
+    return stats.current_streak
+
+
+def completion_rate(stats, days, today):
+    """Share of the last ``days`` days (ending ``today``) marked done, since the first done day."""
+    if stats.first_done is None or stats.recent_anchor is None:
+        return 0.0
+
+    bits = _bits(stats)
+    shift = (stats.recent_anchor - today).days
+    bits = bits >> shift if shift >= 0 else bits << -shift
+    done = bin(bits & ((1 << days) - 1)).count('1')
+    tracked_days = min(days, max((today - stats.first_done).days + 1, 1))
+    return round(done / tracked_days, 4)
+
+
+def rebuild(user_ids=None, batch_size=1000):
+    """Recreate every HabitStats row from HabitTracking in a single ordered pass."""
+    rows = HabitTracking.objects.filter(is_done=True, user__isnull=False)
+    summaries = HabitStats.objects.all()
+    if user_ids:
+        rows = rows.filter(user_id__in=user_ids)
+        summaries = summaries.filter(user_id__in=user_ids)
+    rows = rows.order_by('user_id', 'habit_id', 'date').values_list('user_id', 'habit_id', 'date').distinct()
+
+    created = 0
+    with transaction.atomic():
+        summaries.delete()
+        batch, key, dates = [], None, []
+        for user_id, habit_id, date in rows.iterator(chunk_size=batch_size):
+            if (user_id, habit_id) != key:
+                if key is not None:
+                    batch.append(HabitStats(user_id=key[0], habit_id=key[1], **compute(dates)))
+                key, dates = (user_id, habit_id), []
+            dates.append(date)
+            if len(batch) >= batch_size:
+                HabitStats.objects.bulk_create(batch)
+                created += len(batch)
+                batch = []
+        if key is not None:
+            batch.append(HabitStats(user_id=key[0], habit_id=key[1], **compute(dates)))
+        HabitStats.objects.bulk_create(batch)
+        created += len(batch)
+    return created
+
+
+def summarize(stats, today):
+    return {
+        'current_streak': current_streak(stats, today),
+        'longest_streak': stats.longest_streak,
+        'total_done': stats.total_done,
+        'last_done': stats.current_streak_end,
+        'completion_rate_7': completion_rate(stats, 7, today),
+        'completion_rate_30': completion_rate(stats, 30, today),
+        'completion_rate_365': completion_rate(stats, 365, today),
+    }
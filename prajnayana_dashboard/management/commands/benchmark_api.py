@@ -0,0 +1,96 @@
+import datetime
+import json
+import logging
+import random
+import subprocess
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+
+from prajnayana_dashboard import benchmark
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True, cwd=settings.BASE_DIR
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = 'Seeds a throwaway test database and reports per-endpoint API latency, throughput and query counts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=20, help='Users to seed')
+        parser.add_argument('--days', type=int, default=180, help='Days of history to seed per user')
+        parser.add_argument('--requests', type=int, default=200, help='Measured requests per endpoint')
+        parser.add_argument('--warmup', type=int, default=20, help='Unmeasured requests per endpoint')
+        parser.add_argument('--endpoint', action='append', dest='endpoints', choices=sorted(benchmark.ENDPOINTS),
+                            help='Only benchmark this endpoint')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed for the dataset and request order')
+        parser.add_argument('--output', help='Write the results as JSON to this file')
+        parser.add_argument('--compare', help='Compare against the JSON results of an earlier run')
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options['compare']:
+            try:
+                with open(options['compare']) as file:
+                    baseline = json.load(file)
+            except (OSError, ValueError) as exc:
+                raise CommandError(f'Cannot read {options["compare"]}: {exc}')
+
+        rng = random.Random(options['seed'])
+        endpoints = options['endpoints'] or list(benchmark.ENDPOINTS)
+        # The per-request JSON log lines would swamp the report
+        logging.getLogger('backend.requests').disabled = True
+
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            # The throwaway database has no replicas, and the run gets private
+            # caches so a shared CACHE_URL (and the site's cached responses) is
+            # never read, bumped or cleared.
+            private_caches = {
+                alias: {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': f'benchmark-{alias}'}
+                for alias in settings.CACHES
+            }
+            with override_settings(DATABASE_REPLICAS=[], CACHES=private_caches):
+                caches[settings.API_CACHE_ALIAS].clear()
+                self.stdout.write(f'Seeding {options["users"]} users with {options["days"]} days of history...')
+                contexts = benchmark.seed(rng, options['users'], options['days'])
+                endpoint_results = benchmark.run(contexts, endpoints, options['requests'], options['warmup'], rng)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        results = {
+            'commit': git_commit(),
+            'created': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+            'database': connection.vendor,
+            'options': {name: options[name] for name in ('users', 'days', 'requests', 'warmup', 'seed')},
+            'endpoints': endpoint_results,
+        }
+
+        self.stdout.write(f'{"endpoint":<24}{"p50 ms":>9}{"p95 ms":>9}{"p99 ms":>9}{"mean ms":>9}{"req/s":>9}{"queries":>9}{"errors":>8}')
+        for name, result in endpoint_results.items():
+            self.stdout.write(
+                f'{name:<24}{result["p50_ms"]:>9.2f}{result["p95_ms"]:>9.2f}{result["p99_ms"]:>9.2f}'
+                f'{result["mean_ms"]:>9.2f}{result["throughput_rps"]:>9.1f}{result["queries_per_request"]:>9.1f}{result["errors"]:>8}'
+            )
+
+        if baseline is not None:
+            self.stdout.write(f'\nCompared with {baseline.get("commit") or options["compare"]}:')
+            for name, metric, before, after, change in benchmark.compare(baseline, results):
+                style = self.style.SUCCESS if (change < 0) != (metric == 'throughput_rps') else self.style.WARNING
+                self.stdout.write(style(f'{name:<24}{metric:<22}{before:>10}{after:>10}{change:>+9.1f}%'))
+
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                json.dump(results, file, indent=2)
+            self.stdout.write(self.style.SUCCESS(f'Results written to {options["output"]}'))
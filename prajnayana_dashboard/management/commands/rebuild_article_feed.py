@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from prajnayana_dashboard import feed
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the per-level article rankings behind /api/articles/feed/'
+
+    def handle(self, *args, **options):
+        ranked = feed.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Ranked {ranked} articles for levels {", ".join(map(str, feed.LEVELS))}'))
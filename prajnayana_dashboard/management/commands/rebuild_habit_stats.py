@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from prajnayana_dashboard import habit_calendar, habit_stats
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the habit streak summaries and calendar bitmaps from habit tracking history'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', dest='user_ids', help='Only rebuild for this user id')
+
+    def handle(self, *args, **options):
+        created = habit_stats.rebuild(options['user_ids'])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {created} habit summaries'))
+        created = habit_calendar.rebuild(options['user_ids'])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {created} habit calendars'))
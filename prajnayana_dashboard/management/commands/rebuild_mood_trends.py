@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from prajnayana_dashboard import mood_trends
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the per-day journal mood counts behind /api/journal/mood-trends/'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', dest='user_ids', help='Only rebuild for this user id')
+
+    def handle(self, *args, **options):
+        created = mood_trends.rebuild(options['user_ids'])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {created} mood days'))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from prajnayana_dashboard import search
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the full-text search index for articles, knowledge hub entries and journal entries'
+
+    def handle(self, *args, **options):
+        if not search.is_supported():
+            self.stdout.write(self.style.WARNING('Full-text search is not supported on this database'))
+            return
+
+        with transaction.atomic():
+            for model in search.SEARCH_FIELDS:
+                search.rebuild_index(model)
+                self.stdout.write(self.style.SUCCESS(f'Rebuilt search index for {model.__name__}'))
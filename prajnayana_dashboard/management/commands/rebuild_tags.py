@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from prajnayana_dashboard import tags
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the normalized article tags and their facet counts from the article tag strings'
+
+    def handle(self, *args, **options):
+        created = tags.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {created} tags'))
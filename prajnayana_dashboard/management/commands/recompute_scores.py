@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from prajnayana_dashboard import response_cache
+from prajnayana_dashboard.models import TestSession
+
+
+class Command(BaseCommand):
+    help = 'Recomputes test session scores from their responses in a single SQL statement'
+
+    def add_arguments(self, parser):
+        parser.add_argument('session_ids', nargs='*', type=int, help='Only repair these test sessions')
+
+    def handle(self, *args, **options):
+        sessions = TestSession.objects.all()
+        if options['session_ids']:
+            sessions = sessions.filter(pk__in=options['session_ids'])
+
+        updated = sessions.update(score=TestSession.score_subquery())
+        # update() sends no signals; the shared version is part of every user's cache keys
+        response_cache.bump_version(TestSession)
+        self.stdout.write(self.style.SUCCESS(f'Recomputed scores for {updated} test sessions'))
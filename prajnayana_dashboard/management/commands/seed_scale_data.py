@@ -0,0 +1,64 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from authentication_app.models import User
+from prajnayana_dashboard import scale_data
+
+
+class Command(BaseCommand):
+    help = 'Generates a deterministic synthetic dataset of users, their history and an article catalog for scale testing'
+
+    def add_arguments(self, parser):
+        defaults = scale_data.DISTRIBUTIONS
+        parser.add_argument('users', type=int, help='Users to generate')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed; the same seed generates the same data')
+        parser.add_argument('--prefix', default='scale', help='Username prefix of the generated users')
+        parser.add_argument('--batch-size', type=int, default=2000, help='Rows per bulk insert')
+        parser.add_argument('--users-per-chunk', type=int, default=100, help='Users generated per transaction')
+        parser.add_argument('--years', type=float, default=defaults['history_days'][1] / 365,
+                            help='Longest history per user; each user gets between 30 days and this')
+        parser.add_argument('--habits', type=int, nargs=2, metavar=('MIN', 'MAX'), default=defaults['habits'],
+                            help='Habits per user')
+        parser.add_argument('--adherence', type=float, nargs=2, metavar=('ALPHA', 'BETA'), default=defaults['adherence'],
+                            help='Beta distribution of the chance, per habit, that a check-in is done')
+        parser.add_argument('--tracked-rate', type=float, default=defaults['tracked_rate'],
+                            help='Chance a user checks in on a given day')
+        parser.add_argument('--journal-rate', type=float, default=defaults['journal_rate'],
+                            help='Chance of a journal entry on a given day')
+        parser.add_argument('--test-interval', type=float, default=defaults['test_interval'],
+                            help='Mean days between test sessions')
+        parser.add_argument('--vision-items', type=int, nargs=2, metavar=('MIN', 'MAX'), default=defaults['vision_items'],
+                            help='Vision board items per user')
+        parser.add_argument('--articles', type=int, default=defaults['articles'], help='Articles to add to the catalog')
+
+    def handle(self, *args, **options):
+        if User.objects.filter(username__startswith=options['prefix']).exists():
+            raise CommandError(f'Users named {options["prefix"]}* already exist; pick another --prefix')
+
+        history_days = round(options['years'] * 365)
+        distributions = {
+            'history_days': (min(30, history_days), history_days),
+            'habits': tuple(options['habits']),
+            'adherence': tuple(options['adherence']),
+            'tracked_rate': options['tracked_rate'],
+            'journal_rate': options['journal_rate'],
+            'test_interval': options['test_interval'],
+            'vision_items': tuple(options['vision_items']),
+            'articles': options['articles'],
+        }
+
+        start = time.monotonic()
+
+        def progress(counts):
+            self.stdout.write(f'{counts["users"]}/{options["users"]} users, {sum(counts.values())} rows, {time.monotonic() - start:.0f}s')
+
+        counts = scale_data.generate(
+            options['users'], seed=options['seed'], prefix=options['prefix'], batch_size=options['batch_size'],
+            users_per_chunk=options['users_per_chunk'], progress=progress, **distributions,
+        )
+        elapsed = time.monotonic() - start
+        for name, count in counts.items():
+            self.stdout.write(f'{name:<16}{count:>12}')
+        total = sum(counts.values())
+        self.stdout.write(self.style.SUCCESS(f'Created {total} rows in {elapsed:.1f}s ({total / elapsed:.0f} rows/s)'))
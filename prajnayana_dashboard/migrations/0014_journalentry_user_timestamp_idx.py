@@ -0,0 +1,17 @@
+# Generated by Django 4.2.17 on 2026-10-16 23:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('prajnayana_dashboard', '0013_habittracking_user_alter_visionboard_category'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='journalentry',
+            index=models.Index(fields=['user', '-timestamp'], name='journal_user_timestamp_idx'),
+        ),
+    ]
@@ -0,0 +1,50 @@
+from django.db import migrations
+
+# (table, [(column, postgres weight)])
+SEARCH_TABLES = [
+    ('prajnayana_dashboard_article', [('title', 'A'), ('tags', 'B'), ('summary', 'B'), ('content', 'C')]),
+    ('prajnayana_dashboard_knowledgehub', [('title', 'A'), ('content', 'C')]),
+]
+
+
+def create_search_tables(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    for table, fields in SEARCH_TABLES:
+        columns = [column for column, _ in fields]
+        if vendor == 'postgresql':
+            document = ' || '.join(
+                f"setweight(to_tsvector('english', coalesce({column}, '')), '{weight}')" for column, weight in fields
+            )
+            schema_editor.execute(
+                f"CREATE TABLE {table}_search ("
+                f"object_id bigint PRIMARY KEY REFERENCES {table} (id) ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED, "
+                f"document tsvector NOT NULL)"
+            )
+            schema_editor.execute(f"CREATE INDEX {table}_search_gin ON {table}_search USING GIN (document)")
+            schema_editor.execute(f"INSERT INTO {table}_search (object_id, document) SELECT id, {document} FROM {table}")
+        elif vendor == 'sqlite':
+            values = ', '.join(f"coalesce({column}, '')" for column in columns)
+            schema_editor.execute(
+                f"CREATE VIRTUAL TABLE {table}_fts USING fts5({', '.join(columns)}, tokenize='unicode61')"
+            )
+            schema_editor.execute(f"INSERT INTO {table}_fts (rowid, {', '.join(columns)}) SELECT id, {values} FROM {table}")
+
+
+def drop_search_tables(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    for table, _ in SEARCH_TABLES:
+        if vendor == 'postgresql':
+            schema_editor.execute(f"DROP TABLE IF EXISTS {table}_search")
+        elif vendor == 'sqlite':
+            schema_editor.execute(f"DROP TABLE IF EXISTS {table}_fts")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('prajnayana_dashboard', '0014_journalentry_user_timestamp_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_tables, drop_search_tables),
+    ]
@@ -0,0 +1,85 @@
+# Generated by Django 4.2.17 on 2026-10-16 23:17
+
+from django.db import migrations, models
+from django.db.models import Case, Count, F, IntegerField, Min, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Cast, Coalesce
+
+OPTIONS = ['1', '2', '3', '4', '5']
+
+
+def score_subquery(QuestionaireUserResponse):
+    """Total of each session's responses, as TestSession.score_subquery() computes it."""
+    totals = (
+        QuestionaireUserResponse.objects.filter(test_session=OuterRef('pk'))
+        .values('test_session')
+        .annotate(total=Sum(Case(
+            *[When(selected_option=option, then=Value(int(option))) for option in OPTIONS],
+            default=Value(1),
+            output_field=IntegerField(),
+        )))
+        .values('total')
+    )
+    return Coalesce(Subquery(totals), 0)
+
+
+def remap_zero_based_options(apps, schema_editor):
+    """
+    The old questionnaire endpoint stored each answer's zero-based index and
+    scored it as index + 1. Shift those sessions' answers onto the 1-5 choice
+    keys; a session is one of them when it has a '0' answer or its score is
+    that index + 1 total.
+    """
+    TestSession = apps.get_model('prajnayana_dashboard', 'TestSession')
+    QuestionaireUserResponse = apps.get_model('prajnayana_dashboard', 'QuestionaireUserResponse')
+    session_ids = list(
+        TestSession.objects.annotate(
+            answers=Count('responses'),
+            zero_answers=Count('responses', filter=Q(responses__selected_option='0')),
+            index_total=Sum(Cast('responses__selected_option', IntegerField())),
+        )
+        .filter(Q(zero_answers__gt=0) | Q(score=F('index_total') + F('answers')), answers__gt=0)
+        .values_list('id', flat=True)
+    )
+    if not session_ids:
+        return
+    # One UPDATE, so no answer is shifted twice
+    QuestionaireUserResponse.objects.filter(test_session_id__in=session_ids).update(selected_option=Case(
+        *[When(selected_option=str(index), then=Value(option)) for index, option in enumerate(OPTIONS)],
+        default=F('selected_option'),
+    ))
+    TestSession.objects.filter(id__in=session_ids).update(score=score_subquery(QuestionaireUserResponse))
+
+
+def remove_duplicate_responses(apps, schema_editor):
+    """Keep the first response per (test_session, question) so the constraint can be added."""
+    TestSession = apps.get_model('prajnayana_dashboard', 'TestSession')
+    QuestionaireUserResponse = apps.get_model('prajnayana_dashboard', 'QuestionaireUserResponse')
+    duplicates = (
+        QuestionaireUserResponse.objects.values('test_session', 'question')
+        .annotate(first_id=Min('id'), total=Count('id'))
+        .filter(total__gt=1)
+    )
+    session_ids = set()
+    for duplicate in duplicates:
+        QuestionaireUserResponse.objects.filter(
+            test_session=duplicate['test_session'], question=duplicate['question']
+        ).exclude(id=duplicate['first_id']).delete()
+        session_ids.add(duplicate['test_session'])
+    if session_ids:
+        TestSession.objects.filter(id__in=session_ids).update(score=score_subquery(QuestionaireUserResponse))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('prajnayana_dashboard', '0015_search_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(remap_zero_based_options, migrations.RunPython.noop),
+        migrations.RunPython(remove_duplicate_responses, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='questionaireuserresponse',
+            constraint=models.UniqueConstraint(fields=('test_session', 'question'), name='unique_response_per_question'),
+        ),
+    ]
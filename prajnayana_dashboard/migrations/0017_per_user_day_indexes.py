@@ -0,0 +1,64 @@
+# Generated by Django 4.2.17 on 2026-10-16 23:18
+
+from django.db import migrations, models
+from django.utils import timezone
+import django.utils.timezone
+
+
+def backfill_date_taken_local(apps, schema_editor):
+    """
+    Fill date_taken_local from date_taken. When a user has several sessions on
+    the same day only the first one gets the date, the rest stay NULL so the
+    unique constraint can be added without deleting anything.
+    """
+    TestSession = apps.get_model('prajnayana_dashboard', 'TestSession')
+    seen = set()
+    batch = []
+    for session in TestSession.objects.order_by('date_taken', 'id').only('id', 'user_id', 'date_taken').iterator():
+        day = timezone.localtime(session.date_taken).date()
+        if (session.user_id, day) in seen:
+            continue
+        seen.add((session.user_id, day))
+        session.date_taken_local = day
+        batch.append(session)
+        if len(batch) >= 1000:
+            TestSession.objects.bulk_update(batch, ['date_taken_local'])
+            batch = []
+    TestSession.objects.bulk_update(batch, ['date_taken_local'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('prajnayana_dashboard', '0016_questionaireuserresponse_unique'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='testsession',
+            name='date_taken_local',
+            field=models.DateField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(backfill_date_taken_local, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='testsession',
+            name='date_taken_local',
+            field=models.DateField(blank=True, default=django.utils.timezone.localdate, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='habittracking',
+            index=models.Index(fields=['user', 'date'], name='habittracking_user_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='journalentry',
+            index=models.Index(fields=['user', 'date', 'timestamp'], name='journal_user_date_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='visionboard',
+            index=models.Index(fields=['user', 'favorite'], name='visionboard_user_favorite_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='testsession',
+            constraint=models.UniqueConstraint(fields=('user', 'date_taken_local'), name='unique_test_session_per_day'),
+        ),
+    ]
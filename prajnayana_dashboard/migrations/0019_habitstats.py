@@ -0,0 +1,83 @@
+# Generated by Django 4.2.17 on 2026-10-16 23:21
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+WINDOW_DAYS = 366
+WINDOW_BYTES = (WINDOW_DAYS + 7) // 8
+
+
+def summarize(dates):
+    """HabitStats fields for a sorted list of distinct done dates, as habit_stats.compute() builds them."""
+    longest = run = 0
+    previous = None
+    for date in dates:
+        run = run + 1 if previous is not None and (date - previous).days == 1 else 1
+        longest = max(longest, run)
+        previous = date
+
+    bits = 0
+    for date in dates:
+        offset = (previous - date).days
+        if offset < WINDOW_DAYS:
+            bits |= 1 << offset
+
+    return {
+        'total_done': len(dates),
+        'first_done': dates[0] if dates else None,
+        'current_streak': run,
+        'current_streak_end': previous,
+        'longest_streak': longest,
+        'recent_days': bits.to_bytes(WINDOW_BYTES, 'little'),
+        'recent_anchor': previous,
+    }
+
+
+def summarize_habits(apps, schema_editor):
+    """Create a HabitStats row for every habit with done days, as habit_stats.rebuild() does."""
+    HabitTracking = apps.get_model('prajnayana_dashboard', 'HabitTracking')
+    HabitStats = apps.get_model('prajnayana_dashboard', 'HabitStats')
+
+    dates = {}
+    for user_id, habit_id, date in (
+        HabitTracking.objects.filter(is_done=True, user__isnull=False)
+        .order_by('user_id', 'habit_id', 'date').values_list('user_id', 'habit_id', 'date').distinct().iterator()
+    ):
+        dates.setdefault((user_id, habit_id), []).append(date)
+    HabitStats.objects.bulk_create(
+        (HabitStats(user_id=user_id, habit_id=habit_id, **summarize(days)) for (user_id, habit_id), days in dates.items()),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('prajnayana_dashboard', '0018_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HabitStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_done', models.PositiveIntegerField(default=0)),
+                ('first_done', models.DateField(blank=True, null=True)),
+                ('current_streak', models.PositiveIntegerField(default=0)),
+                ('current_streak_end', models.DateField(blank=True, null=True)),
+                ('longest_streak', models.PositiveIntegerField(default=0)),
+                ('recent_days', models.BinaryField(default=bytes)),
+                ('recent_anchor', models.DateField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('habit', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='prajnayana_dashboard.habits')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='habitstats',
+            constraint=models.UniqueConstraint(fields=('user', 'habit'), name='unique_habit_stats'),
+        ),
+        migrations.RunPython(summarize_habits, migrations.RunPython.noop),
+    ]
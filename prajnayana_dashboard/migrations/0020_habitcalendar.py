@@ -0,0 +1,54 @@
+# Generated by Django 4.2.17 on 2026-10-16 23:22
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+YEAR_BYTES = (366 + 7) // 8
+
+
+def fill_calendars(apps, schema_editor):
+    """Create a HabitCalendar row for every year of a habit with done days, as habit_calendar.rebuild() does."""
+    HabitTracking = apps.get_model('prajnayana_dashboard', 'HabitTracking')
+    HabitCalendar = apps.get_model('prajnayana_dashboard', 'HabitCalendar')
+
+    years = {}
+    for user_id, habit_id, date in (
+        HabitTracking.objects.filter(is_done=True, user__isnull=False)
+        .order_by().values_list('user_id', 'habit_id', 'date').distinct().iterator()
+    ):
+        key = (user_id, habit_id, date.year)
+        years[key] = years.get(key, 0) | 1 << (date.timetuple().tm_yday - 1)
+    HabitCalendar.objects.bulk_create(
+        (
+            HabitCalendar(user_id=user_id, habit_id=habit_id, year=year, days=bits.to_bytes(YEAR_BYTES, 'little'))
+            for (user_id, habit_id, year), bits in years.items()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('prajnayana_dashboard', '0019_habitstats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HabitCalendar',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.PositiveSmallIntegerField()),
+                ('days', models.BinaryField(default=bytes)),
+                ('habit', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='prajnayana_dashboard.habits')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='habitcalendar',
+            constraint=models.UniqueConstraint(fields=('user', 'habit', 'year'), name='unique_habit_calendar_year'),
+        ),
+        migrations.RunPython(fill_calendars, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 4.2.17 on 2026-10-16 23:23
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def remove_duplicate_tracking(apps, schema_editor):
+    """
+    Keep one row per (user, habit, date) so the constraint can be added,
+    preferring a done row so the day's state is unchanged.
+    """
+    HabitTracking = apps.get_model('prajnayana_dashboard', 'HabitTracking')
+    duplicates = (
+        HabitTracking.objects.filter(user__isnull=False)
+        .values('user', 'habit', 'date')
+        .annotate(total=Count('id'))
+        .filter(total__gt=1)
+    )
+    for duplicate in duplicates:
+        rows = HabitTracking.objects.filter(
+            user=duplicate['user'], habit=duplicate['habit'], date=duplicate['date']
+        ).order_by('-is_done', 'id')
+        keep = rows.values_list('id', flat=True).first()
+        rows.exclude(id=keep).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('prajnayana_dashboard', '0020_habitcalendar'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_tracking, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='habittracking',
+            constraint=models.UniqueConstraint(fields=('user', 'habit', 'date'), name='unique_habit_tracking_per_day'),
+        ),
+    ]
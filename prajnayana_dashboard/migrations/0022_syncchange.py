@@ -0,0 +1,47 @@
+# Generated by Django 4.2.17 on 2026-10-16 23:25
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+SYNCED_MODELS = ['JournalEntry', 'Habits', 'HabitTracking', 'VisionBoard']
+
+
+def log_existing_rows(apps, schema_editor):
+    """Give every existing synced row a change entry so a first sync returns it."""
+    SyncChange = apps.get_model('prajnayana_dashboard', 'SyncChange')
+    for model_name in SYNCED_MODELS:
+        model = apps.get_model('prajnayana_dashboard', model_name)
+        label = model._meta.label_lower
+        batch = []
+        for object_id, user_id in model.objects.order_by('id').values_list('id', 'user_id').iterator():
+            batch.append(SyncChange(user_id=user_id, model=label, object_id=object_id))
+            if len(batch) >= 1000:
+                SyncChange.objects.bulk_create(batch)
+                batch = []
+        SyncChange.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('prajnayana_dashboard', '0021_habittracking_unique_per_day'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SyncChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(max_length=50)),
+                ('object_id', models.BigIntegerField()),
+                ('deleted', models.BooleanField(default=False)),
+                ('user', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'id'], name='syncchange_user_id_idx'), models.Index(fields=['model', 'object_id'], name='syncchange_object_idx')],
+            },
+        ),
+        migrations.RunPython(log_existing_rows, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.17 on 2026-10-16 23:43
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('prajnayana_dashboard', '0022_syncchange'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='habittracking',
+            name='date',
+            field=models.DateField(default=django.utils.timezone.localdate),
+        ),
+    ]
@@ -0,0 +1,71 @@
+# Generated by Django 4.2.17 on 2026-10-17 00:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Count
+
+
+def split_article_tags(apps, schema_editor):
+    """Create a Tag for every name in the existing comma-separated tags and count them."""
+    Article = apps.get_model('prajnayana_dashboard', 'Article')
+    Tag = apps.get_model('prajnayana_dashboard', 'Tag')
+    TagCount = apps.get_model('prajnayana_dashboard', 'TagCount')
+    Through = Article.tag_set.through
+
+    article_tags = {}
+    for article_id, value in Article.objects.exclude(tags=None).values_list('id', 'tags').iterator():
+        names = {' '.join(name.split()).lower()[:50] for name in value.split(',')} - {''}
+        if names:
+            article_tags[article_id] = names
+    Tag.objects.bulk_create(Tag(name=name) for name in sorted(set().union(*article_tags.values())))
+    tag_ids = dict(Tag.objects.values_list('name', 'id'))
+    Through.objects.bulk_create(
+        (Through(article_id=article_id, tag_id=tag_ids[name]) for article_id, names in article_tags.items() for name in names),
+        batch_size=1000,
+    )
+
+    for tag in Tag.objects.annotate(total=Count('articles')):
+        tag.article_count = tag.total
+        tag.save(update_fields=['article_count'])
+    TagCount.objects.bulk_create(
+        TagCount(tag_id=row['tag_id'], knowledgehub_id=row['article__knowledgehub_id'], count=row['count'])
+        for row in Through.objects.exclude(article__knowledgehub=None)
+        .values('tag_id', 'article__knowledgehub_id').annotate(count=Count('id'))
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('prajnayana_dashboard', '0023_alter_habittracking_date'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('article_count', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='TagCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('knowledgehub', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='prajnayana_dashboard.knowledgehub')),
+                ('tag', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='prajnayana_dashboard.tag')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='article',
+            name='tag_set',
+            field=models.ManyToManyField(blank=True, editable=False, related_name='articles', to='prajnayana_dashboard.tag'),
+        ),
+        migrations.AddConstraint(
+            model_name='tagcount',
+            constraint=models.UniqueConstraint(fields=('knowledgehub', 'tag'), name='unique_tag_count_per_hub'),
+        ),
+        migrations.RunPython(split_article_tags, migrations.RunPython.noop),
+    ]
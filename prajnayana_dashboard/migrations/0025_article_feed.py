@@ -0,0 +1,73 @@
+# Generated by Django 4.2.17 on 2026-10-17 00:07
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def rank_articles(apps, schema_editor):
+    """Score every existing article for each reader level, as feed.rebuild() does."""
+    Article = apps.get_model('prajnayana_dashboard', 'Article')
+    ArticleRank = apps.get_model('prajnayana_dashboard', 'ArticleRank')
+    level_bonus_days, category_bonus_days = {0: 180, 1: 60}, 30
+
+    rows = Article.objects.values_list('id', 'level', 'knowledgehub_id', 'knowledgehub__level', 'date_added')
+    ArticleRank.objects.bulk_create(
+        (
+            ArticleRank(
+                level=level, article_id=article_id, knowledgehub_id=hub_id,
+                score=date_added.toordinal() + level_bonus_days.get(abs(article_level - level), 0)
+                + (category_bonus_days if hub_level == level else 0),
+            )
+            for article_id, article_level, hub_id, hub_level, date_added in rows.iterator()
+            for level in (1, 2, 3)
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('prajnayana_dashboard', '0024_tags'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SeenArticle',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('seen_at', models.DateTimeField(auto_now_add=True)),
+                ('article', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='prajnayana_dashboard.article')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArticleRank',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('level', models.PositiveSmallIntegerField()),
+                ('score', models.IntegerField()),
+                ('article', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ranks', to='prajnayana_dashboard.article')),
+                ('knowledgehub', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='prajnayana_dashboard.knowledgehub')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='seenarticle',
+            constraint=models.UniqueConstraint(fields=('user', 'article'), name='unique_seen_article'),
+        ),
+        migrations.AddIndex(
+            model_name='articlerank',
+            index=models.Index(fields=['level', '-score', '-article'], name='articlerank_level_score_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='articlerank',
+            index=models.Index(fields=['level', 'knowledgehub', '-score', '-article'], name='articlerank_hub_score_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='articlerank',
+            constraint=models.UniqueConstraint(fields=('level', 'article'), name='unique_article_rank_per_level'),
+        ),
+        migrations.RunPython(rank_articles, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 4.2.17 on 2026-10-17 00:13
+
+from django.db import migrations, models
+
+TABLE = 'prajnayana_dashboard_journalentry'
+
+
+def create_search_table(apps, schema_editor):
+    """Journal entries are searched per user, so the search documents carry the owner (see search.py)."""
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute(
+            f"CREATE TABLE {TABLE}_search ("
+            f"object_id bigint PRIMARY KEY REFERENCES {TABLE} (id) ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED, "
+            f"owner_id bigint NOT NULL, document tsvector NOT NULL)"
+        )
+        schema_editor.execute(f"CREATE INDEX {TABLE}_search_gin ON {TABLE}_search USING GIN (document)")
+        schema_editor.execute(f"CREATE INDEX {TABLE}_search_owner ON {TABLE}_search (owner_id)")
+        schema_editor.execute(
+            f"INSERT INTO {TABLE}_search (object_id, owner_id, document) "
+            f"SELECT id, user_id, setweight(to_tsvector('english', coalesce(content, '')), 'A') FROM {TABLE}"
+        )
+    elif vendor == 'sqlite':
+        schema_editor.execute(f"CREATE VIRTUAL TABLE {TABLE}_fts USING fts5(content, owner, tokenize='unicode61')")
+        schema_editor.execute(
+            f"INSERT INTO {TABLE}_fts (rowid, content, owner) SELECT id, coalesce(content, ''), 'u' || user_id FROM {TABLE}"
+        )
+
+
+def drop_search_table(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute(f"DROP TABLE IF EXISTS {TABLE}_search")
+    elif vendor == 'sqlite':
+        schema_editor.execute(f"DROP TABLE IF EXISTS {TABLE}_fts")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('prajnayana_dashboard', '0025_article_feed'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='journalentry',
+            index=models.Index(fields=['user', 'mood', '-timestamp'], name='journal_user_mood_ts_idx'),
+        ),
+        migrations.RunPython(create_search_table, drop_search_table),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 4.2.17 on 2026-10-17 00:17
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Count
+
+
+def count_moods(apps, schema_editor):
+    """Roll the existing journal entries up into MoodDay rows, as mood_trends.rebuild() does."""
+    JournalEntry = apps.get_model('prajnayana_dashboard', 'JournalEntry')
+    MoodDay = apps.get_model('prajnayana_dashboard', 'MoodDay')
+    fields = {'happy', 'sad', 'neutral', 'excited', 'stressed'}
+
+    days = {}
+    for user_id, date, mood, count in (
+        JournalEntry.objects.order_by().values_list('user_id', 'date', 'mood').annotate(count=Count('id')).iterator()
+    ):
+        day = days.setdefault((user_id, date), MoodDay(user_id=user_id, date=date))
+        if mood.lower() in fields:
+            setattr(day, mood.lower(), getattr(day, mood.lower()) + count)
+    MoodDay.objects.bulk_create(days.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('prajnayana_dashboard', '0026_journal_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MoodDay',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('happy', models.PositiveIntegerField(default=0)),
+                ('sad', models.PositiveIntegerField(default=0)),
+                ('neutral', models.PositiveIntegerField(default=0)),
+                ('excited', models.PositiveIntegerField(default=0)),
+                ('stressed', models.PositiveIntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='moodday',
+            constraint=models.UniqueConstraint(fields=('user', 'date'), name='unique_mood_day'),
+        ),
+        migrations.RunPython(count_moods, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 4.2.17 on 2026-10-17 00:30
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('prajnayana_dashboard', '0027_mood_day'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='syncchange',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+        migrations.CreateModel(
+            name='SyncClientRow',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(max_length=50)),
+                ('client_id', models.CharField(max_length=64)),
+                ('object_id', models.BigIntegerField()),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='syncclientrow',
+            constraint=models.UniqueConstraint(fields=('user', 'model', 'client_id'), name='unique_sync_client_row'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.17 on 2026-10-17 00:58
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('prajnayana_dashboard', '0028_sync_settle_and_client_rows'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='journalentry',
+            name='date',
+            field=models.DateField(default=django.utils.timezone.localdate),
+        ),
+    ]
@@ -0,0 +1,175 @@
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+
+
+def get_model_field(model, name):
+    """
+    ``model``'s field called ``name`` as a serializer source names it: reverse
+    relations go by their accessor (``habittracking_set``), not their query name.
+    """
+    try:
+        return model._meta.get_field(name)
+    except FieldDoesNotExist:
+        for field in model._meta.related_objects:
+            if field.get_accessor_name() == name:
+                return field
+        raise
+
+
+def get_related_paths(serializer, model, prefix='', prefetching=False):
+    """
+    Walk the readable fields of ``serializer`` and collect the relation paths
+    it will follow while rendering ``model`` instances.
+
+    Returns a ``(select_related, prefetch_related)`` pair of lists. Forward
+    foreign keys are joined; reverse and many-to-many relations, and anything
+    nested below them, are prefetched.
+    """
+    select_related, prefetch_related = [], []
+
+    for field in serializer.fields.values():
+        if field.write_only or field.source == '*':
+            continue
+
+        many = isinstance(field, (serializers.ListSerializer, serializers.ManyRelatedField))
+        child = field.child if isinstance(field, serializers.ListSerializer) else field
+        if not isinstance(child, (serializers.BaseSerializer, serializers.RelatedField, serializers.ManyRelatedField)):
+            continue
+        # Primary key fields only read the local `<name>_id` column.
+        if isinstance(child, serializers.PrimaryKeyRelatedField) and not many:
+            continue
+
+        try:
+            model_field = get_model_field(model, field.source_attrs[0])
+        except FieldDoesNotExist:
+            continue
+        if not model_field.is_relation or model_field.related_model is None:
+            continue
+
+        # Reverse relations are prefetched through their accessor
+        path = prefix + (model_field.get_accessor_name() if model_field.auto_created and not model_field.concrete else model_field.name)
+        if not many and not prefetching and (model_field.many_to_one or model_field.one_to_one):
+            select_related.append(path)
+            nested_prefetching = False
+        else:
+            prefetch_related.append(path)
+            nested_prefetching = True
+
+        if isinstance(child, serializers.Serializer):
+            nested_select, nested_prefetch = get_related_paths(
+                child, model_field.related_model, path + '__', nested_prefetching
+            )
+            select_related += nested_select
+            prefetch_related += nested_prefetch
+
+    return select_related, prefetch_related
+
+
+def get_loaded_fields(serializer, model, prefix=''):
+    """
+    The model fields ``serializer`` reads while rendering ``model`` instances,
+    as paths for QuerySet.only(). Returns None when any field reads something
+    other than a model field (a method, a property, the whole object), since
+    deferring columns could then cost a query per row.
+    """
+    loaded = []
+
+    for field in serializer.fields.values():
+        if field.write_only:
+            continue
+        if field.source == '*' or len(field.source_attrs) != 1:
+            return None
+        try:
+            model_field = get_model_field(model, field.source_attrs[0])
+        except FieldDoesNotExist:
+            return None
+
+        if model_field.many_to_many or model_field.one_to_many:
+            continue  # prefetched separately, by primary key
+        if not model_field.concrete:
+            return None
+
+        path = prefix + model_field.name
+        loaded.append(path)
+        if model_field.is_relation and isinstance(field, serializers.Serializer):
+            nested = get_loaded_fields(field, model_field.related_model, path + '__')
+            if nested is None:
+                return None
+            loaded += nested
+
+    return loaded
+
+
+class SparseFieldsetMixin:
+    """
+    Lets GET requests ask for a subset of a ViewSet's fields with
+    ``?fields=id,title``. The other fields are dropped from the serializer,
+    so EagerLoadingMixin neither joins nor loads what they would have read.
+    Nested objects are kept or dropped as a whole.
+    """
+    sparse_fields_param = 'fields'
+
+    def get_sparse_fields(self):
+        request = getattr(self, 'request', None)
+        if request is None or request.method not in ('GET', 'HEAD'):
+            return None
+        value = request.query_params.get(self.sparse_fields_param, '')
+        return frozenset(name.strip() for name in value.split(',') if name.strip()) or None
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        requested = self.get_sparse_fields()
+        if requested:
+            fields = serializer.child.fields if isinstance(serializer, serializers.ListSerializer) else serializer.fields
+            readable = {name for name, field in fields.items() if not field.write_only}
+            if requested - readable:
+                raise ValidationError({
+                    self.sparse_fields_param: f"Unknown fields: {', '.join(sorted(requested - readable))}."
+                })
+            for name in readable - requested:
+                fields.pop(name)
+        return serializer
+
+
+class EagerLoadingMixin:
+    """
+    Applies select_related/prefetch_related to a ViewSet's queryset based on
+    the relations its serializer renders, so list endpoints run a fixed number
+    of queries no matter how many rows they return. Lists, and the other
+    actions in ``list_actions``, also only read the columns the serializer
+    renders (see get_loaded_fields).
+    """
+    list_actions = ('list',)
+    _query_plan_cache = {}
+
+    def get_sparse_fields(self):
+        return None
+
+    def get_query_plan(self, model):
+        """(select_related, prefetch_related, only) for rendering ``model`` rows."""
+        sparse_fields = self.get_sparse_fields()
+        key = (self.get_serializer_class(), model)
+        if sparse_fields is None and key in self._query_plan_cache:
+            return self._query_plan_cache[key]
+
+        serializer = self.get_serializer()
+        plan = (*get_related_paths(serializer, model), get_loaded_fields(serializer, model))
+        # Sparse fieldsets come from the request, so they are not cached
+        if sparse_fields is None:
+            self._query_plan_cache[key] = plan
+        return plan
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        select_related, prefetch_related, loaded = self.get_query_plan(queryset.model)
+        if select_related:
+            queryset = queryset.select_related(*select_related)
+        if prefetch_related:
+            queryset = queryset.prefetch_related(*prefetch_related)
+        if loaded is not None and self.action in self.list_actions:
+            # The paginator reads its ordering fields to build the cursors
+            ordering = getattr(self.paginator, 'ordering', None) or ()
+            ordering = [ordering] if isinstance(ordering, str) else ordering
+            queryset = queryset.only(*loaded, *(field.lstrip('-') for field in ordering if '__' not in field))
+        return queryset
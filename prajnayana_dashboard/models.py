@@ -1,9 +1,12 @@
 from django.db import models
+from django.db.models import Case, F, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
 from authentication_app.models import User
 from django.utils import timezone
 
 class DiscoveryQuestion(models.Model):
     text = models.TextField()
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.text
@@ -12,21 +15,46 @@ class TestSession(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     score = models.IntegerField(default=None,null=True,blank=True)
     date_taken = models.DateTimeField(auto_now_add=True)
+    # Calendar day (in TIME_ZONE) the test was taken, so per-day lookups can use an index
+    date_taken_local = models.DateField(default=timezone.localdate, null=True, blank=True, editable=False)
+    updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'date_taken_local'], name='unique_test_session_per_day'),
+        ]
 
     def __str__(self):
         return f"Test for {self.user.username} on {self.date_taken}"
     
     def calculate_score(self):
         """Calculate the score based on the user's responses."""
-        responses = QuestionaireUserResponse.objects.filter(test_session=self)
-        total_score = sum(response.get_numeric_score() for response in responses)
-        return total_score
+        total = QuestionaireUserResponse.objects.filter(test_session=self).aggregate(
+            total=Sum(QuestionaireUserResponse.numeric_score_expression())
+        )['total']
+        return total or 0
 
     def update_score(self):
         """Update the score field for the test session."""
         self.score = self.calculate_score()
-        self.save()
+        self.save(update_fields=['score'])
+
+    @staticmethod
+    def score_subquery():
+        """Total of each session's responses, for TestSession.objects.update(score=...)."""
+        totals = (
+            QuestionaireUserResponse.objects.filter(test_session=OuterRef('pk'))
+            .values('test_session')
+            .annotate(total=Sum(QuestionaireUserResponse.numeric_score_expression()))
+            .values('total')
+        )
+        return Coalesce(Subquery(totals), 0)
+
+    @staticmethod
+    def adjust_score(test_session_id, delta):
+        """Atomically add ``delta`` to a session's score without reading it first."""
+        if delta:
+            TestSession.objects.filter(pk=test_session_id).update(score=Coalesce(F('score'), 0) + delta)
 
 class QuestionaireUserResponse(models.Model):
     LIKERT_CHOICES = [
@@ -40,17 +68,42 @@ class QuestionaireUserResponse(models.Model):
     test_session = models.ForeignKey(TestSession, related_name='responses', on_delete=models.CASCADE)
     question = models.ForeignKey(DiscoveryQuestion, on_delete=models.CASCADE)
     selected_option = models.CharField(max_length=1, choices=LIKERT_CHOICES)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['test_session', 'question'], name='unique_response_per_question'),
+        ]
+
+    SCORE_MAP = {
+        '1': 1,  # Disagree
+        '2': 2,  # Somewhat Disagree
+        '3': 3,  # Neither Agree nor Disagree
+        '4': 4,  # Somewhat Agree
+        '5': 5,  # Agree
+    }
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember what this row contributed to its session's score so saves
+        # can apply the difference instead of recalculating the whole session.
+        if 'test_session_id' in field_names and 'selected_option' in field_names:
+            instance._scored = (instance.test_session_id, instance.get_numeric_score())
+        return instance
 
     def get_numeric_score(self):
         """Return the numeric value corresponding to the selected option."""
-        score_map = {
-            '1': 1,  # Disagree
-            '2': 2,  # Somewhat Disagree
-            '3': 3,  # Neither Agree nor Disagree
-            '4': 4,  # Somewhat Agree
-            '5': 5,  # Agree
-        }
-        return score_map.get(self.selected_option, 1)
+        return self.SCORE_MAP.get(self.selected_option, 1)
+
+    @classmethod
+    def numeric_score_expression(cls):
+        """SQL equivalent of get_numeric_score() for aggregating in the database."""
+        return Case(
+            *[When(selected_option=option, then=Value(score)) for option, score in cls.SCORE_MAP.items()],
+            default=Value(1),
+            output_field=models.IntegerField(),
+        )
 
     def __str__(self):
         return f"{self.test_session.user.username} - {self.question.text} - {self.get_selected_option_display()}"
@@ -60,22 +113,88 @@ class Habits(models.Model):
     habit = models.CharField(max_length=255)
     user = models.ForeignKey(User,on_delete=models.CASCADE,null=True,blank=True)
     description = models.TextField()
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f" {self.habit}"
     
 class HabitTracking(models.Model):
     habit = models.ForeignKey(Habits,on_delete=models.CASCADE)
-    date = models.DateField(default=timezone.now)
+    date = models.DateField(default=timezone.localdate)
     is_done = models.BooleanField(default=False)
     user = models.ForeignKey(User,on_delete=models.CASCADE,null=True,blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'date'], name='habittracking_user_date_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'habit', 'date'], name='unique_habit_tracking_per_day'),
+        ]
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the loaded state so signal handlers can tell what a save changed
+        if {'user_id', 'habit_id', 'date', 'is_done'} <= set(field_names):
+            instance._tracked = instance.tracked_state()
+        return instance
+
+    def tracked_state(self):
+        return (self.user_id, self.habit_id, self.date, self.is_done)
 
     def __str__(self):
         return f" {self.habit.habit}"
 
 
+class HabitStats(models.Model):
+    """
+    Streak and completion summary for one user's habit, kept current by the
+    HabitTracking signal handlers (see habit_stats.py).
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    habit = models.ForeignKey(Habits, on_delete=models.CASCADE)
+    total_done = models.PositiveIntegerField(default=0)
+    first_done = models.DateField(null=True, blank=True)
+    # Length of the run of done days ending at current_streak_end, the latest done day
+    current_streak = models.PositiveIntegerField(default=0)
+    current_streak_end = models.DateField(null=True, blank=True)
+    longest_streak = models.PositiveIntegerField(default=0)
+    # Bit i is set when the day `recent_anchor - i days` was done
+    recent_days = models.BinaryField(default=bytes)
+    recent_anchor = models.DateField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'habit'], name='unique_habit_stats'),
+        ]
+
+    def __str__(self):
+        return f"Stats for {self.habit_id} by {self.user_id}"
+
+
+class HabitCalendar(models.Model):
+    """
+    One year of a user's completions for a habit as a bitmap, kept in sync
+    with HabitTracking (see habit_calendar.py). Bit n is set when day n + 1 of
+    the year was done.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    habit = models.ForeignKey(Habits, on_delete=models.CASCADE)
+    year = models.PositiveSmallIntegerField()
+    days = models.BinaryField(default=bytes)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'habit', 'year'], name='unique_habit_calendar_year'),
+        ]
+
+    def __str__(self):
+        return f"{self.year} calendar for {self.habit_id} by {self.user_id}"
+
+
 class JournalEntry(models.Model):
     MOOD_CHOICES = [
         ("Happy", "Happy"),
@@ -86,14 +205,56 @@ class JournalEntry(models.Model):
     ]
     
     user = models.ForeignKey(User, on_delete=models.CASCADE)
-    date = models.DateField(default=timezone.now)
+    date = models.DateField(default=timezone.localdate)
     timestamp = models.DateTimeField(auto_now_add=True) 
     mood = models.CharField(max_length=10, choices=MOOD_CHOICES, default="neutral")
     content = models.TextField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-timestamp'], name='journal_user_timestamp_idx'),
+            models.Index(fields=['user', 'date', 'timestamp'], name='journal_user_date_ts_idx'),
+            models.Index(fields=['user', 'mood', '-timestamp'], name='journal_user_mood_ts_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the loaded state so signal handlers can tell what a save changed
+        if {'user_id', 'date', 'mood'} <= set(field_names):
+            instance._mood_day = instance.mood_state()
+        return instance
+
+    def mood_state(self):
+        # `date` may be assigned a string or datetime; use the day it is stored as
+        return (self.user_id, self._meta.get_field('date').to_python(self.date), self.mood)
 
     def __str__(self):
         return f"Journal ({self.mood}) by {self.user} on {self.date} at {self.timestamp.time()}"
 
+
+class MoodDay(models.Model):
+    """
+    How many of a user's journal entries on one day have each mood, kept
+    current by the JournalEntry signal handlers (see mood_trends.py).
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    date = models.DateField()
+    happy = models.PositiveIntegerField(default=0)
+    sad = models.PositiveIntegerField(default=0)
+    neutral = models.PositiveIntegerField(default=0)
+    excited = models.PositiveIntegerField(default=0)
+    stressed = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'date'], name='unique_mood_day'),
+        ]
+
+    def __str__(self):
+        return f"Moods of {self.user_id} on {self.date}"
+
 class KnowledgeHubCategory(models.TextChoices):
     MINDFULNESS_TECHNIQUES = "Mindfulness Techniques"
     EMOTIONAL_RESILIENCE = "Emotional Resilience"
@@ -108,6 +269,15 @@ class KnowledgeHub(models.Model): # Also knows as article
     level = models.IntegerField(default=1)
     image_url = models.URLField()
     title = models.CharField(choices=KnowledgeHubCategory.choices, max_length=255)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # The feed ranks articles by their hub's level, so only level changes re-rank them
+        if 'level' in field_names:
+            instance._ranked_level = instance.level
+        return instance
 
     def __str__(self):
         return self.title
@@ -124,10 +294,96 @@ class Article(models.Model):
     image_url = models.URLField()
     knowledgehub = models.ForeignKey(KnowledgeHub,null=True,on_delete=models.SET_NULL)
     tags = models.CharField(max_length=300,null=True,blank=True)
+    # Derived from `tags` whenever the article is saved (see tags.py)
+    tag_set = models.ManyToManyField('Tag', related_name='articles', blank=True, editable=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the loaded tags so saves that leave them alone skip the tag bookkeeping
+        if {'tags', 'knowledgehub_id'} <= set(field_names):
+            instance._tagged = instance.tagged_state()
+        # Likewise for the fields its feed ranking is computed from
+        if {'level', 'knowledgehub_id', 'date_added'} <= set(field_names):
+            instance._ranked = instance.ranked_state()
+        return instance
+
+    def tagged_state(self):
+        return (self.tags, self.knowledgehub_id)
+
+    def ranked_state(self):
+        return (self.level, self.knowledgehub_id, self.date_added)
 
     def __str__(self):
         return self.title
 
+
+class Tag(models.Model):
+    """
+    A normalized article tag. article_count is the number of articles carrying
+    it, kept current together with TagCount (see tags.py).
+    """
+    name = models.CharField(max_length=50, unique=True)
+    article_count = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return self.name
+
+
+class TagCount(models.Model):
+    """Number of a knowledge hub's articles carrying a tag, for the tag facets."""
+    tag = models.ForeignKey(Tag, on_delete=models.CASCADE)
+    knowledgehub = models.ForeignKey(KnowledgeHub, on_delete=models.CASCADE)
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['knowledgehub', 'tag'], name='unique_tag_count_per_hub'),
+        ]
+
+    def __str__(self):
+        return f"{self.tag_id} in {self.knowledgehub_id}: {self.count}"
+
+
+class ArticleRank(models.Model):
+    """
+    An article's feed score for readers of one level, kept current for every
+    level in feed.LEVELS whenever the article or its hub changes (see feed.py).
+    """
+    level = models.PositiveSmallIntegerField()
+    article = models.ForeignKey(Article, on_delete=models.CASCADE, related_name='ranks')
+    # Copied from the article so a hub's feed is read from one index
+    knowledgehub = models.ForeignKey(KnowledgeHub, null=True, blank=True, on_delete=models.SET_NULL)
+    score = models.IntegerField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['level', '-score', '-article'], name='articlerank_level_score_idx'),
+            models.Index(fields=['level', 'knowledgehub', '-score', '-article'], name='articlerank_hub_score_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['level', 'article'], name='unique_article_rank_per_level'),
+        ]
+
+    def __str__(self):
+        return f"{self.article_id} for level {self.level}: {self.score}"
+
+
+class SeenArticle(models.Model):
+    """An article a user has opened, left out of their feed."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    article = models.ForeignKey(Article, on_delete=models.CASCADE)
+    seen_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'article'], name='unique_seen_article'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} saw {self.article_id}"
+
     
 
 
@@ -143,7 +399,68 @@ class VisionBoard(models.Model):
     content = models.TextField()
     category = models.CharField(choices=VisionBoardCategory.choices, max_length=255)
     favorite = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'favorite'], name='visionboard_user_favorite_idx'),
+        ]
 
     def __str__(self):
         return f"Vision Board by {self.user.username}"
+
+
+class SyncChange(models.Model):
+    """
+    Latest change to a synced row, used by the delta sync API (see sync.py).
+    The id doubles as a monotonic change sequence: every save or delete
+    replaces the row's previous entry with a new one, so each object has at
+    most one entry and deletes stay behind as tombstones.
+    """
+    # No database constraint so tombstones can still be logged while a user's
+    # rows are being cascade-deleted together with the user.
+    user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, db_constraint=False)
+    model = models.CharField(max_length=50)
+    object_id = models.BigIntegerField()
+    deleted = models.BooleanField(default=False)
+    # Ids are allocated before commit, so pulls only move their token past
+    # changes old enough to be committed (see sync.pull)
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'id'], name='syncchange_user_id_idx'),
+            models.Index(fields=['model', 'object_id'], name='syncchange_object_idx'),
+        ]
+
+    def __str__(self):
+        return f"{'Delete' if self.deleted else 'Upsert'} {self.model} {self.object_id}"
+
+    @staticmethod
+    def record(model, rows, deleted=False):
+        """Log a change to ``rows``, an iterable of (object_id, user_id) pairs of ``model``."""
+        rows = list(rows)
+        label = model._meta.label_lower
+        SyncChange.objects.filter(model=label, object_id__in=[object_id for object_id, _ in rows]).delete()
+        SyncChange.objects.bulk_create([
+            SyncChange(user_id=user_id, model=label, object_id=object_id, deleted=deleted) for object_id, user_id in rows
+        ])
+
+
+class SyncClientRow(models.Model):
+    """
+    The row a pushed offline mutation created, by the client_id the client
+    gave it, so a retried push updates that row instead of creating another.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    model = models.CharField(max_length=50)
+    client_id = models.CharField(max_length=64)
+    object_id = models.BigIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'model', 'client_id'], name='unique_sync_client_row'),
+        ]
+
+    def __str__(self):
+        return f"{self.model} {self.object_id} as {self.client_id}"
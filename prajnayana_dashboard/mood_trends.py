@@ -0,0 +1,160 @@
+"""
+Mood over time, read from the MoodDay rollup.
+
+A MoodDay row counts one user's journal entries per mood for one day, so a
+year of moods is at most 366 small rows however much the user writes, and no
+entry content is ever read. Journal saves and deletes adjust the counts of
+the day they leave and the day they land on in place.
+"""
+import contextlib
+import datetime
+
+from django.db import transaction
+from django.db.models import Count, F
+
+from .models import JournalEntry, MoodDay
+
+# Mood -> MoodDay count field
+MOOD_FIELDS = {mood: mood.lower() for mood, _ in JournalEntry.MOOD_CHOICES}
+
+# Valence of each mood, averaged into a period's score
+MOOD_SCORES = {'Happy': 1, 'Excited': 1, 'Neutral': 0, 'Stressed': -1, 'Sad': -1}
+
+GRANULARITIES = ('day', 'week', 'month')
+
+# Periods shown when the request gives no ?date_from=, and periods per moving average
+DEFAULT_PERIODS = {'day': 30, 'week': 12, 'month': 12}
+DEFAULT_WINDOW = {'day': 7, 'week': 4, 'month': 3}
+
+# A request spans at most a year of periods, and its moving average reaches
+# back at most a quarter before them, so it never reads much more than a
+# year and a quarter of MoodDay rows whatever the granularity.
+MAX_PERIODS = {'day': 366, 'week': 53, 'month': 12}
+MAX_WINDOW = {'day': 92, 'week': 13, 'month': 3}
+
+
+def _field(mood):
+    # Entries created without a mood carry the model default, 'neutral'
+    return MOOD_FIELDS.get(mood) or MOOD_FIELDS.get((mood or '').capitalize())
+
+
+def _apply(user_id, date, deltas):
+    rows = MoodDay.objects.filter(user_id=user_id, date=date)
+    changes = {field: F(field) + delta for field, delta in deltas.items() if delta}
+    if not changes:
+        return
+    # update() rather than save() so a day that is being cascade-deleted
+    # together with its user is never recreated.
+    if not rows.update(**changes) and any(delta > 0 for delta in deltas.values()):
+        MoodDay.objects.bulk_create([MoodDay(user_id=user_id, date=date)], ignore_conflicts=True)
+        rows.update(**changes)
+
+
+def record_change(previous, current):
+    """
+    Apply a JournalEntry change to the MoodDay counts given the entry's
+    (user_id, date, mood) before and after; either side is None for creates
+    and deletes.
+    """
+    if previous == current:
+        return
+    days = {}
+    for state, delta in ((previous, -1), (current, 1)):
+        if state is None or _field(state[2]) is None:
+            continue
+        deltas = days.setdefault(state[:2], {})
+        deltas[_field(state[2])] = deltas.get(_field(state[2]), 0) + delta
+
+    # Moving an entry between days has to change both or neither
+    with transaction.atomic() if len(days) > 1 else contextlib.nullcontext():
+        for (user_id, date), deltas in days.items():
+            _apply(user_id, date, deltas)
+
+
+def rebuild(user_ids=None, batch_size=1000):
+    """Recreate every MoodDay row from JournalEntry in a single ordered pass."""
+    rows = JournalEntry.objects.all()
+    days = MoodDay.objects.all()
+    if user_ids:
+        rows = rows.filter(user_id__in=user_ids)
+        days = days.filter(user_id__in=user_ids)
+    rows = rows.order_by('user_id', 'date', 'mood').values_list('user_id', 'date', 'mood').annotate(count=Count('id'))
+
+    created = 0
+    with transaction.atomic():
+        days.delete()
+        batch, day = [], None
+        for user_id, date, mood, count in rows.iterator(chunk_size=batch_size):
+            if day is None or (day.user_id, day.date) != (user_id, date):
+                if len(batch) >= batch_size:
+                    MoodDay.objects.bulk_create(batch)
+                    created += len(batch)
+                    batch = []
+                day = MoodDay(user_id=user_id, date=date)
+                batch.append(day)
+            field = _field(mood)
+            if field is not None:
+                setattr(day, field, getattr(day, field) + count)
+        MoodDay.objects.bulk_create(batch)
+        created += len(batch)
+    return created
+
+
+def period_start(date, granularity):
+    if granularity == 'week':
+        return date - datetime.timedelta(days=date.weekday())
+    if granularity == 'month':
+        return date.replace(day=1)
+    return date
+
+
+def shift(date, granularity, periods):
+    """The start of the period ``periods`` periods after (or before) the one starting on ``date``."""
+    if granularity == 'month':
+        months = date.year * 12 + date.month - 1 + periods
+        return datetime.date(months // 12, months % 12 + 1, 1)
+    return date + datetime.timedelta(days=periods * (7 if granularity == 'week' else 1))
+
+
+def trends(user_id, granularity, date_from, date_to, window):
+    """
+    Per-period mood counts of ``user_id``'s entries from the period holding
+    ``date_from`` to the one holding ``date_to``. Every period carries the
+    average mood score of its entries (see MOOD_SCORES) and, as its moving
+    average, that of the entries of the ``window`` periods ending with it;
+    either is None when there are no entries to average.
+    """
+    first = period_start(date_from, granularity)
+    last = period_start(date_to, granularity)
+    # The first periods' moving averages reach back before date_from
+    start = shift(first, granularity, 1 - window)
+
+    counts = {}
+    days = MoodDay.objects.filter(user_id=user_id, date__range=(start, date_to)).values_list('date', *MOOD_FIELDS.values())
+    for date, *values in days:
+        period = counts.setdefault(period_start(date, granularity), dict.fromkeys(MOOD_FIELDS, 0))
+        for mood, value in zip(MOOD_FIELDS, values):
+            period[mood] += value
+
+    periods, period = [], start
+    while period <= last:
+        periods.append(period)
+        period = shift(period, granularity, 1)
+
+    points, trailing = [], []
+    for period in periods:
+        moods = counts.get(period, dict.fromkeys(MOOD_FIELDS, 0))
+        entries = sum(moods.values())
+        total = sum(MOOD_SCORES[mood] * count for mood, count in moods.items())
+        trailing = (trailing + [(entries, total)])[-window:]
+        if period < first:
+            continue
+        window_entries = sum(entries for entries, _ in trailing)
+        points.append({
+            "period": period,
+            "entries": entries,
+            "moods": moods,
+            "score": round(total / entries, 4) if entries else None,
+            "moving_average": round(sum(total for _, total in trailing) / window_entries, 4) if window_entries else None,
+        })
+    return points
@@ -0,0 +1,59 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from rest_framework.pagination import CursorPagination
+
+
+class DashboardCursorPagination(CursorPagination):
+    """
+    Keyset pagination with opaque cursors. Page size defaults to
+    settings.API_PAGE_SIZE and can be changed per request with ?page_size=
+    up to settings.API_MAX_PAGE_SIZE.
+    """
+    page_size = settings.API_PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = settings.API_MAX_PAGE_SIZE
+    ordering = ('-id',)
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """
+        paginate_queryset for async views. Django's async ORM runs each query
+        in a worker thread too, so running the paginator there as a whole
+        costs the same single thread hop and leaves DRF's cursor handling as is.
+        """
+        return await sync_to_async(self.paginate_queryset)(queryset, request, view)
+
+
+class TimestampCursorPagination(DashboardCursorPagination):
+    ordering = ('-timestamp', '-id')
+
+
+class DateCursorPagination(DashboardCursorPagination):
+    ordering = ('-date', '-id')
+
+
+class SearchRankCursorPagination(DashboardCursorPagination):
+    """
+    Pages search results by their `search_rank` annotation and the article feed
+    by its `feed_score`, newest first otherwise. Search result pages also say
+    whether matches beyond settings.SEARCH_RESULTS_LIMIT were left out, as
+    `truncated`.
+    """
+    search_truncated = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        truncated = queryset.query.annotations.get('search_truncated')
+        self.search_truncated = None if truncated is None else truncated.value
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        response = super().get_paginated_response(data)
+        if self.search_truncated is not None:
+            response.data['truncated'] = self.search_truncated
+        return response
+
+    def get_ordering(self, request, queryset, view):
+        if 'search_rank' in queryset.query.annotations:
+            return ('search_rank', '-id')
+        if 'feed_score' in queryset.query.annotations:
+            return ('-feed_score', '-feed_article')
+        return super().get_ordering(request, queryset, view)
@@ -0,0 +1,161 @@
+"""
+Caching of ViewSet list and retrieve responses.
+
+Cache keys embed a version number for every model a response depends on. A
+model has one shared version and one version per user; saving or deleting a
+row bumps the version of the user that owns it (or the shared version for
+rows with no owner), which makes every cached response built from that data
+unreachable. Old entries are never deleted, they simply expire.
+
+The same key doubles as a strong ETag, so conditional requests whose
+If-None-Match still matches are answered with 304 before any query or
+serialization runs. Only a response that was served can have a matching ETag,
+so ``If-None-Match: *`` is not honoured: it would answer 304 for objects the
+user cannot see or that do not exist.
+
+Versions live in the API cache, so it has to be shared by every worker
+process (CACHE_URL). The default local memory cache is only correct for a
+single process; ``manage.py check --deploy`` warns about it.
+"""
+import hashlib
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.cache import patch_vary_headers
+from django.utils.http import http_date, parse_etags
+from rest_framework import status
+from rest_framework.response import Response
+
+from authentication_app.models import User
+from backend import metrics
+from prajnayana_dashboard.models import QuestionaireUserResponse, TestSession
+
+
+def get_cache():
+    return caches[settings.API_CACHE_ALIAS]
+
+
+def _version_key(model, user_id=None):
+    scope = 'shared' if user_id is None else f'user:{user_id}'
+    # Proxies (TokenUser) share the version of the model they stand in for
+    return f'api-version:{model._meta.concrete_model._meta.label_lower}:{scope}'
+
+
+def _new_version():
+    # Start from the clock rather than 1 so a version key that was evicted
+    # never comes back with a number an older cached response already used.
+    return int(time.time() * 1000)
+
+
+def get_versions(models, user_id=None):
+    keys = [_version_key(model) for model in models]
+    if user_id is not None:
+        keys += [_version_key(model, user_id) for model in models]
+
+    cache = get_cache()
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, _new_version(), timeout=None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def bump_version(model, user_id=None):
+    """Invalidate every cached response that depends on ``model`` for ``user_id``."""
+    cache = get_cache()
+    key = _version_key(model, user_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, _new_version(), timeout=None)
+
+
+def owner_id(instance):
+    """The user whose cached responses a change to ``instance`` affects, None if shared."""
+    if isinstance(instance, User):
+        return instance.pk
+    if isinstance(instance, QuestionaireUserResponse):
+        # Responses belong to their session's user
+        if QuestionaireUserResponse.test_session.is_cached(instance):
+            return instance.test_session.user_id
+        return TestSession.objects.filter(pk=instance.test_session_id).values_list('user_id', flat=True).first()
+    return getattr(instance, 'user_id', None)
+
+
+class CachedResponseMixin:
+    """
+    Serves list and retrieve from the cache. ViewSets set ``cache_models`` to
+    every model their serializer reads and ``cache_per_user`` when the
+    response depends on the requesting user.
+    """
+    cache_models = []
+    cache_per_user = True
+
+    def get_response_cache_key(self, request):
+        user_id = request.user.pk if self.cache_per_user else None
+        versions = get_versions(self.cache_models, user_id)
+        url = hashlib.md5(request.build_absolute_uri().encode()).hexdigest()
+        scope = user_id if user_id is not None else 'shared'
+        return f'api-response:{self.basename}:{self.action}:{scope}:{url}:{"-".join(map(str, versions))}'
+
+    def cached_response(self, view, request, *args, **kwargs):
+        key, etag, response = self.lookup_cached_response(request)
+        if response is not None:
+            return response
+        return self.store_cached_response(key, etag, view(request, *args, **kwargs))
+
+    async def acached_response(self, view, request, *args, **kwargs):
+        """cached_response for the async views, where ``view`` is a coroutine function."""
+        key, etag, response = await sync_to_async(self.lookup_cached_response)(request)
+        if response is not None:
+            return response
+        response = await view(request, *args, **kwargs)
+        return await sync_to_async(self.store_cached_response)(key, etag, response)
+
+    def lookup_cached_response(self, request):
+        """(cache key, ETag, response or None if it has to be rendered) for ``request``."""
+        key = self.get_response_cache_key(request)
+        etag = '"%s"' % hashlib.md5(key.encode()).hexdigest()
+        if_none_match = parse_etags(request.headers.get('If-None-Match', ''))
+        if etag in if_none_match:
+            metrics.inc('api_response_cache_requests_total', {'view': self.basename, 'result': 'not_modified'})
+            return key, etag, self.finalize_cached_response(Response(status=status.HTTP_304_NOT_MODIFIED), etag)
+
+        cached = get_cache().get(key)
+        metrics.inc('api_response_cache_requests_total', {'view': self.basename, 'result': 'miss' if cached is None else 'hit'})
+        if cached is None:
+            return key, etag, None
+        data, last_modified = cached
+        response = Response(data)
+        if last_modified:
+            response['Last-Modified'] = last_modified
+        return key, etag, self.finalize_cached_response(response, etag)
+
+    def store_cached_response(self, key, etag, response):
+        if response.status_code == 200:
+            get_cache().set(key, (response.data, response.get('Last-Modified')), settings.API_CACHE_TIMEOUT)
+            self.finalize_cached_response(response, etag)
+        return response
+
+    def finalize_cached_response(self, response, etag):
+        response['ETag'] = etag
+        if self.cache_per_user:
+            patch_vary_headers(response, ['Authorization'])
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(self.render_detail, request, *args, **kwargs)
+
+    def render_detail(self, request, *args, **kwargs):
+        instance = self.get_object()
+        response = Response(self.get_serializer(instance).data)
+        updated_at = getattr(instance, 'updated_at', None)
+        if updated_at is not None:
+            response['Last-Modified'] = http_date(updated_at.timestamp())
+        return response
@@ -0,0 +1,283 @@
+"""
+Synthetic data for scale testing, generated by the seed_scale_data command.
+
+Every user draws from its own random streams, seeded from the run's seed and
+the user's index, so a seed always produces the same rows however many users
+are generated and however the work is batched. Rows are produced lazily and
+inserted ``batch_size`` at a time, one transaction per chunk of users, so
+memory stays bounded whatever the volume. bulk_create skips the signals that
+maintain HabitStats, HabitCalendar, MoodDay, article tags and feed ranks,
+the search index and test scores, so each batch or chunk of users brings
+those up to date for its own rows only; SyncChange entries are written
+alongside the synced rows. Rows of earlier runs and of real users are left
+as they are.
+
+The article catalog is shared by every run: it is only topped up to the
+requested size, continuing the seed's article stream where it stopped.
+"""
+import datetime
+import itertools
+import random
+
+from django.db import transaction
+from django.utils import timezone
+
+from authentication_app.models import User
+
+from . import feed, habit_calendar, habit_stats, mood_trends, search, tags
+from .models import (
+    Article, DiscoveryQuestion, HabitTracking, Habits, JournalEntry, KnowledgeHub, KnowledgeHubCategory,
+    QuestionaireUserResponse, SyncChange, TestSession, VisionBoard, VisionBoardCategory,
+)
+
+DISTRIBUTIONS = {
+    'history_days': (30, 1095),   # days of history per user, uniform
+    'habits': (2, 8),             # habits per user, uniform
+    'tracked_rate': 0.85,         # chance a user checks in at all on a given day
+    'adherence': (2.0, 1.5),      # beta(alpha, beta) chance, per habit, that a check-in is done
+    'journal_rate': 0.6,          # chance of a journal entry on a given day
+    'journal_words': (4.0, 0.6),  # lognormal(mu, sigma) words per entry, median ~55
+    'test_interval': 14,          # mean days between test sessions, exponential
+    'test_responses': 10,         # questions answered per test session
+    'vision_items': (5, 40),      # vision board items per user, uniform
+    'articles': 5000,             # size of the article catalog
+    'article_words': (6.0, 0.5),  # lognormal(mu, sigma) words per article, median ~400
+}
+
+MOOD_WEIGHTS = {'Happy': 30, 'Neutral': 30, 'Sad': 15, 'Excited': 10, 'Stressed': 15}
+
+QUESTIONS = 30
+
+WORDS = (
+    'calm breath focus gratitude morning walk sleep friends work stress rest tea journal kindness anxious hopeful '
+    'tired grateful progress patience reflection family goal energy quiet listen notice pause gentle honest '
+    'strength change habit small steps balance body mind heart courage joy letting go present moment'
+).split()
+
+# Tag popularity is long-tailed: a few tags are on most articles
+TAGS = (
+    'mindfulness meditation breathing anxiety stress sleep gratitude resilience self-care relationships '
+    'work-life focus emotions cbt journaling habits motivation confidence grief loneliness kindness '
+    'boundaries burnout reflection community'
+).split()
+TAG_WEIGHTS = [1 / rank for rank in range(1, len(TAGS) + 1)]
+
+
+def _text(rng, words):
+    return ' '.join(rng.choice(WORDS) for _ in range(max(words, 1))).capitalize() + '.'
+
+
+def _words(rng, distribution):
+    return int(rng.lognormvariate(*distribution))
+
+
+def _at(date, rng):
+    """An aware datetime at a random time of ``date``."""
+    return timezone.make_aware(datetime.datetime.combine(date, datetime.time(rng.randint(6, 23), rng.randint(0, 59))))
+
+
+def _batches(rows, batch_size):
+    rows = iter(rows)
+    while batch := list(itertools.islice(rows, batch_size)):
+        yield batch
+
+
+# Models whose auto_now_add creation time is generated -> that field
+CREATED_FIELDS = {JournalEntry: 'timestamp', TestSession: 'date_taken'}
+
+
+def _insert(model, rows, batch_size, counts, key, sync_log=False, inserted=None):
+    """
+    bulk_create ``rows`` ``batch_size`` at a time, counting them under ``key``
+    and indexing searchable models. ``inserted(batch)`` is called with every
+    batch once its rows have ids.
+    """
+    label = model._meta.label_lower
+    created_field = CREATED_FIELDS.get(model)
+    for batch in _batches(rows, batch_size):
+        model.objects.bulk_create(batch)
+        if created_field:
+            # bulk_create stamps auto_now_add fields with now; write the generated times over it
+            for row in batch:
+                setattr(row, created_field, row.generated_at)
+            model.objects.bulk_update(batch, [created_field])
+        counts[key] += len(batch)
+        if sync_log:
+            SyncChange.objects.bulk_create(SyncChange(user_id=row.user_id, model=label, object_id=row.id) for row in batch)
+            counts['sync_changes'] += len(batch)
+        if model in search.SEARCH_FIELDS and search.is_supported():
+            search.index_objects(model, [row.id for row in batch])
+        if inserted:
+            inserted(batch)
+
+
+class UserProfile:
+    """A generated user and the parameters drawn once for them that shape all of their rows."""
+
+    def __init__(self, prefix, seed, index, distributions, today):
+        rng = random.Random(f'{seed}:{index}:profile')
+        self.user = User(username=f'{prefix}{index}', email=f'{prefix}{index}@example.com', level=rng.randint(1, 3))
+        # Generated users cannot log in; issue them tokens directly
+        self.user.set_unusable_password()
+        self.seed = f'{seed}:{index}'
+        self.dates = [today - datetime.timedelta(days=offset) for offset in range(rng.randint(*distributions['history_days']), 0, -1)]
+        self.habit_count = rng.randint(*distributions['habits'])
+        self.adherence = [rng.betavariate(*distributions['adherence']) for _ in range(self.habit_count)]
+        self.habits = []
+
+    def rng(self, kind):
+        return random.Random(f'{self.seed}:{kind}')
+
+
+def _habits(profiles):
+    for profile in profiles:
+        rng = profile.rng('habits')
+        for _ in range(profile.habit_count):
+            habit = Habits(user_id=profile.user.id, habit=_text(rng, 2), description=_text(rng, rng.randint(5, 20)))
+            profile.habits.append(habit)
+            yield habit
+
+
+def _tracking(profiles, distributions):
+    for profile in profiles:
+        rng = profile.rng('tracking')
+        for date in profile.dates:
+            if rng.random() >= distributions['tracked_rate']:
+                continue
+            for habit, adherence in zip(profile.habits, profile.adherence):
+                yield HabitTracking(user_id=profile.user.id, habit_id=habit.id, date=date, is_done=rng.random() < adherence)
+
+
+def _journal(profiles, distributions):
+    moods, weights = list(MOOD_WEIGHTS), list(MOOD_WEIGHTS.values())
+    for profile in profiles:
+        rng = profile.rng('journal')
+        for date in profile.dates:
+            if rng.random() < distributions['journal_rate']:
+                generated_at = _at(date, rng)
+                entry = JournalEntry(
+                    user_id=profile.user.id, date=date, mood=rng.choices(moods, weights)[0],
+                    content=_text(rng, _words(rng, distributions['journal_words'])),
+                )
+                entry.generated_at = generated_at
+                yield entry
+
+
+def _sessions(profiles, distributions, questions):
+    for profile in profiles:
+        rng = profile.rng('tests')
+        offset = int(rng.expovariate(1 / distributions['test_interval']))
+        while offset < len(profile.dates):
+            date = profile.dates[offset]
+            session = TestSession(user_id=profile.user.id, date_taken_local=date)
+            session.generated_at = _at(date, rng)
+            # Answers are kept on the session until it has an id
+            session.answers = [
+                (question, str(rng.randint(1, 5)))
+                for question in rng.sample(questions, min(distributions['test_responses'], len(questions)))
+            ]
+            yield session
+            offset += 1 + int(rng.expovariate(1 / distributions['test_interval']))
+
+
+def _responses(sessions):
+    for session in sessions:
+        for question, option in session.answers:
+            yield QuestionaireUserResponse(test_session_id=session.id, question_id=question.id, selected_option=option)
+
+
+def _vision_board(profiles, distributions):
+    categories = VisionBoardCategory.values
+    for profile in profiles:
+        rng = profile.rng('vision_board')
+        for _ in range(rng.randint(*distributions['vision_items'])):
+            yield VisionBoard(user_id=profile.user.id, content=_text(rng, rng.randint(3, 15)), category=rng.choice(categories), favorite=rng.random() < 0.2)
+
+
+def _articles(seed, distributions, batch_size, counts):
+    """Top the catalog up to ``distributions['articles']`` articles."""
+    rng = random.Random(f'{seed}:articles')
+    hubs = {hub.title: hub for hub in KnowledgeHub.objects.filter(title__in=KnowledgeHubCategory.values)}
+    _insert(
+        KnowledgeHub,
+        (KnowledgeHub(title=category, content=_text(rng, 60), image_url='https://example.com/hub.png')
+         for category in KnowledgeHubCategory.values if category not in hubs),
+        batch_size, counts, 'knowledge_hubs',
+    )
+    hubs = list(KnowledgeHub.objects.filter(title__in=KnowledgeHubCategory.values).order_by('title'))
+    articles = (
+        Article(
+            title=_text(rng, rng.randint(3, 8)), summary=_text(rng, rng.randint(15, 40)),
+            reflective_question_1=_text(rng, 10), reflective_question_2=_text(rng, 10),
+            content=_text(rng, _words(rng, distributions['article_words'])), level=rng.choices((1, 2, 3), (5, 3, 2))[0],
+            image_url='https://example.com/article.png', knowledgehub=rng.choice(hubs),
+            tags=','.join(sorted(set(rng.choices(TAGS, TAG_WEIGHTS, k=rng.randint(1, 5))))),
+        )
+        for _ in range(distributions['articles'])
+    )
+
+    def inserted(batch):
+        tags.tag_new_articles(batch)
+        feed.refresh([article.id for article in batch], batch_size)
+
+    existing = Article.objects.count()
+    _insert(Article, itertools.islice(articles, existing, None), batch_size, counts, 'articles', inserted=inserted)
+
+
+def _questions():
+    questions = list(DiscoveryQuestion.objects.order_by('id')[:QUESTIONS])
+    if len(questions) < QUESTIONS:
+        rng = random.Random('questions')
+        questions += DiscoveryQuestion.objects.bulk_create(
+            DiscoveryQuestion(text=_text(rng, 8)) for _ in range(QUESTIONS - len(questions))
+        )
+    return questions
+
+
+def generate(users, seed=0, prefix='scale', batch_size=2000, users_per_chunk=100, progress=None, **distributions):
+    """
+    Generate ``users`` users named ``<prefix><index>`` with their history and
+    the article catalog. ``distributions`` override DISTRIBUTIONS. Returns the
+    number of rows created per model; ``progress(counts)`` is called after
+    every chunk of users.
+    """
+    distributions = {**DISTRIBUTIONS, **distributions}
+    today = timezone.localdate()
+    counts = dict.fromkeys(
+        ['users', 'habits', 'habit_tracking', 'journal_entries', 'test_sessions', 'responses', 'vision_board', 'knowledge_hubs',
+         'articles', 'sync_changes'], 0
+    )
+
+    with transaction.atomic():
+        _articles(seed, distributions, batch_size, counts)
+        questions = _questions()
+
+    for start in range(0, users, users_per_chunk):
+        with transaction.atomic():
+            profiles = [
+                UserProfile(prefix, seed, index, distributions, today)
+                for index in range(start, min(start + users_per_chunk, users))
+            ]
+            User.objects.bulk_create(profile.user for profile in profiles)
+            counts['users'] += len(profiles)
+            user_ids = [profile.user.id for profile in profiles]
+
+            for model, key, rows in (
+                (Habits, 'habits', _habits(profiles)),
+                (HabitTracking, 'habit_tracking', _tracking(profiles, distributions)),
+                (JournalEntry, 'journal_entries', _journal(profiles, distributions)),
+                (VisionBoard, 'vision_board', _vision_board(profiles, distributions)),
+            ):
+                _insert(model, rows, batch_size, counts, key, sync_log=True)
+            _insert(
+                TestSession, _sessions(profiles, distributions, questions), batch_size, counts, 'test_sessions',
+                inserted=lambda sessions: _insert(QuestionaireUserResponse, _responses(sessions), batch_size, counts, 'responses'),
+            )
+
+            TestSession.objects.filter(user_id__in=user_ids).update(score=TestSession.score_subquery())
+            habit_stats.rebuild(user_ids, batch_size)
+            habit_calendar.rebuild(user_ids, batch_size)
+            mood_trends.rebuild(user_ids, batch_size)
+        if progress:
+            progress(counts)
+    return counts
@@ -0,0 +1,229 @@
+"""
+Full-text search for Article, KnowledgeHub and JournalEntry.
+
+Each searchable model has a side table that holds its search document:
+
+* PostgreSQL: ``<table>_search`` with a weighted ``tsvector`` column and a GIN
+  index, queried with ``to_tsquery`` and ranked with ``ts_rank``.
+* SQLite: ``<table>_fts``, an FTS5 virtual table keyed by the row id and ranked
+  with ``bm25``.
+
+Models in OWNER_FIELDS are only ever searched within one user's rows, so
+their documents also carry the owner: an indexed ``owner_id`` column next to
+the GIN index on PostgreSQL, an ``owner`` token column on SQLite that the
+match expression intersects with the search terms. A common word then costs
+the matches of one user rather than of everybody.
+
+The tables are created by migrations 0015 and 0026 and kept current by the
+signal handlers in ``signals.py``. Other database vendors fall back to
+``icontains``.
+
+Ranked search (search()) keeps only the best settings.SEARCH_RESULTS_LIMIT
+matches, so ranking never sorts more rows than that. Its results carry a
+``search_truncated`` annotation saying whether matches were left out, which
+SearchRankCursorPagination reports as ``truncated``. owner_matches() keeps
+every match.
+"""
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import BooleanField, Case, IntegerField, Q, Value, When
+from django.db.models.expressions import RawSQL
+
+from .models import Article, JournalEntry, KnowledgeHub
+
+# Searchable columns per model with their weight. Postgres uses the letter
+# weights, SQLite passes the numeric weights to bm25() in column order.
+SEARCH_FIELDS = {
+    Article: [('title', 'A', 10.0), ('tags', 'B', 6.0), ('summary', 'B', 4.0), ('content', 'C', 1.0)],
+    KnowledgeHub: [('title', 'A', 10.0), ('content', 'C', 1.0)],
+    JournalEntry: [('content', 'A', 1.0)],
+}
+
+# Models searched per owner -> the column holding the owner's id
+OWNER_FIELDS = {
+    JournalEntry: 'user_id',
+}
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def _terms(query):
+    return TOKEN_RE.findall(query.lower())[:10]
+
+
+def _pg_document(model):
+    return ' || '.join(
+        "setweight(to_tsvector('english', coalesce({0}, '')), '{1}')".format(connection.ops.quote_name(field), weight)
+        for field, weight, _ in SEARCH_FIELDS[model]
+    )
+
+
+def _pg_columns(model):
+    """(side table columns, their values selected from the model's table) on PostgreSQL."""
+    if model in OWNER_FIELDS:
+        return 'object_id, owner_id, document', f'id, {OWNER_FIELDS[model]}, {_pg_document(model)}'
+    return 'object_id, document', f'id, {_pg_document(model)}'
+
+
+def _fts_columns(model):
+    """(FTS5 columns, their values selected from the model's table) on SQLite."""
+    fields = [field for field, _, _ in SEARCH_FIELDS[model]]
+    values = [f"coalesce({field}, '')" for field in fields]
+    if model in OWNER_FIELDS:
+        fields.append('owner')
+        values.append(f"'u' || {OWNER_FIELDS[model]}")
+    return ', '.join(fields), ', '.join(values)
+
+
+def is_supported():
+    return connection.vendor in ('postgresql', 'sqlite')
+
+
+def index_object(instance):
+    """Insert or refresh the search document for a single row."""
+    index_objects(type(instance), [instance.pk])
+
+
+def index_objects(model, ids):
+    """Insert or refresh the search documents of the ``model`` rows with ``ids``."""
+    ids = list(ids)
+    if not ids:
+        return
+    table = model._meta.db_table
+    placeholders = ', '.join(['%s'] * len(ids))
+
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            columns, values = _pg_columns(model)
+            updates = ', '.join(f'{column} = EXCLUDED.{column}' for column in columns.split(', ')[1:])
+            cursor.execute(
+                f"INSERT INTO {table}_search ({columns}) SELECT {values} FROM {table} WHERE id IN ({placeholders}) "
+                f"ON CONFLICT (object_id) DO UPDATE SET {updates}",
+                ids,
+            )
+        elif connection.vendor == 'sqlite':
+            columns, values = _fts_columns(model)
+            cursor.execute(f"DELETE FROM {table}_fts WHERE rowid IN ({placeholders})", ids)
+            cursor.execute(
+                f"INSERT INTO {table}_fts (rowid, {columns}) SELECT id, {values} FROM {table} WHERE id IN ({placeholders})",
+                ids,
+            )
+
+
+def unindex_object(instance):
+    model = type(instance)
+    table = model._meta.db_table
+
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(f"DELETE FROM {table}_search WHERE object_id = %s", [instance.pk])
+        elif connection.vendor == 'sqlite':
+            cursor.execute(f"DELETE FROM {table}_fts WHERE rowid = %s", [instance.pk])
+
+
+def rebuild_index(model):
+    """Recreate every search document for ``model``. Used by the backfill command."""
+    table = model._meta.db_table
+
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            columns, values = _pg_columns(model)
+            cursor.execute(f"DELETE FROM {table}_search")
+            cursor.execute(f"INSERT INTO {table}_search ({columns}) SELECT {values} FROM {table}")
+        elif connection.vendor == 'sqlite':
+            columns, values = _fts_columns(model)
+            cursor.execute(f"DELETE FROM {table}_fts")
+            cursor.execute(f"INSERT INTO {table}_fts (rowid, {columns}) SELECT id, {values} FROM {table}")
+
+
+def search_ids(model, query, limit=None):
+    """
+    Return the ids of ``model`` rows matching ``query``, best match first.
+    Every term is prefix matched so partial words typed by the user still hit.
+    """
+    terms = _terms(query)
+    if not terms:
+        return []
+    limit = limit or settings.SEARCH_RESULTS_LIMIT
+    table = model._meta.db_table
+
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            tsquery = ' & '.join(f'{term}:*' for term in terms)
+            cursor.execute(
+                f"SELECT object_id FROM {table}_search, to_tsquery('english', %s) query "
+                f"WHERE document @@ query ORDER BY ts_rank(document, query) DESC, object_id DESC LIMIT %s",
+                [tsquery, limit],
+            )
+        else:
+            match = ' '.join(f'"{term}"*' for term in terms)
+            weights = ', '.join(str(weight) for _, _, weight in SEARCH_FIELDS[model])
+            cursor.execute(
+                f"SELECT rowid FROM {table}_fts WHERE {table}_fts MATCH %s "
+                f"ORDER BY bm25({table}_fts, {weights}), rowid DESC LIMIT %s",
+                [match, limit],
+            )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def search(queryset, query, fallback_fields):
+    """
+    Filter ``queryset`` down to the best settings.SEARCH_RESULTS_LIMIT rows
+    matching ``query``, annotated with a ``search_rank`` (0 is the best match)
+    that callers and paginators order by and with ``search_truncated``, True
+    when more rows matched than were kept.
+    """
+    if not is_supported():
+        condition = Q()
+        for field in fallback_fields:
+            condition |= Q(**{f'{field}__icontains': query})
+        return queryset.filter(condition).annotate(
+            search_rank=Value(0, output_field=IntegerField()), search_truncated=Value(False, output_field=BooleanField()),
+        )
+
+    limit = settings.SEARCH_RESULTS_LIMIT
+    # One extra id tells whether anything was cut off
+    ids = search_ids(queryset.model, query, limit + 1)
+    if not ids:
+        return queryset.none()
+    truncated, ids = len(ids) > limit, ids[:limit]
+    rank = Case(*[When(id=pk, then=position) for position, pk in enumerate(ids)], output_field=IntegerField())
+    return queryset.filter(id__in=ids).annotate(
+        search_rank=rank, search_truncated=Value(truncated, output_field=BooleanField()),
+    )
+
+
+def owner_matches(queryset, query, owner_id, fallback_fields):
+    """
+    Filter ``queryset`` of a model in OWNER_FIELDS down to ``owner_id``'s rows
+    matching every term of ``query``, prefix matched. Unlike search() every
+    match is kept, so the result can be ordered, paged and counted like any
+    other queryset.
+    """
+    model = queryset.model
+    queryset = queryset.filter(**{OWNER_FIELDS[model]: owner_id})
+    if not is_supported():
+        condition = Q()
+        for field in fallback_fields:
+            condition |= Q(**{f'{field}__icontains': query})
+        return queryset.filter(condition)
+
+    terms = _terms(query)
+    if not terms:
+        return queryset.none()
+    table = model._meta.db_table
+    if connection.vendor == 'postgresql':
+        sql = (
+            f"SELECT object_id FROM {table}_search "
+            f"WHERE owner_id = %s AND document @@ to_tsquery('english', %s)"
+        )
+        params = [owner_id, ' & '.join(f'{term}:*' for term in terms)]
+    else:
+        # Terms are kept to the searchable columns so they cannot match an owner token
+        fields = ' '.join(field for field, _, _ in SEARCH_FIELDS[model])
+        match = f'owner : "u{int(owner_id)}" ' + ' '.join(f'{{{fields}}} : "{term}"*' for term in terms)
+        sql = f"SELECT rowid FROM {table}_fts WHERE {table}_fts MATCH %s"
+        params = [match]
+    return queryset.filter(id__in=RawSQL(sql, params))
@@ -1,5 +1,9 @@
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
 from rest_framework import serializers
 from .models import *
+from . import habit_calendar, habit_stats, response_cache
 from authentication_app.serializers import UserSerializer
 
 class DiscoveryQuestionSerializer(serializers.ModelSerializer):
@@ -34,17 +38,86 @@ class QuestionaireUserResponseSerializer(serializers.ModelSerializer):
 
     def validate(self, attrs):
         test_session = attrs.get('test_session')
-        question_id = attrs.pop('question_id')
-        attrs['question'] = DiscoveryQuestion.objects.get(id=question_id)
-        if test_session and QuestionaireUserResponse.objects.filter(test_session=test_session, question=attrs['question']).exists():
-            raise serializers.ValidationError("Response for this question already exists.")
+        if 'question_id' in attrs:  # absent from partial updates
+            attrs['question'] = DiscoveryQuestion.objects.get(id=attrs.pop('question_id'))
+            if test_session and QuestionaireUserResponse.objects.filter(test_session=test_session, question=attrs['question']).exists():
+                raise serializers.ValidationError("Response for this question already exists.")
+        # selected_option is rendered through its display label but written as the choice key
+        if 'get_selected_option_display' in attrs:
+            attrs['selected_option'] = attrs.pop('get_selected_option_display')
+            if attrs['selected_option'] not in QuestionaireUserResponse.SCORE_MAP:
+                raise serializers.ValidationError({"selected_option": "Select a value between 1 and 5."})
         return attrs
 
     def create(self, validated_data):
-        res = QuestionaireUserResponse.objects.create(**validated_data)
-        res.test_session.update_score()
-        return res
+        # The session score is kept current by the post_save signal in signals.py
+        return QuestionaireUserResponse.objects.create(**validated_data)
     
+class QuestionaireSubmissionItemSerializer(serializers.Serializer):
+    question_id = serializers.IntegerField()
+    # Zero-based index into LIKERT_CHOICES, as sent by the questionnaire screen
+    selected_option = serializers.IntegerField(min_value=0, max_value=len(QuestionaireUserResponse.LIKERT_CHOICES) - 1)
+
+
+class QuestionaireSubmissionSerializer(serializers.Serializer):
+    test_session = serializers.IntegerField(required=False)
+    responses = QuestionaireSubmissionItemSerializer(many=True, allow_empty=False)
+
+    def validate_test_session(self, value):
+        if not TestSession.objects.filter(id=value, user=self.context["request"].user).exists():
+            raise serializers.ValidationError("Test session not found.")
+        return value
+
+    def validate_responses(self, responses):
+        question_ids = [response['question_id'] for response in responses]
+        if len(set(question_ids)) != len(question_ids):
+            raise serializers.ValidationError("Each question can only be answered once.")
+
+        known_ids = set(DiscoveryQuestion.objects.filter(id__in=question_ids).values_list('id', flat=True))
+        missing = sorted(set(question_ids) - known_ids)
+        if missing:
+            raise serializers.ValidationError(f"Unknown question ids: {missing}")
+        return responses
+
+    def create(self, validated_data):
+        responses = [
+            QuestionaireUserResponse(
+                question_id=response['question_id'],
+                selected_option=QuestionaireUserResponse.LIKERT_CHOICES[response['selected_option']][0],
+            )
+            for response in validated_data['responses']
+        ]
+
+        with transaction.atomic():
+            test_session_id = validated_data.get('test_session')
+            if test_session_id is None:
+                score = sum(response.get_numeric_score() for response in responses)
+                try:
+                    with transaction.atomic():
+                        test_session = TestSession.objects.create(user=self.context["request"].user, score=score)
+                except IntegrityError:
+                    raise serializers.ValidationError("You already have a test session for today.")
+            else:
+                test_session = TestSession(id=test_session_id)
+
+            for response in responses:
+                response.test_session = test_session
+            # Answers to questions already in the session replace the old ones
+            QuestionaireUserResponse.objects.bulk_create(
+                responses,
+                update_conflicts=True,
+                unique_fields=['test_session', 'question'],
+                update_fields=['selected_option'],
+            )
+
+            if test_session_id is not None:
+                TestSession.objects.filter(id=test_session_id).update(score=TestSession.score_subquery())
+                test_session = TestSession.objects.get(id=test_session_id)
+        # bulk_create() and update() send no signals
+        response_cache.bump_version(QuestionaireUserResponse, self.context["request"].user.id)
+        return test_session
+
+
 class HabitsSerializer(serializers.ModelSerializer):
     user = serializers.StringRelatedField()
     
@@ -52,6 +125,13 @@ class HabitsSerializer(serializers.ModelSerializer):
         model = Habits
         fields = ['id', 'habit','description' ,'user']
 
+class DashboardHabitSerializer(HabitsSerializer):
+    tracking_id = serializers.IntegerField(read_only=True)
+    is_done = serializers.BooleanField(read_only=True)
+
+    class Meta(HabitsSerializer.Meta):
+        fields = HabitsSerializer.Meta.fields + ['tracking_id', 'is_done']
+
 class HabitTrackingSerializer(serializers.ModelSerializer):
     habit_id = serializers.IntegerField(write_only=True)  
     date = serializers.DateField(format="%Y-%m-%d", required=False)
@@ -63,6 +143,8 @@ class HabitTrackingSerializer(serializers.ModelSerializer):
         fields = ['id', 'user', 'habit', 'habit_id', 'date', 'is_done']
 
     def validate(self, attrs):
+        if "habit_id" not in attrs and self.instance is not None:
+            return attrs  # partial update that keeps the habit
         habit_id = attrs.pop("habit_id")  
         habit = Habits.objects.filter(id=habit_id).first()  
 
@@ -83,6 +165,77 @@ class HabitTrackingSerializer(serializers.ModelSerializer):
         return super().create(validated_data)
     
 
+class HabitCheckInItemSerializer(serializers.Serializer):
+    habit_id = serializers.IntegerField()
+    date = serializers.DateField(required=False)
+    is_done = serializers.BooleanField(default=True)
+
+
+class HabitCheckInSerializer(serializers.Serializer):
+    check_ins = HabitCheckInItemSerializer(many=True, allow_empty=False)
+
+    def validate_check_ins(self, check_ins):
+        user = self.context["request"].user
+        today = timezone.localdate()
+        for check_in in check_ins:
+            check_in.setdefault('date', today)
+
+        keys = [(check_in['habit_id'], check_in['date']) for check_in in check_ins]
+        if len(set(keys)) != len(keys):
+            raise serializers.ValidationError("Each habit can only be checked in once per day.")
+
+        habit_ids = {check_in['habit_id'] for check_in in check_ins}
+        owned = set(
+            Habits.objects.filter(Q(user=user) | Q(user__isnull=True), id__in=habit_ids).values_list('id', flat=True)
+        )
+        if habit_ids - owned:
+            raise serializers.ValidationError(f"You can only track habits that belong to you: {sorted(habit_ids - owned)}")
+        return check_ins
+
+    def create(self, validated_data):
+        user = self.context["request"].user
+        check_ins = validated_data['check_ins']
+        habit_ids = {check_in['habit_id'] for check_in in check_ins}
+        dates = {check_in['date'] for check_in in check_ins}
+
+        with transaction.atomic():
+            previous = {
+                (habit_id, date): is_done
+                for habit_id, date, is_done in HabitTracking.objects.filter(
+                    user=user, habit_id__in=habit_ids, date__in=dates
+                ).values_list('habit_id', 'date', 'is_done')
+            }
+            HabitTracking.objects.bulk_create(
+                [
+                    HabitTracking(user=user, habit_id=check_in['habit_id'], date=check_in['date'], is_done=check_in['is_done'])
+                    for check_in in check_ins
+                ],
+                update_conflicts=True,
+                unique_fields=['user', 'habit', 'date'],
+                update_fields=['is_done'],
+            )
+
+            # bulk_create sends no signals, so update the derived tables here
+            changes = [
+                (check_in['habit_id'], check_in['date'], check_in['is_done'])
+                for check_in in check_ins
+                if previous.get((check_in['habit_id'], check_in['date']), False) != check_in['is_done']
+            ]
+            habit_stats.apply_days(user.id, changes)
+            habit_calendar.apply_days(user.id, changes)
+
+            condition = Q()
+            for habit_id, date in {(check_in['habit_id'], check_in['date']) for check_in in check_ins}:
+                condition |= Q(habit_id=habit_id, date=date)
+            rows = list(
+                HabitTracking.objects.filter(condition, user=user)
+                .select_related('user', 'habit__user').order_by('date', 'habit_id')
+            )
+            SyncChange.record(HabitTracking, [(row.id, row.user_id) for row in rows])
+        response_cache.bump_version(HabitTracking, user.id)
+        return rows
+
+
 class JournalEntrySerializer(serializers.ModelSerializer):
     user = serializers.StringRelatedField()
     date = serializers.SerializerMethodField()
@@ -106,12 +259,28 @@ class KnowledgeHubSerializer(serializers.ModelSerializer):
 
 
         
+class KnowledgeHubSummarySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = KnowledgeHub
+        fields = ['id', 'title']
+
+
 class ArticleSerializer(serializers.ModelSerializer):
     knowledgehub = KnowledgeHubSerializer(read_only=True)
 
     class Meta:
         model = Article
-        fields = '__all__'
+        # tag_set mirrors `tags`
+        exclude = ['tag_set']
+
+
+class ArticleListSerializer(serializers.ModelSerializer):
+    """The article card shown in lists: no body, reflective questions or hub content."""
+    knowledgehub = KnowledgeHubSummarySerializer(read_only=True)
+
+    class Meta:
+        model = Article
+        fields = ['id', 'title', 'summary', 'image_url', 'tags', 'level', 'date_added', 'knowledgehub']
 
 class VisionBoardSerializer(serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
@@ -125,8 +294,18 @@ class VisionBoardSerializer(serializers.ModelSerializer):
         return attrs
 
 
+class SyncMutationSerializer(serializers.Serializer):
+    collection = serializers.CharField()
+    op = serializers.ChoiceField(choices=['upsert', 'delete'])
+    id = serializers.IntegerField(required=False)
+    client_id = serializers.CharField(required=False, max_length=64)
+    data = serializers.DictField(required=False, default=dict)
 
+    def validate(self, attrs):
+        if attrs['op'] == 'delete' and 'id' not in attrs:
+            raise serializers.ValidationError("Deletes need the id of the row to delete.")
+        return attrs
 
 
-    
-    
+class SyncPushSerializer(serializers.Serializer):
+    mutations = SyncMutationSerializer(many=True, allow_empty=False)
@@ -0,0 +1,175 @@
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from authentication_app.models import TokenUser, User
+
+from . import feed, habit_stats, mood_trends, response_cache, search, tags
+from .models import (
+    Article, DiscoveryQuestion, HabitTracking, Habits, JournalEntry, KnowledgeHub, QuestionaireUserResponse,
+    SyncChange, TestSession, VisionBoard,
+)
+
+# Models whose changes invalidate cached API responses
+CACHED_MODELS = [
+    User, TokenUser, DiscoveryQuestion, TestSession, QuestionaireUserResponse, Habits, HabitTracking, JournalEntry,
+    KnowledgeHub, Article, VisionBoard,
+]
+
+# Models offered to offline clients through the delta sync API
+SYNCED_MODELS = [JournalEntry, Habits, HabitTracking, VisionBoard]
+
+
+@receiver(post_save, sender=Article)
+@receiver(post_save, sender=KnowledgeHub)
+@receiver(post_save, sender=JournalEntry)
+def update_search_index(sender, instance, raw=False, **kwargs):
+    if raw or not search.is_supported():
+        return
+    search.index_object(instance)
+
+
+@receiver(post_delete, sender=Article)
+@receiver(post_delete, sender=KnowledgeHub)
+@receiver(post_delete, sender=JournalEntry)
+def remove_from_search_index(sender, instance, **kwargs):
+    if search.is_supported():
+        search.unindex_object(instance)
+
+
+@receiver(post_save, sender=Article)
+def update_article_tags(sender, instance, created, raw=False, **kwargs):
+    if not raw:
+        tags.sync_article(instance, created)
+
+
+@receiver(pre_delete, sender=Article)
+def remember_article_tags(sender, instance, **kwargs):
+    # The tag_set rows are gone by the time post_delete runs
+    instance._deleted_tag_ids = list(instance.tag_set.values_list('id', flat=True))
+
+
+@receiver(post_delete, sender=Article)
+def recount_article_tags(sender, instance, **kwargs):
+    tags.refresh_counts(getattr(instance, '_deleted_tag_ids', []))
+
+
+@receiver(post_save, sender=Article)
+def update_article_ranks(sender, instance, raw=False, **kwargs):
+    if not raw:
+        feed.sync_article(instance)
+
+
+@receiver(post_save, sender=KnowledgeHub)
+def update_knowledgehub_ranks(sender, instance, created, raw=False, **kwargs):
+    if not raw:
+        feed.sync_knowledgehub(instance, created)
+
+
+@receiver(pre_delete, sender=KnowledgeHub)
+def remember_knowledgehub_articles(sender, instance, **kwargs):
+    # Its articles lose the hub's level bonus once they are detached from it
+    instance._deleted_article_ids = list(Article.objects.filter(knowledgehub=instance).values_list('id', flat=True))
+
+
+@receiver(post_delete, sender=KnowledgeHub)
+def rerank_knowledgehub_articles(sender, instance, **kwargs):
+    feed.refresh(getattr(instance, '_deleted_article_ids', []))
+
+
+@receiver(pre_save, sender=QuestionaireUserResponse)
+@receiver(pre_delete, sender=QuestionaireUserResponse)
+def remember_response_score(sender, instance, raw=False, **kwargs):
+    # Rows loaded with only()/defer(), or never loaded, have no snapshot;
+    # read the stored answer so its score is replaced rather than added again.
+    if raw or instance.pk is None or hasattr(instance, '_scored'):
+        return
+    stored = QuestionaireUserResponse.objects.filter(pk=instance.pk).values_list('test_session_id', 'selected_option').first()
+    if stored is not None:
+        instance._scored = (stored[0], QuestionaireUserResponse.SCORE_MAP.get(stored[1], 1))
+
+
+@receiver(post_save, sender=QuestionaireUserResponse)
+def apply_response_score(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    score = instance.get_numeric_score()
+    previous_session_id, previous_score = getattr(instance, '_scored', (None, 0))
+    if created or previous_session_id is None:
+        TestSession.adjust_score(instance.test_session_id, score)
+    elif previous_session_id != instance.test_session_id:
+        TestSession.adjust_score(previous_session_id, -previous_score)
+        TestSession.adjust_score(instance.test_session_id, score)
+    else:
+        TestSession.adjust_score(instance.test_session_id, score - previous_score)
+    instance._scored = (instance.test_session_id, score)
+
+
+@receiver(post_delete, sender=QuestionaireUserResponse)
+def revert_response_score(sender, instance, **kwargs):
+    previous_session_id, previous_score = getattr(instance, '_scored', (None, 0))
+    if previous_session_id is not None:
+        TestSession.adjust_score(previous_session_id, -previous_score)
+
+
+@receiver(pre_save, sender=HabitTracking)
+@receiver(pre_delete, sender=HabitTracking)
+def remember_tracked_state(sender, instance, raw=False, **kwargs):
+    # Rows loaded with only()/defer(), or never loaded, have no snapshot;
+    # read the stored state so the change is not applied from scratch.
+    if raw or instance.pk is None or hasattr(instance, '_tracked'):
+        return
+    instance._tracked = (
+        HabitTracking.objects.filter(pk=instance.pk).values_list('user_id', 'habit_id', 'date', 'is_done').first()
+    )
+
+
+@receiver(post_save, sender=HabitTracking)
+def update_habit_stats(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    current = instance.tracked_state()
+    habit_stats.record_change(getattr(instance, '_tracked', None), current)
+    instance._tracked = current
+
+
+@receiver(post_delete, sender=HabitTracking)
+def revert_habit_stats(sender, instance, **kwargs):
+    habit_stats.record_change(getattr(instance, '_tracked', None), None)
+
+
+@receiver(post_save, sender=JournalEntry)
+def update_mood_days(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    current = instance.mood_state()
+    mood_trends.record_change(getattr(instance, '_mood_day', None), current)
+    instance._mood_day = current
+
+
+@receiver(post_delete, sender=JournalEntry)
+def revert_mood_days(sender, instance, **kwargs):
+    mood_trends.record_change(getattr(instance, '_mood_day', instance.mood_state()), None)
+
+
+def invalidate_cached_responses(sender, instance, raw=False, **kwargs):
+    response_cache.bump_version(sender, response_cache.owner_id(instance))
+
+
+for model in CACHED_MODELS:
+    post_save.connect(invalidate_cached_responses, sender=model, dispatch_uid=f'invalidate_cache_save_{model.__name__}')
+    post_delete.connect(invalidate_cached_responses, sender=model, dispatch_uid=f'invalidate_cache_delete_{model.__name__}')
+
+
+def log_sync_change(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    SyncChange.record(sender, [(instance.pk, instance.user_id)])
+
+
+def log_sync_tombstone(sender, instance, **kwargs):
+    SyncChange.record(sender, [(instance.pk, instance.user_id)], deleted=True)
+
+
+for model in SYNCED_MODELS:
+    post_save.connect(log_sync_change, sender=model, dispatch_uid=f'sync_change_save_{model.__name__}')
+    post_delete.connect(log_sync_tombstone, sender=model, dispatch_uid=f'sync_change_delete_{model.__name__}')
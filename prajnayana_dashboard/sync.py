@@ -0,0 +1,190 @@
+"""
+Delta sync for offline clients.
+
+Every save or delete of a synced row is logged in SyncChange (see
+signals.py), whose ids form a monotonic change sequence. A pull returns the
+rows behind the entries after the client's token plus tombstones for deleted
+ones, so its cost follows what changed rather than the size of the history.
+
+Ids are allocated when a row is inserted, not when it commits, so a change
+can become visible after one with a higher id. The token therefore only
+moves past changes older than settings.SYNC_SETTLE_SECONDS; newer ones are
+returned but sent again by the next pull, which is harmless because upserts
+and tombstones are idempotent.
+
+A push applies a batch of client mutations in one transaction through the
+same serializers the regular endpoints use. Rows created by a mutation are
+remembered by its client_id (SyncClientRow), so retrying a push whose
+response was lost updates those rows instead of duplicating them.
+"""
+import datetime
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework import serializers
+
+from .mixins import get_related_paths
+from .models import HabitTracking, Habits, JournalEntry, SyncChange, SyncClientRow, VisionBoard
+from .serializers import HabitTrackingSerializer, HabitsSerializer, JournalEntrySerializer, VisionBoardSerializer
+
+# Collection name used by clients -> (model, serializer)
+SYNC_COLLECTIONS = {
+    'journal': (JournalEntry, JournalEntrySerializer),
+    'habits': (Habits, HabitsSerializer),
+    'habit_tracking': (HabitTracking, HabitTrackingSerializer),
+    'vision_board': (VisionBoard, VisionBoardSerializer),
+}
+
+
+def parse_token(token):
+    if not token:
+        return 0
+    try:
+        return max(int(token), 0)
+    except ValueError:
+        raise serializers.ValidationError({"since": "Invalid sync token."})
+
+
+def pull(request, since, limit=None):
+    """Changes visible to the requesting user after the ``since`` token, oldest first."""
+    limit = limit or settings.SYNC_PAGE_SIZE
+    changes = list(
+        SyncChange.objects.filter(Q(user=request.user) | Q(user__isnull=True), id__gt=since).order_by('id')[:limit + 1]
+    )
+    has_more = len(changes) > limit
+    changes = changes[:limit]
+    context = {'request': request}
+
+    settled_before = timezone.now() - datetime.timedelta(seconds=settings.SYNC_SETTLE_SECONDS)
+    token = since
+    for change in changes:
+        if change.created_at >= settled_before:
+            # Everything after this may still be preceded by uncommitted changes,
+            # so the client pulls again from here rather than paging on
+            has_more = False
+            break
+        token = change.id
+
+    collections = {}
+    for name, (model, serializer_class) in SYNC_COLLECTIONS.items():
+        label = model._meta.label_lower
+        upserted = [change.object_id for change in changes if change.model == label and not change.deleted]
+        rows = []
+        if upserted:
+            select_related, prefetch_related = get_related_paths(serializer_class(context=context), model)
+            queryset = (
+                model.objects.filter(id__in=upserted)
+                .select_related(*select_related).prefetch_related(*prefetch_related).order_by('id')
+            )
+            rows = serializer_class(queryset, many=True, context=context).data
+        collections[name] = {
+            'upserted': rows,
+            'deleted': [change.object_id for change in changes if change.model == label and change.deleted],
+        }
+
+    return {
+        'token': str(token),
+        'has_more': has_more,
+        'changes': collections,
+    }
+
+
+def push(request, mutations):
+    """
+    Apply client mutations in order inside one transaction. Any invalid
+    mutation rolls back the whole batch and is reported with its index.
+    The rows mutations refer to and their SyncClientRow entries are read
+    with one query per collection up front and written back in bulk.
+    """
+    user = request.user
+    context = {'request': request}
+    results = []
+    for index, mutation in enumerate(mutations):
+        if mutation['collection'] not in SYNC_COLLECTIONS:
+            raise serializers.ValidationError({'index': index, 'errors': {'collection': 'Unknown collection.'}})
+    client_rows = _client_rows(user, mutations)
+    instances = _instances(user, mutations, client_rows)
+    touched_client_rows = []
+
+    with transaction.atomic():
+        for index, mutation in enumerate(mutations):
+            model, serializer_class = SYNC_COLLECTIONS[mutation['collection']]
+            label = model._meta.label_lower
+
+            if mutation['op'] == 'delete':
+                model.objects.filter(user=user, id=mutation['id']).delete()
+                instances.pop((label, mutation['id']), None)
+                results.append({'index': index, 'id': mutation['id'], 'status': 'deleted'})
+                continue
+
+            instance = None
+            client_row = client_rows.get((label, mutation.get('client_id')))
+            if 'id' in mutation:
+                instance = instances.get((label, mutation['id']))
+                if instance is None:
+                    raise serializers.ValidationError({'index': index, 'errors': {'id': 'Not found.'}})
+            elif client_row is not None:
+                # A retry of a mutation that was applied: update what it created
+                instance = instances.get((label, client_row.object_id))
+
+            serializer = serializer_class(instance, data=mutation['data'], partial=instance is not None, context=context)
+            if not serializer.is_valid():
+                raise serializers.ValidationError({'index': index, 'errors': serializer.errors})
+            # No savepoint: a failed save rolls back the whole batch anyway
+            try:
+                saved = serializer.save(user=user)
+            except IntegrityError:
+                raise serializers.ValidationError({'index': index, 'errors': 'Conflicts with an existing row.'})
+            instances[(label, saved.id)] = saved
+
+            result = {'index': index, 'id': saved.id, 'status': 'created' if instance is None else 'updated'}
+            if 'client_id' in mutation:
+                result['client_id'] = mutation['client_id']
+                if instance is None:
+                    if client_row is None:
+                        # The row it created earlier was deleted since, so it points at the new one
+                        client_row = client_rows[(label, mutation['client_id'])] = SyncClientRow(
+                            user=user, model=label, client_id=mutation['client_id'],
+                        )
+                    client_row.object_id = saved.id
+                    touched_client_rows.append(client_row)
+            results.append(result)
+
+        touched_client_rows = {id(row): row for row in touched_client_rows}.values()
+        updated = [row for row in touched_client_rows if row.pk is not None]
+        SyncClientRow.objects.bulk_create([row for row in touched_client_rows if row.pk is None])
+        SyncClientRow.objects.bulk_update(updated, ['object_id'])
+
+    return {'results': results}
+
+
+def _client_rows(user, mutations):
+    """(model label, client_id) -> SyncClientRow of the client_ids in ``mutations``."""
+    client_ids = {mutation['client_id'] for mutation in mutations if 'client_id' in mutation}
+    if not client_ids:
+        return {}
+    return {(row.model, row.client_id): row for row in SyncClientRow.objects.filter(user=user, client_id__in=client_ids)}
+
+
+def _instances(user, mutations, client_rows):
+    """(model label, id) -> the user's rows that ``mutations`` update, one query per collection."""
+    ids = {}
+    for mutation in mutations:
+        if mutation['op'] == 'delete':
+            continue
+        model, _ = SYNC_COLLECTIONS[mutation['collection']]
+        label = model._meta.label_lower
+        client_row = client_rows.get((label, mutation.get('client_id')))
+        if 'id' in mutation:
+            ids.setdefault(model, set()).add(mutation['id'])
+        elif client_row is not None:
+            ids.setdefault(model, set()).add(client_row.object_id)
+
+    instances = {}
+    for model, model_ids in ids.items():
+        label = model._meta.label_lower
+        for instance in model.objects.filter(user=user, id__in=model_ids):
+            instances[(label, instance.id)] = instance
+    return instances
@@ -0,0 +1,100 @@
+"""
+Normalized article tags.
+
+Article.tags stays the editable comma-separated string. Saving an article
+derives its Tag rows and Article.tag_set from it (see signals.py) and
+recounts the tags it gained or lost, so the facet counts in Tag.article_count
+and TagCount are read, never computed, when tags are browsed. Names are
+matched exactly after normalization, so "calm" no longer matches "calmness".
+"""
+from django.db import transaction
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Article, Tag, TagCount
+
+MAX_LENGTH = Tag._meta.get_field('name').max_length
+
+
+def normalize(name):
+    return ' '.join(name.split()).lower()[:MAX_LENGTH]
+
+
+def parse(value):
+    """The distinct normalized tag names in a comma-separated string, in order."""
+    names = []
+    for name in (value or '').split(','):
+        name = normalize(name)
+        if name and name not in names:
+            names.append(name)
+    return names
+
+
+def get_tags(names):
+    """Tag rows for ``names``, created when missing."""
+    if not names:
+        return []
+    Tag.objects.bulk_create([Tag(name=name) for name in names], ignore_conflicts=True)
+    return list(Tag.objects.filter(name__in=names))
+
+
+def refresh_counts(tag_ids):
+    """Recount the articles carrying each of ``tag_ids``, overall and per knowledge hub."""
+    tag_ids = set(tag_ids)
+    if not tag_ids:
+        return
+    through = Article.tag_set.through
+    totals = through.objects.filter(tag_id=OuterRef('pk')).values('tag_id').annotate(total=Count('id')).values('total')
+    with transaction.atomic():
+        Tag.objects.filter(id__in=tag_ids).update(article_count=Coalesce(Subquery(totals), 0))
+        TagCount.objects.filter(tag_id__in=tag_ids).delete()
+        TagCount.objects.bulk_create(
+            TagCount(tag_id=row['tag_id'], knowledgehub_id=row['article__knowledgehub_id'], count=row['count'])
+            for row in through.objects.filter(tag_id__in=tag_ids).exclude(article__knowledgehub=None)
+            .values('tag_id', 'article__knowledgehub_id').annotate(count=Count('id'))
+        )
+
+
+def sync_article(article, created=False):
+    """Point ``article``'s tag_set at the tags named in its ``tags`` string and recount what changed."""
+    if getattr(article, '_tagged', None) == article.tagged_state():
+        return
+    article._tagged = article.tagged_state()
+    previous = set() if created else set(article.tag_set.values_list('id', flat=True))
+    tags = get_tags(parse(article.tags))
+    current = {tag.id for tag in tags}
+    if current != previous:
+        article.tag_set.set(tags)
+    # Every tag of the article moves between hubs when the hub changes
+    refresh_counts(previous | current)
+
+
+def tag_new_articles(articles):
+    """sync_article for a batch of articles that were just bulk created."""
+    tag_ids = {tag.name: tag.id for tag in get_tags(list({name for article in articles for name in parse(article.tags)}))}
+    through = Article.tag_set.through
+    through.objects.bulk_create(
+        through(article_id=article.id, tag_id=tag_ids[name]) for article in articles for name in parse(article.tags)
+    )
+    refresh_counts(tag_ids.values())
+
+
+def rebuild(batch_size=1000):
+    """Recreate every article's tag_set and all counts from the tag strings."""
+    through = Article.tag_set.through
+    with transaction.atomic():
+        through.objects.all().delete()
+        rows = Article.objects.exclude(tags=None).values_list('id', 'tags').iterator(chunk_size=batch_size)
+        batch, tag_ids = [], {}
+        for article_id, value in rows:
+            names = parse(value)
+            missing = [name for name in names if name not in tag_ids]
+            if missing:
+                tag_ids.update((tag.name, tag.id) for tag in get_tags(missing))
+            batch += [through(article_id=article_id, tag_id=tag_ids[name]) for name in names]
+            if len(batch) >= batch_size:
+                through.objects.bulk_create(batch)
+                batch = []
+        through.objects.bulk_create(batch)
+        refresh_counts(Tag.objects.values_list('id', flat=True))
+    return len(tag_ids)
@@ -1,3 +1,1546 @@
-from django.test import TestCase
+import datetime
+import io
+import json
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.http import http_date
+from rest_framework import serializers
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from authentication_app.authentication import add_user_claims
+from authentication_app.models import TokenUser, User
+
+from . import async_views, checks, feed, habit_calendar, habit_stats, mood_trends, search, tags
+from .models import (
+    Article, ArticleRank, DiscoveryQuestion, HabitCalendar, HabitStats, HabitTracking, Habits, JournalEntry, KnowledgeHub, MoodDay,
+    QuestionaireUserResponse, SyncChange, SyncClientRow, TestSession, VisionBoard,
+)
+from .mixins import get_loaded_fields, get_related_paths
+from .serializers import ArticleListSerializer, HabitsSerializer, HabitTrackingSerializer, QuestionaireUserResponseSerializer
+
+# Every budget is checked with this many rows behind the endpoint, so a query
+# count that grows with the data fails the test.
+ROW_COUNTS = (1, 10, 1000)
+
+
+class QueryBudgetTestCase(TestCase):
+    """
+    Base class for the query budget tests. Subclasses implement seed(user,
+    rows) and call assertQueryBudget(), which runs the request once per size in
+    ROW_COUNTS, each time for a fresh user owning that many rows, and expects
+    the same number of queries every time. Its ``check`` then asserts what the
+    response holds, so a budget cannot be met by doing less of the work.
+    """
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def seed(self, user, rows):
+        """Create ``rows`` rows for ``user`` and return whatever the request needs."""
+        raise NotImplementedError
+
+    def assertQueryBudget(self, budget, request, check=None):
+        """``check(response, seeded, rows)``, when given, asserts the response content."""
+        for rows in ROW_COUNTS:
+            with self.subTest(rows=rows):
+                user = User.objects.create_user(f'user{rows}-{self._testMethodName}', password='secret-pass-123')
+                self.client.force_authenticate(user)
+                cache.clear()
+                seeded = self.seed(user, rows)
+                with self.assertNumQueries(budget):
+                    response = request(seeded)
+                self.assertLess(response.status_code, 400, getattr(response, 'data', None))
+                if check is not None:
+                    check(response, seeded, rows)
+
+
+def days_ago(days):
+    return timezone.localdate() - datetime.timedelta(days=days)
+
+
+class DiscoveryQuestionQueryTests(QueryBudgetTestCase):
+    def seed(self, user, rows):
+        DiscoveryQuestion.objects.bulk_create(DiscoveryQuestion(text=f'Question {i}') for i in range(rows))
+        return DiscoveryQuestion.objects.order_by('-id').first()
+
+    def test_list(self):
+        self.assertQueryBudget(1, lambda question: self.client.get('/api/discovery_questions/'))
+
+    def test_retrieve(self):
+        self.assertQueryBudget(1, lambda question: self.client.get(f'/api/discovery_questions/{question.id}/'))
+
+    def test_create(self):
+        self.assertQueryBudget(1, lambda question: self.client.post('/api/discovery_questions/', {'text': 'New'}, format='json'))
+
+    def test_update(self):
+        self.assertQueryBudget(
+            2, lambda question: self.client.put(f'/api/discovery_questions/{question.id}/', {'text': 'Changed'}, format='json')
+        )
+
+    def test_partial_update(self):
+        self.assertQueryBudget(
+            2, lambda question: self.client.patch(f'/api/discovery_questions/{question.id}/', {'text': 'Changed'}, format='json')
+        )
+
+    def test_destroy(self):
+        self.assertQueryBudget(3, lambda question: self.client.delete(f'/api/discovery_questions/{question.id}/'))
+
+
+class TestSessionQueryTests(QueryBudgetTestCase):
+    def seed(self, user, rows):
+        sessions = TestSession.objects.bulk_create(
+            TestSession(user=user, score=i % 50, date_taken_local=days_ago(i + 1)) for i in range(rows)
+        )
+        return sessions[0]
+
+    def test_list(self):
+        self.assertQueryBudget(1, lambda session: self.client.get('/api/test_sessions/'))
+
+    def test_retrieve(self):
+        self.assertQueryBudget(1, lambda session: self.client.get(f'/api/test_sessions/{session.id}/'))
+
+    def test_create(self):
+        self.assertQueryBudget(3, lambda session: self.client.post('/api/test_sessions/', {}, format='json'))
+
+    def test_update(self):
+        self.assertQueryBudget(2, lambda session: self.client.put(f'/api/test_sessions/{session.id}/', {'score': 5}, format='json'))
+
+    def test_partial_update(self):
+        self.assertQueryBudget(2, lambda session: self.client.patch(f'/api/test_sessions/{session.id}/', {'score': 5}, format='json'))
+
+    def test_destroy(self):
+        self.assertQueryBudget(3, lambda session: self.client.delete(f'/api/test_sessions/{session.id}/'))
+
+
+class QuestionaireUserResponseQueryTests(QueryBudgetTestCase):
+    def seed(self, user, rows):
+        questions = DiscoveryQuestion.objects.bulk_create(DiscoveryQuestion(text=f'Question {i}') for i in range(10))
+        sessions = TestSession.objects.bulk_create(
+            TestSession(user=user, date_taken_local=days_ago(i + 1)) for i in range((rows + 9) // 10)
+        )
+        QuestionaireUserResponse.objects.bulk_create(
+            QuestionaireUserResponse(test_session=sessions[i // 10], question=questions[i % 10], selected_option=str(i % 5 + 1))
+            for i in range(rows)
+        )
+        TestSession.objects.filter(user=user).update(score=TestSession.score_subquery())
+        return {
+            'session': sessions[0],
+            'response': QuestionaireUserResponse.objects.filter(test_session=sessions[0]).first(),
+            'question': DiscoveryQuestion.objects.create(text='Unanswered'),
+            'question_ids': [question.id for question in questions[:5]],
+        }
+
+    def test_list(self):
+        self.assertQueryBudget(1, lambda seeded: self.client.get('/api/user_responses/'))
+
+    def test_retrieve(self):
+        self.assertQueryBudget(1, lambda seeded: self.client.get(f'/api/user_responses/{seeded["response"].id}/'))
+
+    def test_create(self):
+        self.assertQueryBudget(6, lambda seeded: self.client.post('/api/user_responses/', {
+            'test_session': seeded['session'].id, 'question_id': seeded['question'].id, 'selected_option': '5',
+        }, format='json'))
+
+    def test_partial_update(self):
+        self.assertQueryBudget(3, lambda seeded: self.client.patch(
+            f'/api/user_responses/{seeded["response"].id}/', {'selected_option': '1'}, format='json'
+        ))
+
+    def test_destroy(self):
+        self.assertQueryBudget(4, lambda seeded: self.client.delete(f'/api/user_responses/{seeded["response"].id}/'))
+
+    def test_submit_questionaire(self):
+        self.assertQueryBudget(7, lambda seeded: self.client.post('/api/user_responses_api/', {
+            'responses': [{'question_id': question_id, 'selected_option': 3} for question_id in seeded['question_ids']],
+        }, format='json'))
+
+
+class HabitsQueryTests(QueryBudgetTestCase):
+    def seed(self, user, rows):
+        habits = Habits.objects.bulk_create(Habits(user=user, habit=f'Habit {i}', description='Daily') for i in range(rows))
+        return habits[0]
+
+    def test_list(self):
+        self.assertQueryBudget(1, lambda habit: self.client.get('/api/habits/'))
+
+    def test_retrieve(self):
+        self.assertQueryBudget(1, lambda habit: self.client.get(f'/api/habits/{habit.id}/'))
+
+    def test_create(self):
+        self.assertQueryBudget(3, lambda habit: self.client.post('/api/habits/', {'habit': 'Read', 'description': 'Daily'}, format='json'))
+
+    def test_update(self):
+        self.assertQueryBudget(4, lambda habit: self.client.put(
+            f'/api/habits/{habit.id}/', {'habit': 'Read', 'description': 'Weekly'}, format='json'
+        ))
+
+    def test_partial_update(self):
+        self.assertQueryBudget(4, lambda habit: self.client.patch(f'/api/habits/{habit.id}/', {'description': 'Weekly'}, format='json'))
+
+    def test_destroy(self):
+        self.assertQueryBudget(7, lambda habit: self.client.delete(f'/api/habits/{habit.id}/'))
+
+
+class HabitTrackingQueryTests(QueryBudgetTestCase):
+    HABITS = 5
+
+    def seed(self, user, rows):
+        habits = Habits.objects.bulk_create(Habits(user=user, habit=f'Habit {i}', description='Daily') for i in range(self.HABITS))
+        HabitTracking.objects.bulk_create(
+            HabitTracking(user=user, habit=habits[i % self.HABITS], date=days_ago(i // self.HABITS + 1), is_done=i // self.HABITS % 3 != 1)
+            for i in range(max(rows, self.HABITS))  # every habit has a history
+        )
+        habit_stats.rebuild([user.id])
+        habit_calendar.rebuild([user.id])
+        return {
+            'habit': habits[0],
+            'habit_ids': [habit.id for habit in habits],
+            'tracking': HabitTracking.objects.filter(user=user).order_by('-date', 'habit_id').first(),
+        }
+
+    def done_days(self, rows):
+        """The days every seeded habit is marked done, newest first."""
+        return [days_ago(day + 1) for day in range(max(rows, self.HABITS) // self.HABITS) if day % 3 != 1]
+
+    def test_list(self):
+        self.assertQueryBudget(1, lambda seeded: self.client.get('/api/habit_tracking/'))
+
+    def test_list_by_date(self):
+        self.assertQueryBudget(1, lambda seeded: self.client.get(f'/api/habit_tracking/?search={days_ago(1)}'))
+
+    def test_retrieve(self):
+        self.assertQueryBudget(1, lambda seeded: self.client.get(f'/api/habit_tracking/{seeded["tracking"].id}/'))
+
+    def test_create(self):
+        self.assertQueryBudget(16, lambda seeded: self.client.post(
+            '/api/habit_tracking/', {'habit_id': seeded['habit'].id, 'is_done': True}, format='json'
+        ))
+
+    def test_update(self):
+        self.assertQueryBudget(18, lambda seeded: self.client.put(f'/api/habit_tracking/{seeded["tracking"].id}/', {
+            'habit_id': seeded['habit'].id, 'date': str(days_ago(1)), 'is_done': False,
+        }, format='json'))
+
+    def test_partial_update(self):
+        self.assertQueryBudget(16, lambda seeded: self.client.patch(
+            f'/api/habit_tracking/{seeded["tracking"].id}/', {'is_done': False}, format='json'
+        ))
+
+    def test_destroy(self):
+        self.assertQueryBudget(14, lambda seeded: self.client.delete(f'/api/habit_tracking/{seeded["tracking"].id}/'))
+
+    def test_bulk(self):
+        def check(response, seeded, rows):
+            today = timezone.localdate()
+            self.assertEqual(
+                [(row['habit']['id'], row['date'], row['is_done']) for row in response.data],
+                [(habit_id, str(today), True) for habit_id in seeded['habit_ids']],
+            )
+            # Yesterday was done too, so every streak now runs through today
+            stats = HabitStats.objects.filter(habit_id__in=seeded['habit_ids']).order_by('habit_id')
+            self.assertEqual([(row.current_streak_end, row.current_streak) for row in stats], [(today, 2)] * self.HABITS)
+
+        self.assertQueryBudget(16, lambda seeded: self.client.post('/api/habit_tracking/bulk/', {'check_ins': [
+            {'habit_id': habit_id, 'is_done': True} for habit_id in seeded['habit_ids']
+        ]}, format='json'), check)
+
+    def test_stats(self):
+        def check(response, seeded, rows):
+            done = self.done_days(rows)
+            self.assertEqual([row['habit_id'] for row in response.data], seeded['habit_ids'])
+            # Every third day is missed, so streaks are at most two days long
+            longest = 2 if len(done) > 2 else 1
+            for row in response.data:
+                self.assertEqual(
+                    (row['current_streak'], row['longest_streak'], row['total_done'], row['last_done']),
+                    (1, longest, len(done), done[0]),
+                )
+
+        self.assertQueryBudget(2, lambda seeded: self.client.get('/api/habit_tracking/stats/'), check)
+
+    def test_heatmap(self):
+        def check(response, seeded, rows):
+            year = timezone.localdate().year
+            done = sorted(str(day) for day in self.done_days(rows) if day.year == year)
+            self.assertEqual(response.data['total'], len(done) * self.HABITS)
+            self.assertEqual([(str(day['date']), day['count']) for day in response.data['days']], [(day, self.HABITS) for day in done])
+
+        self.assertQueryBudget(1, lambda seeded: self.client.get('/api/habit_tracking/heatmap/'), check)
+
+
+class JournalEntryQueryTests(QueryBudgetTestCase):
+    def seed(self, user, rows):
+        JournalEntry.objects.bulk_create(
+            JournalEntry(user=user, date=days_ago(i // 3), mood=['Happy', 'Sad', 'Neutral'][i % 3], content=f'Entry {i}')
+            for i in range(rows)
+        )
+        search.rebuild_index(JournalEntry)
+        mood_trends.rebuild([user.id])
+        return JournalEntry.objects.filter(user=user).first()
+
+    def test_list(self):
+        self.assertQueryBudget(1, lambda entry: self.client.get('/api/journal/'))
+
+    def test_list_by_date(self):
+        self.assertQueryBudget(1, lambda entry: self.client.get(f'/api/journal/?search={days_ago(1)}'))
+
+    def test_search(self):
+        self.assertQueryBudget(1, lambda entry: self.client.get('/api/journal/?search=entr'))
+
+    def test_search_with_filters(self):
+        self.assertQueryBudget(1, lambda entry: self.client.get(
+            f'/api/journal/?search=entry&mood=Sad&date_from={days_ago(30)}&date_to={days_ago(1)}'
+        ))
+
+    def test_mood_counts(self):
+        self.assertQueryBudget(1, lambda entry: self.client.get(f'/api/journal/moods/?search=entry&date_from={days_ago(30)}'))
+
+    def test_mood_trends(self):
+        self.assertQueryBudget(1, lambda entry: self.client.get(f'/api/journal/mood-trends/?date_from={days_ago(364)}'))
+
+    def test_mood_trends_by_week(self):
+        self.assertQueryBudget(1, lambda entry: self.client.get(f'/api/journal/mood-trends/?granularity=week&date_from={days_ago(364)}'))
+
+    def test_retrieve(self):
+        self.assertQueryBudget(1, lambda entry: self.client.get(f'/api/journal/{entry.id}/'))
+
+    def test_create(self):
+        self.assertQueryBudget(6, lambda entry: self.client.post('/api/journal/', {'content': 'New', 'mood': 'Happy'}, format='json'))
+
+    def test_update(self):
+        self.assertQueryBudget(7, lambda entry: self.client.put(
+            f'/api/journal/{entry.id}/', {'content': 'Changed', 'mood': 'Sad'}, format='json'
+        ))
+
+    def test_partial_update(self):
+        self.assertQueryBudget(6, lambda entry: self.client.patch(f'/api/journal/{entry.id}/', {'content': 'Changed'}, format='json'))
+
+    def test_destroy(self):
+        self.assertQueryBudget(6, lambda entry: self.client.delete(f'/api/journal/{entry.id}/'))
+
+
+class KnowledgeHubQueryTests(QueryBudgetTestCase):
+    def seed(self, user, rows):
+        hubs = KnowledgeHub.objects.bulk_create(
+            KnowledgeHub(title='Mindfulness Techniques', content=f'Hub {i}', image_url='https://example.com/hub.png')
+            for i in range(rows)
+        )
+        search.rebuild_index(KnowledgeHub)
+        return hubs[0]
+
+    def test_list(self):
+        self.assertQueryBudget(1, lambda hub: self.client.get('/api/knowledge-hub/'))
+
+    def test_search(self):
+        self.assertQueryBudget(2, lambda hub: self.client.get('/api/knowledge-hub/?search=hub'))
+
+    def test_retrieve(self):
+        self.assertQueryBudget(1, lambda hub: self.client.get(f'/api/knowledge-hub/{hub.id}/'))
+
+    def test_create(self):
+        self.assertQueryBudget(3, lambda hub: self.client.post('/api/knowledge-hub/', {
+            'title': 'Self-Awareness', 'content': 'New', 'image_url': 'https://example.com/new.png',
+        }, format='json'))
+
+    def test_partial_update(self):
+        self.assertQueryBudget(4, lambda hub: self.client.patch(f'/api/knowledge-hub/{hub.id}/', {'content': 'Changed'}, format='json'))
+
+    def test_destroy(self):
+        self.assertQueryBudget(7, lambda hub: self.client.delete(f'/api/knowledge-hub/{hub.id}/'))
+
+
+class ArticleQueryTests(QueryBudgetTestCase):
+    def seed(self, user, rows):
+        hubs = KnowledgeHub.objects.bulk_create(
+            KnowledgeHub(title='Mindfulness Techniques', content=f'Hub {i}', image_url='https://example.com/hub.png')
+            for i in range(3)
+        )
+        articles = Article.objects.bulk_create(
+            Article(
+                title=f'Breathing practice {i}', summary='Slow down', content='Breathe in and out. ' * 20,
+                image_url='https://example.com/article.png', knowledgehub=hubs[i % 3], tags='calm,breath',
+            )
+            for i in range(max(rows, 2))  # the tags stay in use when one article is deleted
+        )
+        search.rebuild_index(Article)
+        tags.rebuild()
+        feed.rebuild()
+        return articles[0]
+
+    def test_list(self):
+        self.assertQueryBudget(1, lambda article: self.client.get('/api/articles/'))
+
+    def test_list_by_category(self):
+        self.assertQueryBudget(1, lambda article: self.client.get(f'/api/articles/?k_id={article.knowledgehub_id}'))
+
+    def test_search(self):
+        self.assertQueryBudget(2, lambda article: self.client.get('/api/articles/?search=breath'))
+
+    def test_list_by_tag(self):
+        self.assertQueryBudget(1, lambda article: self.client.get('/api/articles/?tag=calm&tag=Breath'))
+
+    def test_tag_facets(self):
+        self.assertQueryBudget(2, lambda article: self.client.get('/api/articles/tags/'))
+
+    def test_tag_facets_for_hub(self):
+        self.assertQueryBudget(1, lambda article: self.client.get(f'/api/articles/tags/?k_id={article.knowledgehub_id}'))
+
+    def test_feed(self):
+        self.assertQueryBudget(1, lambda article: self.client.get('/api/articles/feed/'))
+
+    def test_feed_for_hub(self):
+        self.assertQueryBudget(1, lambda article: self.client.get(f'/api/articles/feed/?k_id={article.knowledgehub_id}'))
+
+    def test_mark_seen(self):
+        self.assertQueryBudget(2, lambda article: self.client.post(f'/api/articles/{article.id}/seen/'))
+
+    def test_retrieve(self):
+        self.assertQueryBudget(1, lambda article: self.client.get(f'/api/articles/{article.id}/'))
+
+    def test_create(self):
+        self.assertQueryBudget(5, lambda article: self.client.post('/api/articles/', {
+            'title': 'New', 'summary': 'New', 'content': 'New', 'image_url': 'https://example.com/new.png',
+        }, format='json'))
+
+    def test_partial_update(self):
+        self.assertQueryBudget(4, lambda article: self.client.patch(f'/api/articles/{article.id}/', {'summary': 'Changed'}, format='json'))
+
+    def test_destroy(self):
+        self.assertQueryBudget(13, lambda article: self.client.delete(f'/api/articles/{article.id}/'))
+
+
+class VisionBoardQueryTests(QueryBudgetTestCase):
+    def seed(self, user, rows):
+        items = VisionBoard.objects.bulk_create(
+            VisionBoard(user=user, content=f'Goal {i}', category='Goal', favorite=i % 4 == 0) for i in range(rows)
+        )
+        return items[0]
+
+    def test_list(self):
+        self.assertQueryBudget(1, lambda item: self.client.get('/api/vision-board/'))
+
+    def test_retrieve(self):
+        self.assertQueryBudget(1, lambda item: self.client.get(f'/api/vision-board/{item.id}/'))
+
+    def test_create(self):
+        self.assertQueryBudget(3, lambda item: self.client.post('/api/vision-board/', {'content': 'New', 'category': 'Win'}, format='json'))
+
+    def test_update(self):
+        self.assertQueryBudget(4, lambda item: self.client.put(
+            f'/api/vision-board/{item.id}/', {'content': 'Changed', 'category': 'Quote', 'favorite': True}, format='json'
+        ))
+
+    def test_partial_update(self):
+        self.assertQueryBudget(4, lambda item: self.client.patch(f'/api/vision-board/{item.id}/', {'favorite': True}, format='json'))
+
+    def test_destroy(self):
+        self.assertQueryBudget(4, lambda item: self.client.delete(f'/api/vision-board/{item.id}/'))
+
+
+class NotModifiedQueryTests(QueryBudgetTestCase):
+    def seed(self, user, rows):
+        JournalEntry.objects.bulk_create(
+            JournalEntry(user=user, date=days_ago(i // 3), mood='Happy', content=f'Entry {i}') for i in range(rows)
+        )
+        response = self.client.get('/api/journal/')
+        return {'etag': response['ETag'], 'ids': [row['id'] for row in response.data['results']]}
+
+    def test_list(self):
+        def check(response, seeded, rows):
+            self.assertEqual((response.status_code, response['ETag']), (304, seeded['etag']))
+            self.assertEqual(len(seeded['ids']), min(rows, settings.API_PAGE_SIZE))
+            # A stale ETag gets the current list instead
+            JournalEntry.objects.create(user=JournalEntry.objects.get(id=seeded['ids'][0]).user, content='Newer', mood='Sad')
+            fresh = self.client.get('/api/journal/', HTTP_IF_NONE_MATCH=seeded['etag'])
+            self.assertEqual((fresh.status_code, fresh.data['results'][0]['content']), (200, 'Newer'))
+            self.assertNotEqual(fresh['ETag'], seeded['etag'])
+
+        self.assertQueryBudget(0, lambda seeded: self.client.get('/api/journal/', HTTP_IF_NONE_MATCH=seeded['etag']), check)
+
+
+class DashboardQueryTests(QueryBudgetTestCase):
+    def seed(self, user, rows):
+        habits = Habits.objects.bulk_create(Habits(user=user, habit=f'Habit {i}', description='Daily') for i in range(rows))
+        HabitTracking.objects.bulk_create(
+            HabitTracking(user=user, habit=habit, date=timezone.localdate(), is_done=True) for habit in habits[::2]
+        )
+        JournalEntry.objects.bulk_create(
+            JournalEntry(user=user, date=timezone.localdate(), mood='Happy', content=f'Entry {i}') for i in range(rows)
+        )
+        VisionBoard.objects.bulk_create(VisionBoard(user=user, content=f'Goal {i}', category='Goal', favorite=True) for i in range(rows))
+        sessions = TestSession.objects.bulk_create(TestSession(user=user, score=i, date_taken_local=days_ago(i)) for i in range(rows))
+        return {'user': user, 'habits': habits, 'latest_test': sessions[-1]}
+
+    def test_dashboard(self):
+        def check(response, seeded, rows):
+            data = response.data
+            self.assertEqual((data['date'], data['user']['username']), (timezone.localdate(), seeded['user'].username))
+            # Every other habit was checked in today
+            self.assertEqual(
+                [(habit['id'], habit['is_done'], habit['tracking_id'] is not None) for habit in data['habits']],
+                [(habit.id, i % 2 == 0, i % 2 == 0) for i, habit in enumerate(seeded['habits'])],
+            )
+            self.assertEqual(len(data['journal']), rows)
+            self.assertEqual({entry['content'] for entry in data['journal']}, {f'Entry {i}' for i in range(rows)})
+            self.assertEqual([item['content'] for item in data['vision_board']], [f'Goal {i}' for i in reversed(range(rows))])
+            self.assertEqual(
+                (data['latest_test']['id'], data['latest_test']['score']), (seeded['latest_test'].id, rows - 1)
+            )
+
+        self.assertQueryBudget(4, lambda seeded: self.client.get('/api/dashboard/'), check)
+
+
+class SyncQueryTests(QueryBudgetTestCase):
+    def seed(self, user, rows):
+        entries = JournalEntry.objects.bulk_create(
+            JournalEntry(user=user, date=days_ago(i // 3), mood='Neutral', content=f'Entry {i}') for i in range(rows)
+        )
+        habits = Habits.objects.bulk_create(Habits(user=user, habit=f'Habit {i}', description='Daily') for i in range(rows))
+        # Alternate the two collections so every page of changes holds both.
+        # They are settled, so the token moves past them.
+        settled = timezone.now() - datetime.timedelta(minutes=1)
+        SyncChange.objects.bulk_create(
+            SyncChange(user=user, model=row._meta.label_lower, object_id=row.id, created_at=settled)
+            for pair in zip(entries, habits) for row in pair
+        )
+        return entries[0]
+
+    def test_pull(self):
+        def check(response, entry, rows):
+            page = list(SyncChange.objects.filter(user=entry.user).order_by('id')[:settings.SYNC_PAGE_SIZE])
+            for name, model in (('journal', JournalEntry), ('habits', Habits)):
+                ids = model.objects.filter(user=entry.user).order_by('id').values_list('id', flat=True)[:len(page) // 2]
+                changes = response.data['changes'][name]
+                self.assertEqual(([row['id'] for row in changes['upserted']], changes['deleted']), (list(ids), []))
+            self.assertEqual(response.data['token'], str(page[-1].id))
+            self.assertEqual(response.data['has_more'], rows * 2 > settings.SYNC_PAGE_SIZE)
+
+        self.assertQueryBudget(3, lambda entry: self.client.get('/api/sync/'), check)
+
+    def test_push(self):
+        def check(response, entry, rows):
+            results = response.data['results']
+            self.assertEqual(
+                [(result['index'], result['status'], result.get('client_id')) for result in results],
+                [(0, 'created', 'a'), (1, 'updated', None), (2, 'created', None)],
+            )
+            self.assertEqual(JournalEntry.objects.get(id=results[0]['id']).content, 'Offline')
+            self.assertEqual((results[1]['id'], JournalEntry.objects.get(id=entry.id).content), (entry.id, 'Edited offline'))
+            self.assertEqual(VisionBoard.objects.get(id=results[2]['id']).content, 'Offline goal')
+
+        self.assertQueryBudget(21, lambda entry: self.client.post('/api/sync/', {'mutations': [
+            {'collection': 'journal', 'op': 'upsert', 'client_id': 'a', 'data': {'content': 'Offline', 'mood': 'Happy'}},
+            {'collection': 'journal', 'op': 'upsert', 'id': entry.id, 'data': {'content': 'Edited offline'}},
+            {'collection': 'vision_board', 'op': 'upsert', 'data': {'content': 'Offline goal', 'category': 'Goal'}},
+        ]}, format='json'), check)
+
+
+class CursorPaginationTests(TestCase):
+    """Every list endpoint pages with opaque cursors in a stable order."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user('pager', password='secret-pass-123')
+        self.client.force_authenticate(self.user)
+
+    def walk(self, path):
+        """Every page of ``path``, as lists of ids, following the next links."""
+        pages = []
+        while path:
+            data = self.client.get(path).data
+            pages.append([row['id'] for row in data['results']])
+            path = data['next']
+        return pages
+
+    def test_pages_follow_each_endpoints_ordering(self):
+        habit = Habits.objects.create(user=self.user, habit='Read', description='Daily')
+        tracking = [HabitTracking.objects.create(user=self.user, habit=habit, date=days_ago(day)) for day in (2, 0, 1, 3, 4)]
+        entries = [JournalEntry.objects.create(user=self.user, content=f'Entry {i}', mood='Happy') for i in range(5)]
+        boards = [VisionBoard.objects.create(user=self.user, content=f'Goal {i}', category='Goal') for i in range(5)]
+
+        by_date = [row.id for row in sorted(tracking, key=lambda row: row.date, reverse=True)]
+        for path, ids in (
+            ('/api/habit_tracking/?page_size=2', by_date),
+            ('/api/journal/?page_size=2', [entry.id for entry in reversed(entries)]),
+            ('/api/vision-board/?page_size=2', [board.id for board in reversed(boards)]),
+        ):
+            with self.subTest(path=path):
+                self.assertEqual(self.walk(path), [ids[0:2], ids[2:4], ids[4:]])
+
+    def test_page_size_is_capped(self):
+        VisionBoard.objects.bulk_create(
+            VisionBoard(user=self.user, content=f'Goal {i}', category='Goal') for i in range(settings.API_MAX_PAGE_SIZE + 1)
+        )
+        self.assertEqual(len(self.client.get('/api/vision-board/').data['results']), settings.API_PAGE_SIZE)
+        self.assertEqual(len(self.client.get('/api/vision-board/?page_size=5').data['results']), 5)
+        capped = self.client.get(f'/api/vision-board/?page_size={settings.API_MAX_PAGE_SIZE * 2}').data
+        self.assertEqual(len(capped['results']), settings.API_MAX_PAGE_SIZE)
+        self.assertIsNotNone(capped['next'])
+
+    def test_cursor_is_stable_when_rows_are_added(self):
+        boards = VisionBoard.objects.bulk_create(VisionBoard(user=self.user, content=f'Goal {i}', category='Goal') for i in range(4))
+        first = self.client.get('/api/vision-board/?page_size=2').data
+        # A row added in front of the cursor does not shift the next page
+        VisionBoard.objects.create(user=self.user, content='Newest', category='Goal')
+        second = self.client.get(first['next']).data
+        self.assertEqual([row['id'] for row in second['results']], [boards[1].id, boards[0].id])
+        self.assertIsNone(second['next'])
+
+
+class _TrackingSerializer(serializers.ModelSerializer):
+    habit = HabitsSerializer(read_only=True)
+
+    class Meta:
+        model = HabitTracking
+        fields = ['id', 'habit', 'date']
+
+
+class _HabitHistorySerializer(serializers.ModelSerializer):
+    """Renders a reverse relation, which has no field under its accessor name."""
+    habittracking_set = _TrackingSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = Habits
+        fields = ['id', 'habit', 'habittracking_set']
+
+
+class EagerLoadingTests(TestCase):
+    """The query plan EagerLoadingMixin derives from a serializer's fields."""
+
+    def test_forward_relations_are_joined(self):
+        self.assertEqual(get_related_paths(HabitTrackingSerializer(), HabitTracking), (['user', 'habit', 'habit__user'], []))
+        self.assertEqual(get_related_paths(ArticleListSerializer(), Article), (['knowledgehub'], []))
+
+    def test_reverse_relations_are_prefetched_by_accessor(self):
+        select_related, prefetch_related = get_related_paths(_HabitHistorySerializer(), Habits)
+        self.assertEqual(select_related, [])
+        self.assertEqual(prefetch_related, ['habittracking_set', 'habittracking_set__habit', 'habittracking_set__habit__user'])
+
+        user = User.objects.create_user('eager', password='secret-pass-123')
+        for i in range(3):
+            habit = Habits.objects.create(user=user, habit=f'Habit {i}', description='Daily')
+            for day in range(3):
+                HabitTracking.objects.create(user=user, habit=habit, date=days_ago(day))
+        # One query per prefetch level, however many rows
+        with self.assertNumQueries(3):
+            data = _HabitHistorySerializer(Habits.objects.prefetch_related(*prefetch_related), many=True).data
+        self.assertEqual([len(row['habittracking_set']) for row in data], [3, 3, 3])
+
+    def test_only_the_rendered_columns_are_loaded(self):
+        loaded = get_loaded_fields(ArticleListSerializer(), Article)
+        self.assertIn('knowledgehub__title', loaded)
+        self.assertNotIn('content', loaded)
+        # Reverse relations are prefetched by primary key, so add no columns
+        self.assertEqual(get_loaded_fields(_HabitHistorySerializer(), Habits), ['id', 'habit'])
+        # A field reading something other than a column keeps every column
+        self.assertIsNone(get_loaded_fields(QuestionaireUserResponseSerializer(), QuestionaireUserResponse))
+
+
+class PerDayQueryTests(TestCase):
+    """The per-user, per-day lookups have composite indexes, and test sessions one row per local day."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user('daily', password='secret-pass-123')
+        self.client.force_authenticate(self.user)
+
+    def test_composite_indexes_exist(self):
+        for model, columns in (
+            (HabitTracking, ['user_id', 'date']),
+            (JournalEntry, ['user_id', 'date', 'timestamp']),
+            (VisionBoard, ['user_id', 'favorite']),
+            (TestSession, ['user_id', 'date_taken_local']),
+        ):
+            with connection.cursor() as cursor:
+                constraints = connection.introspection.get_constraints(cursor, model._meta.db_table)
+            with self.subTest(model=model.__name__):
+                self.assertTrue(any(
+                    constraint['columns'] == columns and (constraint['index'] or constraint['unique'])
+                    for constraint in constraints.values()
+                ))
+
+    def test_one_test_session_per_local_day(self):
+        response = self.client.post('/api/test_sessions/', {}, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        session = TestSession.objects.get(id=response.data['id'])
+        self.assertEqual(session.date_taken_local, timezone.localdate())
+
+        self.assertEqual(self.client.post('/api/test_sessions/', {}, format='json').status_code, 400)
+        TestSession.objects.filter(id=session.id).update(date_taken_local=days_ago(1))
+        self.assertEqual(self.client.post('/api/test_sessions/', {}, format='json').status_code, 201)
+        self.assertEqual(TestSession.objects.filter(user=self.user).count(), 2)
+
+
+class QuestionaireSubmissionTests(TestCase):
+    """Whole-questionnaire submissions are validated up front and stored all or nothing."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user('submitter', password='secret-pass-123')
+        self.client.force_authenticate(self.user)
+        self.questions = DiscoveryQuestion.objects.bulk_create(DiscoveryQuestion(text=f'Question {i}') for i in range(3))
+
+    def submit(self, **data):
+        return self.client.post('/api/user_responses_api/', data, format='json')
+
+    def answers(self, *options):
+        return [{'question_id': question.id, 'selected_option': option} for question, option in zip(self.questions, options)]
+
+    def test_scores_zero_based_options_as_choice_keys(self):
+        response = self.submit(responses=self.answers(0, 2, 4))
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(response.data['test_session']['score'], 9)
+        stored = QuestionaireUserResponse.objects.filter(test_session_id=response.data['test_session']['id'])
+        self.assertEqual(sorted(stored.values_list('selected_option', flat=True)), ['1', '3', '5'])
+
+    def test_invalid_submissions_store_nothing(self):
+        answers = self.answers(1, 1, 1)
+        for responses in (
+            answers + answers[:1],  # the same question twice
+            answers + [{'question_id': 999999, 'selected_option': 1}],
+            answers[:2] + [{'question_id': self.questions[2].id, 'selected_option': 5}],
+        ):
+            with self.subTest(responses=responses):
+                self.assertEqual(self.submit(responses=responses).status_code, 400)
+        other_session = TestSession.objects.create(user=User.objects.create_user('someone', password='secret-pass-123'))
+        self.assertEqual(self.submit(test_session=other_session.id, responses=answers).status_code, 400)
+        self.assertFalse(TestSession.objects.filter(user=self.user).exists())
+        self.assertFalse(QuestionaireUserResponse.objects.exclude(test_session=other_session).exists())
+
+    def test_one_new_session_per_day(self):
+        self.assertEqual(self.submit(responses=self.answers(1, 1, 1)).status_code, 201)
+        response = self.submit(responses=self.answers(3, 3, 3))
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(TestSession.objects.filter(user=self.user).count(), 1)
+        self.assertEqual(QuestionaireUserResponse.objects.count(), 3)
+
+    def test_single_responses_cannot_repeat_a_question(self):
+        session = TestSession.objects.create(user=self.user)
+        data = {'test_session': session.id, 'question_id': self.questions[0].id, 'selected_option': '2'}
+        self.assertEqual(self.client.post('/api/user_responses/', data, format='json').status_code, 201)
+        self.assertEqual(self.client.post('/api/user_responses/', data, format='json').status_code, 400)
+        self.assertEqual(TestSession.objects.get(id=session.id).score, 2)
+
+
+class ResponseScoreTests(TestCase):
+    """Session scores follow saves and deletes of responses that were loaded partly or not at all."""
+
+    def setUp(self):
+        self.session = TestSession.objects.create(user=User.objects.create_user('taker', password='secret-pass-123'))
+        self.question = DiscoveryQuestion.objects.create(text='Question')
+        self.answer = QuestionaireUserResponse.objects.create(test_session=self.session, question=self.question, selected_option='3')
+
+    def score(self):
+        return TestSession.objects.get(id=self.session.id).score
+
+    def test_deferred_and_unloaded_rows(self):
+        self.assertEqual(self.score(), 3)
+
+        answer = QuestionaireUserResponse.objects.only('id', 'test_session_id').get(id=self.answer.id)
+        answer.selected_option = '5'
+        answer.save()
+        self.assertEqual(self.score(), 5)
+
+        QuestionaireUserResponse(id=self.answer.id, test_session=self.session, question=self.question, selected_option='4').save()
+        self.assertEqual(self.score(), 4)
+
+        QuestionaireUserResponse(id=self.answer.id, test_session=self.session, question=self.question, selected_option='1').delete()
+        self.assertEqual(self.score(), 0)
+
+
+class HabitStatsTests(TestCase):
+    """The summaries follow saves and deletes of rows that were loaded partly or not at all."""
+
+    def setUp(self):
+        self.user = User.objects.create_user('tracker', password='secret-pass-123')
+        self.habit = Habits.objects.create(user=self.user, habit='Walk', description='Daily')
+        self.rows = [
+            HabitTracking.objects.create(user=self.user, habit=self.habit, date=days_ago(days), is_done=True)
+            for days in (2, 1)
+        ]
+
+    def summary(self):
+        stats = HabitStats.objects.get(user=self.user, habit=self.habit)
+        calendar = {
+            date for calendar in HabitCalendar.objects.filter(user=self.user, habit=self.habit)
+            for date in habit_calendar.decode(calendar.days, calendar.year)
+        }
+        return stats.total_done, stats.current_streak, stats.current_streak_end, sorted(calendar)
+
+    def test_deferred_and_unloaded_rows(self):
+        self.assertEqual(self.summary(), (2, 2, days_ago(1), [days_ago(2), days_ago(1)]))
+
+        row = HabitTracking.objects.only('id').get(id=self.rows[1].id)
+        row.is_done = False
+        row.save()
+        self.assertEqual(self.summary(), (1, 1, days_ago(2), [days_ago(2)]))
+
+        # Saved without being loaded: moves yesterday's row to today
+        HabitTracking(id=self.rows[1].id, user=self.user, habit=self.habit, date=days_ago(0), is_done=True).save()
+        self.assertEqual(self.summary(), (2, 1, days_ago(0), [days_ago(2), days_ago(0)]))
+
+        HabitTracking.objects.defer('is_done').get(id=self.rows[0].id).delete()
+        self.assertEqual(self.summary(), (1, 1, days_ago(0), [days_ago(0)]))
+
+
+class HabitCalendarTests(TestCase):
+    """The heatmap bitmaps follow single and bulk check-ins and match a rebuild."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user('heatmap', password='secret-pass-123')
+        self.client.force_authenticate(self.user)
+        self.walk = Habits.objects.create(user=self.user, habit='Walk', description='Daily')
+        self.read = Habits.objects.create(user=self.user, habit='Read', description='Daily')
+
+    def heatmap(self, **params):
+        response = self.client.get('/api/habit_tracking/heatmap/', params)
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.data['total'], [(str(day['date']), day['count']) for day in response.data['days']]
+
+    def done_days(self):
+        return sorted(
+            (habit_id, date) for habit_id, year, days in HabitCalendar.objects.values_list('habit_id', 'year', 'days')
+            for date in habit_calendar.decode(days, year)
+        )
+
+    def test_first_and_last_day_of_a_leap_year(self):
+        first, last = datetime.date(2024, 1, 1), datetime.date(2024, 12, 31)
+        self.assertEqual(habit_calendar.decode(b'', 2024), [])
+        calendar = HabitCalendar(days=b'')
+        habit_calendar._set_day(calendar, first, True)
+        habit_calendar._set_day(calendar, last, True)
+        self.assertEqual(len(calendar.days), habit_calendar.YEAR_BYTES)
+        self.assertEqual(habit_calendar.decode(calendar.days, 2024), [first, last])
+
+    def test_check_ins_set_and_clear_days(self):
+        for habit, date in ((self.walk, '2024-03-01'), (self.read, '2024-03-01'), (self.walk, '2024-12-31'), (self.walk, '2025-01-01')):
+            HabitTracking.objects.create(user=self.user, habit=habit, date=datetime.date.fromisoformat(date), is_done=True)
+        self.assertEqual(self.heatmap(year=2024), (3, [('2024-03-01', 2), ('2024-12-31', 1)]))
+        self.assertEqual(self.heatmap(year=2024, habit=self.read.id), (1, [('2024-03-01', 1)]))
+        self.assertEqual(self.heatmap(year=2025), (1, [('2025-01-01', 1)]))
+
+        response = self.client.post('/api/habit_tracking/bulk/', {'check_ins': [
+            {'habit_id': self.walk.id, 'date': '2024-03-01', 'is_done': False},
+            {'habit_id': self.read.id, 'date': '2024-03-02', 'is_done': True},
+        ]}, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(self.heatmap(year=2024), (3, [('2024-03-01', 1), ('2024-03-02', 1), ('2024-12-31', 1)]))
+
+        HabitTracking.objects.get(habit=self.walk, date='2024-12-31').delete()
+        self.assertEqual(self.heatmap(year=2024, habit=self.walk.id), (0, []))
+
+        incremental = self.done_days()
+        habit_calendar.rebuild([self.user.id])
+        self.assertEqual(self.done_days(), incremental)
+
+    def test_parameters_must_be_integers(self):
+        self.assertEqual(self.client.get('/api/habit_tracking/heatmap/', {'year': 'last'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/habit_tracking/heatmap/', {'habit': 'walk'}).status_code, 400)
+
+
+class SyncTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user('offline', password='secret-pass-123')
+        self.client.force_authenticate(self.user)
+
+    def push(self, *mutations):
+        response = self.client.post('/api/sync/', {'mutations': list(mutations)}, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.data['results']
+
+    def test_token_waits_for_changes_to_settle(self):
+        first = JournalEntry.objects.create(user=self.user, content='First', mood='Happy')
+        SyncChange.objects.filter(object_id=first.id).update(created_at=timezone.now() - datetime.timedelta(minutes=1))
+        second = JournalEntry.objects.create(user=self.user, content='Second', mood='Happy')
+
+        pulled = self.client.get('/api/sync/').data
+        self.assertEqual([row['id'] for row in pulled['changes']['journal']['upserted']], [first.id, second.id])
+        # The token stops before the change that may still have uncommitted predecessors
+        self.assertEqual(pulled['token'], str(SyncChange.objects.get(object_id=first.id, model='prajnayana_dashboard.journalentry').id))
+        self.assertFalse(pulled['has_more'])
+
+        again = self.client.get(f'/api/sync/?since={pulled["token"]}').data
+        self.assertEqual([row['id'] for row in again['changes']['journal']['upserted']], [second.id])
+        with override_settings(SYNC_SETTLE_SECONDS=0):
+            settled = self.client.get(f'/api/sync/?since={pulled["token"]}').data
+        self.assertEqual(self.client.get(f'/api/sync/?since={settled["token"]}').data['changes']['journal']['upserted'], [])
+
+    def test_retried_push_is_idempotent(self):
+        mutations = [
+            {'collection': 'journal', 'op': 'upsert', 'client_id': 'entry-1', 'data': {'content': 'Offline', 'mood': 'Happy'}},
+            {'collection': 'vision_board', 'op': 'upsert', 'client_id': 'entry-1', 'data': {'content': 'Goal', 'category': 'Goal'}},
+        ]
+        created = self.push(*mutations)
+        self.assertEqual([result['status'] for result in created], ['created', 'created'])
+
+        mutations[0]['data']['content'] = 'Offline, edited'
+        retried = self.push(*mutations)
+        self.assertEqual([result['status'] for result in retried], ['updated', 'updated'])
+        self.assertEqual([result['id'] for result in retried], [result['id'] for result in created])
+        self.assertEqual(list(JournalEntry.objects.filter(user=self.user).values_list('content', flat=True)), ['Offline, edited'])
+        self.assertEqual(VisionBoard.objects.filter(user=self.user).count(), 1)
+
+        # Once its row is deleted, the client_id creates a new one
+        JournalEntry.objects.filter(user=self.user).delete()
+        recreated = self.push(mutations[0])
+        self.assertEqual(recreated[0]['status'], 'created')
+        self.assertEqual(self.push(mutations[0])[0], {**recreated[0], 'status': 'updated'})
+
+
+    def test_mutations_see_earlier_ones_in_the_batch(self):
+        entry = JournalEntry.objects.create(user=self.user, content='Online', mood='Happy')
+        results = self.push(
+            {'collection': 'journal', 'op': 'upsert', 'client_id': 'new', 'data': {'content': 'Draft', 'mood': 'Sad'}},
+            {'collection': 'journal', 'op': 'upsert', 'client_id': 'new', 'data': {'content': 'Final'}},
+            {'collection': 'journal', 'op': 'upsert', 'id': entry.id, 'data': {'content': 'Edited'}},
+            {'collection': 'journal', 'op': 'delete', 'id': entry.id},
+        )
+        self.assertEqual([result['status'] for result in results], ['created', 'updated', 'updated', 'deleted'])
+        self.assertEqual(list(JournalEntry.objects.filter(user=self.user).values_list('content', 'mood')), [('Final', 'Sad')])
+        self.assertEqual(list(SyncClientRow.objects.filter(user=self.user).values_list('client_id', 'object_id')), [('new', results[0]['id'])])
+
+        response = self.client.post('/api/sync/', {'mutations': [
+            {'collection': 'journal', 'op': 'upsert', 'client_id': 'other', 'data': {'content': 'Rolled back', 'mood': 'Happy'}},
+            {'collection': 'journal', 'op': 'delete', 'id': results[0]['id']},
+            {'collection': 'journal', 'op': 'upsert', 'id': results[0]['id'], 'data': {'content': 'Gone'}},
+        ]}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['index'], '2')
+        self.assertEqual(list(JournalEntry.objects.filter(user=self.user).values_list('content', flat=True)), ['Final'])
+        self.assertFalse(SyncClientRow.objects.filter(client_id='other').exists())
+
+    def test_conflicting_push_rolls_back(self):
+        habit = Habits.objects.create(user=self.user, habit='Read', description='Daily')
+        check_in = {'collection': 'habit_tracking', 'op': 'upsert', 'data': {'habit_id': habit.id, 'date': str(days_ago(0)), 'is_done': True}}
+        response = self.client.post('/api/sync/', {'mutations': [
+            {'collection': 'journal', 'op': 'upsert', 'client_id': 'kept', 'data': {'content': 'Rolled back', 'mood': 'Happy'}},
+            check_in, check_in,
+        ]}, format='json')
+        self.assertEqual((response.status_code, response.data['index']), (400, '2'), response.data)
+        self.assertEqual(response.data['errors'], 'Conflicts with an existing row.')
+        self.assertFalse(JournalEntry.objects.filter(user=self.user).exists())
+        self.assertFalse(HabitTracking.objects.filter(user=self.user).exists())
+        self.assertFalse(SyncClientRow.objects.exists())
+
+class ResponseCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('cached', password='secret-pass-123')
+        self.other = User.objects.create_user('other', password='secret-pass-123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_wildcard_if_none_match_does_not_hide_missing_objects(self):
+        session = TestSession.objects.create(user=self.other)
+        for url in (f'/api/test_sessions/{session.id}/', '/api/test_sessions/999999/', '/api/journal/999999/'):
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH='*').status_code, 404, url)
+
+    def test_matching_etag_is_not_modified(self):
+        session = TestSession.objects.create(user=self.user, score=3)
+        response = self.client.get(f'/api/test_sessions/{session.id}/')
+        self.assertEqual(response.data['score'], 3)
+        response = self.client.get(f'/api/test_sessions/{session.id}/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_detail_carries_last_modified(self):
+        session = TestSession.objects.create(user=self.user, score=3)
+        last_modified = http_date(session.updated_at.timestamp())
+        for _ in range(2):  # rendered, then served from the cache
+            response = self.client.get(f'/api/test_sessions/{session.id}/')
+            self.assertEqual(response['Last-Modified'], last_modified)
+            self.assertIn('Authorization', response['Vary'])
+
+    def test_catalog_etags_are_shared_between_users(self):
+        question = DiscoveryQuestion.objects.create(text='Question')
+        response = self.client.get('/api/discovery_questions/')
+        self.assertNotIn('Authorization', response.get('Vary', ''))
+
+        other = APIClient()
+        other.force_authenticate(self.other)
+        with self.assertNumQueries(0):
+            not_modified = other.get('/api/discovery_questions/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(not_modified.status_code, 304)
+
+        question.text = 'Reworded'
+        question.save()
+        changed = other.get('/api/discovery_questions/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual((changed.status_code, changed.data[0]['text']), (200, 'Reworded'))
+
+    def test_questionaire_submission_invalidates_cached_sessions_and_responses(self):
+        questions = DiscoveryQuestion.objects.bulk_create(DiscoveryQuestion(text=f'Question {i}') for i in range(3))
+        self.assertEqual(self.client.get('/api/test_sessions/').data['results'], [])
+        self.assertEqual(self.client.get('/api/user_responses/').data['results'], [])
+
+        response = self.client.post('/api/user_responses_api/', {
+            'responses': [{'question_id': question.id, 'selected_option': 4} for question in questions],
+        }, format='json')
+        session_id = response.data['test_session']['id']
+        sessions = self.client.get('/api/test_sessions/').data['results']
+        self.assertEqual([(session['id'], session['score']) for session in sessions], [(session_id, 15)])
+        self.assertEqual(len(self.client.get('/api/user_responses/').data['results']), 3)
+
+        self.client.post('/api/user_responses_api/', {
+            'test_session': session_id, 'responses': [{'question_id': questions[0].id, 'selected_option': 0}],
+        }, format='json')
+        self.assertEqual(self.client.get(f'/api/test_sessions/{session_id}/').data['score'], 11)
+
+    def test_token_user_saves_invalidate_user_responses(self):
+        Habits.objects.create(user=self.user, habit='Walk', description='Daily')
+        self.assertEqual([habit['user'] for habit in self.client.get('/api/habits/').data], ['cached'])
+
+        token_user = TokenUser.objects.get(pk=self.user.pk)
+        token_user.username = 'renamed'
+        token_user.save()
+        self.assertEqual([habit['user'] for habit in self.client.get('/api/habits/').data], ['renamed'])
+
+    def test_deploy_check_requires_a_shared_cache(self):
+        locmem = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+        shared = {'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': '/tmp/cache'}}
+        with override_settings(CACHES=locmem):
+            self.assertEqual([warning.id for warning in checks.check_shared_api_cache(None)], ['prajnayana_dashboard.W001'])
+        with override_settings(CACHES=shared):
+            self.assertEqual(checks.check_shared_api_cache(None), [])
+
+    def test_response_edits_invalidate_only_their_owner(self):
+        question = DiscoveryQuestion.objects.create(text='Question')
+        session = TestSession.objects.create(user=self.user)
+        answer = QuestionaireUserResponse.objects.create(test_session=session, question=question, selected_option='2')
+        other_client = APIClient()
+        other_client.force_authenticate(self.other)
+        other_etag = other_client.get('/api/test_sessions/')['ETag']
+        self.assertEqual(self.client.get(f'/api/test_sessions/{session.id}/').data['score'], 2)
+
+        self.client.patch(f'/api/user_responses/{answer.id}/', {'selected_option': '5'}, format='json')
+        self.assertEqual(self.client.get(f'/api/test_sessions/{session.id}/').data['score'], 5)
+        self.assertEqual(other_client.get('/api/test_sessions/', HTTP_IF_NONE_MATCH=other_etag).status_code, 304)
+
+
+class ArticleSearchTests(TestCase):
+    """The full-text index behind ?search= on articles and knowledge hubs."""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('searcher', password='secret-pass-123'))
+        self.hub = KnowledgeHub.objects.create(title='Breathing basics', content='Start here', image_url='https://example.com/hub.png')
+
+    def article(self, title, content='Body', tags=''):
+        return Article.objects.create(
+            title=title, summary='Short', content=content, image_url='https://example.com/a.png', knowledgehub=self.hub, tags=tags,
+        )
+
+    def titles(self, path):
+        return [row['title'] for row in self.client.get(path).data['results']]
+
+    def test_title_matches_rank_first_and_terms_are_prefixes(self):
+        self.article('Evening routine', content='A few minutes of breathing before bed')
+        self.article('Breathing exercises')
+        self.article('Calm mornings', tags='breathing')
+        self.article('Unrelated')
+        self.assertEqual(self.titles('/api/articles/?search=breath'), ['Breathing exercises', 'Calm mornings', 'Evening routine'])
+        # Every term has to match
+        self.assertEqual(self.titles('/api/articles/?search=breath%20bed'), ['Evening routine'])
+        self.assertEqual(self.titles('/api/articles/?search=zzz'), [])
+
+    def test_index_follows_saves_and_deletes(self):
+        article = self.article('Sleep hygiene')
+        self.assertEqual(search.search_ids(Article, 'sleep'), [article.id])
+        article.title = 'Rest hygiene'
+        article.save()
+        self.assertEqual(search.search_ids(Article, 'sleep'), [])
+        self.assertEqual(search.search_ids(Article, 'rest'), [article.id])
+        article.delete()
+        self.assertEqual(search.search_ids(Article, 'rest'), [])
+
+    def test_knowledge_hub_search(self):
+        KnowledgeHub.objects.create(title='Gratitude', content='Notice the breath', image_url='https://example.com/hub.png')
+        KnowledgeHub.objects.create(title='Focus', content='Deep work', image_url='https://example.com/hub.png')
+        response = self.client.get('/api/knowledge-hub/?search=breath')
+        self.assertEqual([row['title'] for row in response.data], ['Breathing basics', 'Gratitude'])
+
+
+class SparseFieldsetTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user('reader', password='secret-pass-123')
+        self.client.force_authenticate(self.user)
+        hub = KnowledgeHub.objects.create(title='Self-Awareness', content='Hub body', image_url='https://example.com/hub.png')
+        self.article = Article.objects.create(
+            title='Noticing', summary='Short', content='Long body', image_url='https://example.com/a.png', knowledgehub=hub,
+        )
+
+    def test_article_list_renders_cards(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/articles/')
+        row = response.data['results'][0]
+        self.assertNotIn('content', row)
+        self.assertEqual(row['knowledgehub'], {'id': self.article.knowledgehub_id, 'title': 'Self-Awareness'})
+        self.assertNotIn('"content"', queries[0]['sql'])
+        self.assertEqual(self.client.get(f'/api/articles/{self.article.id}/').data['content'], 'Long body')
+
+    def test_fields_parameter(self):
+        JournalEntry.objects.create(user=self.user, mood='Happy', content='Entry')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/journal/?fields=id,mood')
+        self.assertEqual(set(response.data['results'][0]), {'id', 'mood'})
+        self.assertNotIn('"content"', queries[0]['sql'])
+        self.assertEqual(set(self.client.get(f'/api/articles/{self.article.id}/?fields=title').data), {'title'})
+
+    def test_unknown_fields_are_rejected(self):
+        response = self.client.get('/api/articles/?fields=id,body')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('fields', response.data)
+
+
+class ArticleTagTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('reader', password='secret-pass-123'))
+        self.hubs = KnowledgeHub.objects.bulk_create(
+            KnowledgeHub(title=title, content='Hub', image_url='https://example.com/hub.png')
+            for title in ('Self-Awareness', 'Personal Growth')
+        )
+
+    def create(self, tags, hub):
+        return Article.objects.create(
+            title='Article', summary='Short', content='Body', image_url='https://example.com/a.png', knowledgehub=hub, tags=tags,
+        )
+
+    def facets(self):
+        return {tag['name']: (tag['count'], tag['knowledgehubs']) for tag in self.client.get('/api/articles/tags/').data['tags']}
+
+    def test_tag_filter_is_exact(self):
+        calm = self.create('Calm, sleep', self.hubs[0])
+        self.create('calmness', self.hubs[0])
+        response = self.client.get('/api/articles/?tag=CALM')
+        self.assertEqual([row['id'] for row in response.data['results']], [calm.id])
+        self.assertEqual(self.client.get('/api/articles/?tag=calm&tag=focus').data['results'], [])
+
+    def test_facet_counts_follow_changes(self):
+        first = self.create('calm, sleep', self.hubs[0])
+        self.create('calm', self.hubs[1])
+        self.assertEqual(self.facets()['calm'], (2, [
+            {'knowledgehub': self.hubs[0].id, 'count': 1}, {'knowledgehub': self.hubs[1].id, 'count': 1},
+        ]))
+
+        first.knowledgehub = self.hubs[1]
+        first.tags = 'calm'
+        first.save()
+        facets = self.facets()
+        self.assertEqual(facets['calm'], (2, [{'knowledgehub': self.hubs[1].id, 'count': 2}]))
+        self.assertNotIn('sleep', facets)
+
+        first.delete()
+        self.assertEqual(self.facets()['calm'], (1, [{'knowledgehub': self.hubs[1].id, 'count': 1}]))
+        hub_facets = self.client.get(f'/api/articles/tags/?k_id={self.hubs[1].id}').data
+        self.assertEqual(hub_facets['tags'], [{'name': 'calm', 'count': 1}])
+
+
+class AsyncArticleListTests(TestCase):
+    """The async article list (settings.ASYNC_READ_VIEWS) filters like the ViewSet."""
+
+    def setUp(self):
+        self.user = User.objects.create_user('reader', password='secret-pass-123')
+        self.token = str(RefreshToken.for_user(self.user).access_token)
+        hubs = KnowledgeHub.objects.bulk_create(
+            KnowledgeHub(title=title, content='Hub', image_url='https://example.com/hub.png')
+            for title in ('Self-Awareness', 'Personal Growth')
+        )
+        self.hub = hubs[0]
+        for title, tag_string, hub in (('Calm sleep', 'calm, sleep', hubs[0]), ('Calm focus', 'calm, focus', hubs[0]),
+                                       ('Calm nights', 'calm, sleep', hubs[1])):
+            Article.objects.create(
+                title=title, summary='Short', content='Body', image_url='https://example.com/a.png', knowledgehub=hub, tags=tag_string,
+            )
+
+    def titles(self, query):
+        request = RequestFactory().get(f'/api/articles/?{query}', HTTP_AUTHORIZATION=f'Bearer {self.token}')
+        response = async_to_sync(async_views.article_list)(request)
+        self.assertEqual(response.status_code, 200, response.content)
+        titles = sorted(row['title'] for row in json.loads(response.content)['results'])
+
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token}')
+        self.assertEqual(titles, sorted(row['title'] for row in client.get(f'/api/articles/?{query}').data['results']))
+        return titles
+
+    def test_search_with_tag(self):
+        self.assertEqual(self.titles('search=calm&tag=sleep'), ['Calm nights', 'Calm sleep'])
+        self.assertEqual(self.titles('search=calm&tag=sleep&tag=focus'), [])
+
+    def test_search_with_category(self):
+        self.assertEqual(self.titles(f'search=calm&k_id={self.hub.id}'), ['Calm focus', 'Calm sleep'])
+        self.assertEqual(self.titles(f'search=calm&k_id={self.hub.id}&tag=sleep'), ['Calm sleep'])
+
+    def test_search_reports_truncation(self):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token}')
+        request = RequestFactory().get('/api/articles/?search=calm', HTTP_AUTHORIZATION=f'Bearer {self.token}')
+        for limit, truncated in ((2, True), (3, False)):
+            cache.clear()
+            with self.subTest(limit=limit), override_settings(SEARCH_RESULTS_LIMIT=limit):
+                for data in (json.loads(async_to_sync(async_views.article_list)(request).content),
+                             client.get('/api/articles/?search=calm').data):
+                    self.assertEqual((len(data['results']), data['truncated']), (min(limit, 3), truncated))
+        self.assertNotIn('truncated', client.get('/api/articles/').data)
+
+
+class AsyncListTests(TestCase):
+    """The async journal and habit tracking lists render and cache like their ViewSets."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('writer', password='secret-pass-123')
+        self.token = str(add_user_claims(RefreshToken.for_user(self.user), self.user).access_token)
+        self.client.defaults['HTTP_AUTHORIZATION'] = f'Bearer {self.token}'
+        other = User.objects.create_user('other', password='secret-pass-123')
+        today = timezone.localdate()
+        for user in (self.user, other):
+            habit = Habits.objects.create(habit='Read', description='Daily', user=user)
+            for day in range(3):
+                date = today - datetime.timedelta(days=day)
+                JournalEntry.objects.create(user=user, date=date, mood='Happy', content=f'{user.username} {day}')
+                HabitTracking.objects.create(habit=habit, user=user, date=date, is_done=day % 2 == 0)
+
+    def get(self, view, path, **headers):
+        request = RequestFactory().get(path, HTTP_AUTHORIZATION=f'Bearer {self.token}', **headers)
+        return async_to_sync(view)(request)
+
+    def test_lists_match_the_viewsets(self):
+        for view, path in ((async_views.journal_list, '/api/journal/'), (async_views.habit_tracking_list, '/api/habit_tracking/')):
+            with self.subTest(path=path):
+                expected = self.client.get(path).json()
+                cache.clear()
+                response = self.get(view, path)
+                self.assertEqual(response.status_code, 200, response.content)
+                self.assertEqual(json.loads(response.content), expected)
+                self.assertEqual(len(expected['results']), 3)
+
+    def test_page_size_and_cursor(self):
+        # Newest entry first
+        first = json.loads(self.get(async_views.journal_list, '/api/journal/?page_size=2').content)
+        self.assertEqual([row['content'] for row in first['results']], ['writer 2', 'writer 1'])
+        second = json.loads(self.get(async_views.journal_list, first['next']).content)
+        self.assertEqual([row['content'] for row in second['results']], ['writer 0'])
+        self.assertIsNone(second['next'])
+
+    def test_shares_the_viewset_cache_and_etags(self):
+        response = self.get(async_views.journal_list, '/api/journal/')
+        etag = response['ETag']
+        self.assertEqual(self.client.get('/api/journal/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        # Served from the cache without touching the database
+        with self.assertNumQueries(0):
+            self.assertEqual(self.get(async_views.journal_list, '/api/journal/').content, response.content)
+            self.assertEqual(self.get(async_views.journal_list, '/api/journal/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        JournalEntry.objects.filter(user=self.user).first().delete()
+        response = self.get(async_views.journal_list, '/api/journal/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(json.loads(response.content)['results']), 2)
+
+    def test_requires_authentication(self):
+        request = RequestFactory().get('/api/journal/')
+        self.assertEqual(async_to_sync(async_views.habit_tracking_list)(request).status_code, 401)
+
+
+class ArticleFeedTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user('reader', password='secret-pass-123', level=2)
+        self.client.force_authenticate(self.user)
+        self.hub = KnowledgeHub.objects.create(title='Self-Awareness', content='Hub', image_url='https://example.com/hub.png')
+
+    def create(self, title, level, hub=None):
+        return Article.objects.create(
+            title=title, summary='Short', content='Body', image_url='https://example.com/a.png', level=level, knowledgehub=hub or self.hub,
+        )
+
+    def titles(self, path='/api/articles/feed/'):
+        return [row['title'] for row in self.client.get(path).data['results']]
+
+    def test_ranked_by_level_match_then_recency(self):
+        self.create('Advanced', 3)
+        self.create('Beginner', 1)
+        matched = self.create('Matched', 2)
+        self.create('Far', 5)
+        self.assertEqual(self.titles(), ['Matched', 'Beginner', 'Advanced', 'Far'])
+
+        # A matched article published long enough ago ranks below newer near matches
+        Article.objects.filter(id=matched.id).update(date_added=days_ago(150))
+        feed.refresh([matched.id])
+        self.assertEqual(self.titles(), ['Beginner', 'Advanced', 'Matched', 'Far'])
+
+    def test_changes_rerank(self):
+        article = self.create('Article', 1)
+        other = self.create('Other', 3, KnowledgeHub.objects.create(title='Personal Growth', content='Hub', image_url='https://example.com/hub.png'))
+        self.assertEqual(self.titles(), ['Other', 'Article'])
+
+        self.hub.level = 2
+        self.hub.save()
+        self.assertEqual(self.titles(), ['Article', 'Other'])
+
+        other.level = 2
+        other.save()
+        self.assertEqual(self.titles(), ['Other', 'Article'])
+
+        self.assertEqual(self.titles(f'/api/articles/feed/?k_id={self.hub.id}'), ['Article'])
+
+        # Articles of a deleted hub lose its level bonus
+        self.hub.delete()
+        self.assertEqual(
+            ArticleRank.objects.get(article=article, level=2).score, article.date_added.toordinal() + feed.LEVEL_BONUS_DAYS[1]
+        )
+
+    def test_seen_articles_are_left_out(self):
+        articles = [self.create(f'Article {i}', 2) for i in range(3)]
+        self.assertEqual(self.client.post(f'/api/articles/{articles[1].id}/seen/').status_code, 204)
+        self.assertEqual(self.client.post(f'/api/articles/{articles[1].id}/seen/').status_code, 204)
+        self.assertEqual(self.titles(), ['Article 2', 'Article 0'])
+
+        other = User.objects.create_user('other', password='secret-pass-123', level=2)
+        self.client.force_authenticate(other)
+        self.assertEqual(self.titles(), ['Article 2', 'Article 1', 'Article 0'])
+
+    def test_pages(self):
+        for i in range(5):
+            self.create(f'Article {i}', 2 if i % 2 else 1)
+        response = self.client.get('/api/articles/feed/?page_size=2')
+        titles = [row['title'] for row in response.data['results']]
+        while response.data['next']:
+            response = self.client.get(response.data['next'])
+            titles += [row['title'] for row in response.data['results']]
+        self.assertEqual(titles, ['Article 3', 'Article 1', 'Article 4', 'Article 2', 'Article 0'])
+
+
+class JournalSearchTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user('writer', password='secret-pass-123')
+        self.client.force_authenticate(self.user)
+
+    def write(self, content, mood='Happy', days=0, user=None):
+        return JournalEntry.objects.create(user=user or self.user, content=content, mood=mood, date=days_ago(days))
+
+    def contents(self, query):
+        response = self.client.get(f'/api/journal/?{query}')
+        self.assertEqual(response.status_code, 200, response.data)
+        return [row['content'] for row in response.data['results']]
+
+    def test_search_is_scoped_to_the_user(self):
+        self.write('Long walk in the rain')
+        self.write('A walk after work', user=User.objects.create_user('other', password='secret-pass-123'))
+        self.write('Slept early')
+        self.assertEqual(self.contents('search=walk'), ['Long walk in the rain'])
+        # Every word has to match, each as a prefix
+        self.assertEqual(self.contents('search=rai+lon'), ['Long walk in the rain'])
+        self.assertEqual(self.contents('search=walk+work'), [])
+        self.assertEqual(self.contents('search=u' + str(self.user.id)), [])
+
+    def test_filters_and_mood_counts(self):
+        self.write('Calm morning', 'Happy', days=0)
+        self.write('Calm evening', 'Sad', days=3)
+        self.write('Calm night', 'Happy', days=10)
+        self.write('Busy day', 'Stressed', days=1)
+
+        self.assertEqual(self.contents('search=calm&mood=Happy'), ['Calm night', 'Calm morning'])
+        self.assertEqual(self.contents(f'search=calm&date_from={days_ago(5)}&date_to={days_ago(1)}'), ['Calm evening'])
+        self.assertEqual(self.client.get('/api/journal/?mood=Glad').status_code, 400)
+
+        counts = self.client.get(f'/api/journal/moods/?search=calm&mood=Sad&date_from={days_ago(5)}').data
+        self.assertEqual(counts['total'], 2)
+        self.assertEqual(counts['moods'], {'Happy': 1, 'Sad': 1, 'Neutral': 0, 'Excited': 0, 'Stressed': 0})
+
+    def test_index_follows_changes(self):
+        entry = self.write('Rainy day')
+        self.assertEqual(self.client.get('/api/journal/moods/?search=sunny').data['total'], 0)
+        self.client.patch(f'/api/journal/{entry.id}/', {'content': 'Sunny day'}, format='json')
+        self.assertEqual(self.contents('search=sunny'), ['Sunny day'])
+        self.assertEqual(self.client.get('/api/journal/moods/?search=sunny').data['total'], 1)
+        self.client.delete(f'/api/journal/{entry.id}/')
+        self.assertEqual(self.contents('search=day'), [])
+
+
+class MoodTrendTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user('writer', password='secret-pass-123')
+        self.client.force_authenticate(self.user)
+
+    def write(self, mood, date):
+        return JournalEntry.objects.create(user=self.user, content='Entry', mood=mood, date=date)
+
+    def mood_days(self):
+        return {
+            date: counts for date, *counts in MoodDay.objects.filter(user=self.user).order_by('date')
+            .values_list('date', 'happy', 'sad', 'neutral', 'excited', 'stressed')
+        }
+
+    def trends(self, query):
+        response = self.client.get(f'/api/journal/mood-trends/?{query}')
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.data['periods']
+
+    def test_entries_default_to_the_local_day(self):
+        # 03:00 UTC on March 3rd is still March 2nd in TIME_ZONE
+        late = datetime.datetime(2026, 3, 3, 3, tzinfo=datetime.timezone.utc)
+        with mock.patch('django.utils.timezone.now', return_value=late):
+            response = self.client.post('/api/journal/', {'content': 'Late', 'mood': 'Sad'}, format='json')
+        local_day = datetime.date(2026, 3, 2)
+        self.assertEqual(response.data['date'], local_day)
+        self.assertEqual(JournalEntry.objects.get(id=response.data['id']).date, local_day)
+        self.assertEqual(self.mood_days(), {local_day: [0, 1, 0, 0, 0]})
+
+    def test_rollup_follows_changes(self):
+        monday = datetime.date(2026, 3, 2)
+        first = self.write('Happy', monday)
+        second = self.write('Sad', monday)
+        self.client.post('/api/journal/', {'content': 'Today', 'mood': 'Excited'}, format='json')
+        self.assertEqual(self.mood_days()[monday], [1, 1, 0, 0, 0])
+        self.assertEqual(self.mood_days()[timezone.localdate()], [0, 0, 0, 1, 0])
+
+        second.mood = 'Stressed'
+        second.save()
+        first.date = monday + datetime.timedelta(days=1)
+        first.save()
+        first.content = 'Edited'
+        first.save()
+        self.assertEqual(self.mood_days()[monday], [0, 0, 0, 0, 1])
+        self.assertEqual(self.mood_days()[monday + datetime.timedelta(days=1)], [1, 0, 0, 0, 0])
+
+        JournalEntry.objects.get(pk=second.pk).delete()
+        self.assertEqual(self.mood_days()[monday], [0, 0, 0, 0, 0])
+
+        incremental = {date: counts for date, counts in self.mood_days().items() if any(counts)}
+        mood_trends.rebuild([self.user.id])
+        self.assertEqual(self.mood_days(), incremental)
+
+    def test_granularities_and_moving_average(self):
+        monday = datetime.date(2026, 3, 2)
+        for offset, mood in [(0, 'Happy'), (0, 'Sad'), (1, 'Happy'), (7, 'Sad'), (8, 'Neutral'), (-1, 'Excited')]:
+            self.write(mood, monday + datetime.timedelta(days=offset))
+
+        days = self.trends(f'granularity=day&date_from={monday}&date_to={monday + datetime.timedelta(days=2)}&window=2')
+        self.assertEqual([point['period'] for point in days], [monday + datetime.timedelta(days=i) for i in range(3)])
+        self.assertEqual([point['entries'] for point in days], [2, 1, 0])
+        self.assertEqual([point['score'] for point in days], [0.0, 1.0, None])
+        # The first day's window reaches back to the Excited entry the day before
+        self.assertEqual([point['moving_average'] for point in days], [0.3333, 0.3333, 1.0])
+
+        weeks = self.trends(f'granularity=week&date_from={monday + datetime.timedelta(days=3)}&date_to={monday + datetime.timedelta(days=9)}&window=1')
+        self.assertEqual([point['period'] for point in weeks], [monday, monday + datetime.timedelta(days=7)])
+        self.assertEqual(weeks[0]['moods'], {'Happy': 2, 'Sad': 1, 'Neutral': 0, 'Excited': 0, 'Stressed': 0})
+        self.assertEqual([point['score'] for point in weeks], [0.3333, -0.5])
+
+        months = self.trends('granularity=month&date_from=2026-01-15&date_to=2026-03-31')
+        self.assertEqual([point['period'] for point in months], [datetime.date(2026, 1, 1), datetime.date(2026, 2, 1), datetime.date(2026, 3, 1)])
+        self.assertEqual([point['entries'] for point in months], [0, 0, 6])
+        self.assertEqual(months[-1]['moving_average'], 0.1667)
+
+    def test_defaults_and_validation(self):
+        response = self.client.get('/api/journal/mood-trends/')
+        self.assertEqual(response.data['window'], 7)
+        self.assertEqual(len(response.data['periods']), 30)
+        self.assertEqual(response.data['periods'][-1]['period'], timezone.localdate())
+        self.assertEqual(len(self.trends('granularity=month')), 12)
+
+        for query in ('granularity=year', 'window=0', 'window=x', f'date_from={days_ago(1)}&date_to={days_ago(2)}', f'date_from={days_ago(400)}'):
+            self.assertEqual(self.client.get(f'/api/journal/mood-trends/?{query}').status_code, 400, query)
+
+    def test_limits_depend_on_granularity(self):
+        for granularity, window, periods in (('day', 92, 366), ('week', 13, 53), ('month', 3, 12)):
+            with self.subTest(granularity=granularity):
+                last = mood_trends.period_start(timezone.localdate(), granularity)
+                first = mood_trends.shift(last, granularity, 1 - periods)
+                query = f'/api/journal/mood-trends/?granularity={granularity}&date_from={first}'
+                self.assertEqual(len(self.client.get(f'{query}&window={window}').data['periods']), periods)
+                self.assertEqual(self.client.get(f'{query}&window={window + 1}').status_code, 400)
+                earlier = mood_trends.shift(first, granularity, -1)
+                self.assertEqual(self.client.get(f'/api/journal/mood-trends/?granularity={granularity}&date_from={earlier}').status_code, 400)
+
+
+class SeedScaleDataTests(TestCase):
+    """seed_scale_data only touches the rows it generates."""
+
+    def setUp(self):
+        # Rows made without their signals, so a full rebuild of any derived table would show
+        self.existing = User.objects.create_user('existing', password='secret-pass-123')
+        habit = Habits.objects.create(habit='Read', description='Daily', user=self.existing)
+        HabitTracking.objects.bulk_create([HabitTracking(habit=habit, user=self.existing, is_done=True)])
+        JournalEntry.objects.bulk_create([JournalEntry(user=self.existing, mood='Happy', content='Unindexed')])
+        hub = KnowledgeHub.objects.create(title='Self-Awareness', content='Hub', image_url='https://example.com/hub.png')
+        self.article = Article.objects.bulk_create([Article(
+            title='Existing', summary='Short', content='Body', image_url='https://example.com/a.png', knowledgehub=hub, tags='calm',
+        )])[0]
+
+    def seed(self, prefix):
+        call_command(
+            'seed_scale_data', 3, '--prefix', prefix, '--years', '0.2', '--articles', '30', '--users-per-chunk', '2',
+            '--batch-size', '25', stdout=io.StringIO(),
+        )
+        return User.objects.filter(username__startswith=prefix).order_by('username')
+
+    def test_seeds_users_and_their_derived_rows(self):
+        users = self.seed('scale')
+        self.assertEqual(len(users), 3)
+        entries = JournalEntry.objects.filter(user__in=users)
+        self.assertTrue(entries.exists())
+        for entry in entries:
+            self.assertEqual(timezone.localtime(entry.timestamp).date(), entry.date)
+        for session in TestSession.objects.filter(user__in=users):
+            self.assertEqual(timezone.localtime(session.date_taken).date(), session.date_taken_local)
+            self.assertEqual(session.score, sum(int(option) for option in session.responses.values_list('selected_option', flat=True)))
+        # auto_now_add is left on for everything else
+        self.assertEqual(JournalEntry.objects.create(user=users[0], date=datetime.date(2000, 1, 1), content='Now').timestamp.date(), timezone.now().date())
+
+        derived = [
+            list(HabitStats.objects.filter(user__in=users).order_by('id').values('user', 'habit', 'current_streak', 'total_done')),
+            list(MoodDay.objects.filter(user__in=users).order_by('id').values()),
+        ]
+        self.assertTrue(all(derived))
+        user_ids = [user.id for user in users]
+        habit_stats.rebuild(user_ids)
+        mood_trends.rebuild(user_ids)
+        self.assertEqual(
+            list(HabitStats.objects.filter(user__in=users).order_by('user', 'habit').values('user', 'habit', 'current_streak', 'total_done')),
+            sorted(derived[0], key=lambda row: (row['user'], row['habit'])),
+        )
+        self.assertEqual(MoodDay.objects.filter(user__in=users).count(), len(derived[1]))
+        self.assertTrue(search.search_ids(JournalEntry, entries.first().content.split()[0]))
+
+        # The articles are tagged, ranked and indexed
+        self.assertEqual(Article.objects.count(), 30)
+        generated = Article.objects.exclude(id=self.article.id)
+        self.assertEqual(Article.tag_set.through.objects.filter(article__in=generated).values('article').distinct().count(), 29)
+        self.assertEqual(ArticleRank.objects.filter(article__in=generated).values('article').distinct().count(), 29)
+        self.assertIn(generated.first().id, search.search_ids(Article, generated.first().title.split()[0], limit=100))
+
+        # Nothing that already existed was rebuilt
+        self.assertFalse(HabitStats.objects.filter(user=self.existing).exists())
+        self.assertFalse(MoodDay.objects.filter(user=self.existing).exists())
+        self.assertFalse(search.search_ids(JournalEntry, 'Unindexed'))
+        self.assertFalse(self.article.tag_set.exists())
+        self.assertFalse(ArticleRank.objects.filter(article=self.article).exists())
+
+    def test_reruns_reuse_the_catalog_and_repeat_the_history(self):
+        first = self.seed('scale')
+        articles = list(Article.objects.order_by('id').values_list('title', flat=True))
+        second = self.seed('again')
+        self.assertEqual(list(Article.objects.order_by('id').values_list('title', flat=True)), articles)
+        for a, b in zip(first, second):
+            self.assertEqual(
+                list(JournalEntry.objects.filter(user=a).order_by('id').values_list('date', 'timestamp', 'mood', 'content')),
+                list(JournalEntry.objects.filter(user=b).order_by('id').values_list('date', 'timestamp', 'mood', 'content')),
+            )
+        with self.assertRaises(CommandError):
+            self.seed('scale')
@@ -1,6 +1,9 @@
+from django.conf import settings
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import *
+from .async_views import ASYNC_LIST_VIEWS
+from backend.async_api import with_sync_fallback
 
 router = DefaultRouter()
 router.register('discovery_questions', DiscoveryQuestionViewSet, basename='discovery_question')
@@ -13,7 +16,16 @@ router.register('knowledge-hub', KnowledgeHubViewSet, basename='knowledge_hub')
 router.register('articles', ArticleViewSet, basename='article')
 router.register('vision-board', VisionBoardViewSet, basename='vision_board')
 
-urlpatterns = [
+# GET on these list routes is served by the async views instead of the ViewSet
+async_routes = [
+    path(route, with_sync_fallback(view, viewset.as_view({'get': 'list', 'post': 'create'})))
+    for name, (route, view, viewset) in ASYNC_LIST_VIEWS.items()
+    if name in settings.ASYNC_READ_VIEWS
+]
+
+urlpatterns = async_routes + [
     path('', include(router.urls)),
     path('user_responses_api/',generate_questionaire_score),
+    path('dashboard/', dashboard, name='dashboard'),
+    path('sync/', sync_changes, name='sync'),
 ]
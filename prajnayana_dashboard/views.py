@@ -5,42 +5,74 @@ from .models import *
 from .serializers import *
 from django.utils import timezone
 from rest_framework.exceptions import ValidationError
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework import status
-from django.db.models import Q
+from django.db import IntegrityError, transaction
+from django.db.models import Count, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+from .pagination import DashboardCursorPagination, DateCursorPagination, SearchRankCursorPagination, TimestampCursorPagination
+from . import feed, habit_calendar, habit_stats, mood_trends, search, sync, tags
+from .mixins import EagerLoadingMixin, SparseFieldsetMixin
+from .response_cache import CachedResponseMixin
+from authentication_app.models import User
+from authentication_app.serializers import UserSerializer
 
 
 
+def parse_date_param(request, name, default=None):
+    """Read a YYYY-MM-DD query parameter, returning ``default`` when it is absent."""
+    value = request.GET.get(name, None)
+    if not value:
+        return default
+    try:
+        return datetime.datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise ValidationError({name: "Use the YYYY-MM-DD format."})
 
-class DiscoveryQuestionViewSet(viewsets.ModelViewSet):
+
+def filter_articles(articles, request):
+    """Narrow ``articles`` down by the ?k_id= and ?tag= filters of the article list."""
+    category_query = request.GET.get('k_id', '')
+    if category_query:
+        articles = articles.filter(knowledgehub__id=category_query)
+    # Every ?tag= has to match exactly; each one is a join on the indexed tag_set table
+    for name in request.GET.getlist('tag'):
+        articles = articles.filter(tag_set__name=tags.normalize(name))
+    return articles
+
+
+class DiscoveryQuestionViewSet(CachedResponseMixin, SparseFieldsetMixin, EagerLoadingMixin, viewsets.ModelViewSet):
     queryset = DiscoveryQuestion.objects.all()
     serializer_class = DiscoveryQuestionSerializer
     permission_classes = [IsAuthenticated] 
+    cache_models = [DiscoveryQuestion]
+    cache_per_user = False
 
-class TestSessionViewSet(viewsets.ModelViewSet):
+class TestSessionViewSet(CachedResponseMixin, SparseFieldsetMixin, EagerLoadingMixin, viewsets.ModelViewSet):
     serializer_class = TestSessionSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = DashboardCursorPagination
+    # Scores change with the session's responses
+    cache_models = [TestSession, QuestionaireUserResponse, User]
 
     def get_queryset(self):
         return TestSession.objects.filter(user=self.request.user)
     
 
     def perform_create(self, serializer):
-        test_session_exist = TestSession.objects.filter(
-            user=self.request.user,
-            date_taken__date=timezone.now().date() 
-        ).exists()
+        # One session per user per day is enforced by the unique_test_session_per_day constraint
+        try:
+            with transaction.atomic():
+                serializer.save(user=self.request.user)
+        except IntegrityError:
+            raise ValidationError("You already have a test session for today.")
 
-        if test_session_exist:
-            raise ValidationError("You already have a test session for today.")  # Raise error if a session exists
-        
-        # Save the TestSession with the user
-        serializer.save(user=self.request.user) 
-
-class QuestionaireUserResponseViewSet(viewsets.ModelViewSet):
+class QuestionaireUserResponseViewSet(CachedResponseMixin, SparseFieldsetMixin, EagerLoadingMixin, viewsets.ModelViewSet):
     serializer_class = QuestionaireUserResponseSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = DashboardCursorPagination
+    cache_models = [QuestionaireUserResponse, DiscoveryQuestion]
 
     def perform_create(self, serializer):
         test_session_id = self.request.data.get('test_session')
@@ -51,9 +83,10 @@ class QuestionaireUserResponseViewSet(viewsets.ModelViewSet):
         return QuestionaireUserResponse.objects.filter(test_session__user=self.request.user)
     
 
-class HabitsViewSet(viewsets.ModelViewSet):
+class HabitsViewSet(CachedResponseMixin, SparseFieldsetMixin, EagerLoadingMixin, viewsets.ModelViewSet):
     serializer_class = HabitsSerializer
     permission_classes = [IsAuthenticated]
+    cache_models = [Habits, User]
 
     def get_queryset(self):
         return Habits.objects.filter(Q(user=self.request.user) | Q(user__isnull=True)).distinct()
@@ -62,9 +95,11 @@ class HabitsViewSet(viewsets.ModelViewSet):
         serializer.save(user=self.request.user)
 
     
-class HabitTrackingViewSet(viewsets.ModelViewSet):
+class HabitTrackingViewSet(CachedResponseMixin, SparseFieldsetMixin, EagerLoadingMixin, viewsets.ModelViewSet):
     serializer_class = HabitTrackingSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = DateCursorPagination
+    cache_models = [HabitTracking, Habits, User]
 
     def get_queryset(self):
         # filter by date
@@ -75,77 +110,343 @@ class HabitTrackingViewSet(viewsets.ModelViewSet):
         
         return HabitTracking.objects.filter(user=self.request.user)
 
-class JournalEntryViewSet(viewsets.ModelViewSet):
+    def perform_create(self, serializer):
+        # One row per habit and day is enforced by the unique_habit_tracking_per_day constraint
+        try:
+            with transaction.atomic():
+                serializer.save()
+        except IntegrityError:
+            raise ValidationError("This habit is already tracked for that day.")
+
+    def perform_update(self, serializer):
+        self.perform_create(serializer)
+
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        """
+        Check in many habits at once. Takes {"check_ins": [{"habit_id", "date",
+        "is_done"}, ...]} and upserts every row in a single statement.
+        """
+        serializer = HabitCheckInSerializer(data=request.data, context=self.get_serializer_context())
+        serializer.is_valid(raise_exception=True)
+        rows = serializer.save()
+        return Response(HabitTrackingSerializer(rows, many=True).data, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=['get'])
+    def stats(self, request):
+        """
+        Current and longest streak plus 7, 30 and 365 day completion rates for
+        each of the user's habits, read from the HabitStats summaries.
+        Pass ?date=YYYY-MM-DD to evaluate them for the client's local day.
+        """
+        today = parse_date_param(request, 'date', timezone.localdate())
+        habits = Habits.objects.filter(Q(user=request.user) | Q(user__isnull=True)).order_by('id')
+        summaries = {stats.habit_id: stats for stats in HabitStats.objects.filter(user=request.user)}
+
+        return Response([
+            {
+                "habit_id": habit.id,
+                "habit": habit.habit,
+                **habit_stats.summarize(summaries.get(habit.id, HabitStats()), today),
+            }
+            for habit in habits
+        ], status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=['get'])
+    def heatmap(self, request):
+        """
+        Done days for a calendar year, decoded from the HabitCalendar bitmaps.
+        With ?habit= the counts are for that habit, otherwise they add up
+        every habit of the user.
+        """
+        try:
+            year = int(request.GET.get('year') or timezone.localdate().year)
+            habit_id = int(request.GET['habit']) if request.GET.get('habit') else None
+        except ValueError:
+            raise ValidationError("habit and year must be integers.")
+
+        calendars = HabitCalendar.objects.filter(user=request.user, year=year)
+        if habit_id is not None:
+            calendars = calendars.filter(habit_id=habit_id)
+
+        counts = {}
+        for days in calendars.values_list('days', flat=True):
+            for date in habit_calendar.decode(days, year):
+                counts[date] = counts.get(date, 0) + 1
+
+        return Response({
+            "year": year,
+            "habit": habit_id,
+            "total": sum(counts.values()),
+            "days": [{"date": date, "count": counts[date]} for date in sorted(counts)],
+        }, status=status.HTTP_200_OK)
+
+class JournalEntryViewSet(CachedResponseMixin, SparseFieldsetMixin, EagerLoadingMixin, viewsets.ModelViewSet):
     serializer_class = JournalEntrySerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = TimestampCursorPagination
+    cache_models = [JournalEntry, User]
 
     def get_queryset(self):
-        # filter by date
-        search = self.request.GET.get('search', None)
-        if search:
-            search = datetime.datetime.strptime(search, '%Y-%m-%d').date()
-            return JournalEntry.objects.filter(user=self.request.user,date=search).order_by("-timestamp")
-        return JournalEntry.objects.filter(user=self.request.user).order_by("-timestamp")
-    
-class KnowledgeHubViewSet(viewsets.ModelViewSet):
+        """
+        The user's entries, newest first. ?search= is either a YYYY-MM-DD date,
+        for that day's entries, or words the entries must contain; ?mood=,
+        ?date_from= and ?date_to= narrow either down.
+        """
+        entries = self.get_matching_entries()
+        mood = self.request.GET.get('mood')
+        if mood:
+            if mood not in dict(JournalEntry.MOOD_CHOICES):
+                raise ValidationError({"mood": f"Must be one of {', '.join(dict(JournalEntry.MOOD_CHOICES))}."})
+            entries = entries.filter(mood=mood)
+        return entries.order_by("-timestamp")
+
+    def get_matching_entries(self):
+        """The user's entries matching every filter but ?mood=, which the mood counts are broken down by."""
+        request = self.request
+        entries = JournalEntry.objects.filter(user=request.user)
+        query = request.GET.get('search', '').strip()
+        if query:
+            try:
+                entries = entries.filter(date=datetime.datetime.strptime(query, '%Y-%m-%d').date())
+            except ValueError:
+                entries = search.owner_matches(entries, query, request.user.pk, ['content'])
+
+        date_from = parse_date_param(request, 'date_from')
+        if date_from:
+            entries = entries.filter(date__gte=date_from)
+        date_to = parse_date_param(request, 'date_to')
+        if date_to:
+            entries = entries.filter(date__lte=date_to)
+        return entries
+
+    @action(detail=False, methods=['get'], url_path='moods')
+    def mood_counts(self, request):
+        """
+        How many of the entries matching ?search=, ?date_from= and ?date_to=
+        have each mood, so clients can offer the ?mood= filter with counts.
+        """
+        return self.cached_response(self.render_mood_counts, request)
+
+    def render_mood_counts(self, request):
+        counts = dict(self.get_matching_entries().order_by().values_list('mood').annotate(count=Count('id')))
+        return Response({
+            "total": sum(counts.values()),
+            "moods": {mood: counts.get(mood, 0) for mood, _ in JournalEntry.MOOD_CHOICES},
+        }, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=['get'], url_path='mood-trends')
+    def moods_over_time(self, request):
+        """
+        Mood counts, average mood score and its moving average per day, week or
+        month (?granularity=, default day), read from the MoodDay rollup.
+        ?date_from= and ?date_to= (default today) bound the periods and
+        ?window= sets how many periods the moving average spans.
+        """
+        granularity = request.GET.get('granularity') or 'day'
+        if granularity not in mood_trends.GRANULARITIES:
+            raise ValidationError({"granularity": f"Must be one of {', '.join(mood_trends.GRANULARITIES)}."})
+        try:
+            window = int(request.GET.get('window') or mood_trends.DEFAULT_WINDOW[granularity])
+        except ValueError:
+            raise ValidationError({"window": "Must be an integer."})
+        max_window = mood_trends.MAX_WINDOW[granularity]
+        if not 1 <= window <= max_window:
+            raise ValidationError({"window": f"Must be between 1 and {max_window}."})
+
+        date_to = parse_date_param(request, 'date_to', timezone.localdate())
+        last = mood_trends.period_start(date_to, granularity)
+        date_from = parse_date_param(
+            request, 'date_from', mood_trends.shift(last, granularity, 1 - mood_trends.DEFAULT_PERIODS[granularity])
+        )
+        if date_from > date_to:
+            raise ValidationError({"date_from": "Must not be after date_to."})
+        max_periods = mood_trends.MAX_PERIODS[granularity]
+        if mood_trends.shift(mood_trends.period_start(date_from, granularity), granularity, max_periods) <= last:
+            raise ValidationError({"date_from": f"At most {max_periods} periods can be requested."})
+
+        return Response({
+            "granularity": granularity,
+            "date_from": date_from,
+            "date_to": date_to,
+            "window": window,
+            "periods": mood_trends.trends(request.user.pk, granularity, date_from, date_to, window),
+        }, status=status.HTTP_200_OK)
+
+
+class KnowledgeHubViewSet(CachedResponseMixin, SparseFieldsetMixin, EagerLoadingMixin, viewsets.ModelViewSet):
     serializer_class = KnowledgeHubSerializer
     permission_classes = [IsAuthenticated]
+    cache_models = [KnowledgeHub]
+    cache_per_user = False
 
     def get_queryset(self):
-        search = self.request.GET.get('search', None)
-        if search:
-            return KnowledgeHub.objects.filter(title__icontains=search)
+        search_query = self.request.GET.get('search', None)
+        if search_query:
+            return search.search(KnowledgeHub.objects.all(), search_query, ['title', 'content']).order_by('search_rank')
         return KnowledgeHub.objects.filter()
     
-class ArticleViewSet(viewsets.ModelViewSet):
+class ArticleViewSet(CachedResponseMixin, SparseFieldsetMixin, EagerLoadingMixin, viewsets.ModelViewSet):
     serializer_class = ArticleSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = SearchRankCursorPagination
+    cache_models = [Article, KnowledgeHub]
+    cache_per_user = False
+    list_actions = ('list', 'ranked_feed')
 
-    def get_queryset(self):
-        request = self.request
-        search_query = request.GET.get('search', '')
-        category_query = request.GET.get('k_id', '')
+    def get_serializer_class(self):
+        # Lists render the compact card, so article bodies are never read for them
+        if self.action in self.list_actions:
+            return ArticleListSerializer
+        return ArticleSerializer
 
+    def get_queryset(self):
+        search_query = self.request.GET.get('search', '')
         if search_query:
-            return Article.objects.filter(
-                Q(title__icontains=search_query) |
-                Q(summary__icontains=search_query) |
-                Q(content__icontains=search_query) |
-                Q(tags__icontains=search_query)
-            ).distinct()
-
-        if category_query:
-            return Article.objects.filter(knowledgehub__id=category_query)
-        return Article.objects.all()
-    
+            articles = search.search(Article.objects.all(), search_query, ['title', 'summary', 'content', 'tags'])
+        else:
+            articles = Article.objects.all()
+        return filter_articles(articles, self.request)
 
-class VisionBoardViewSet(viewsets.ModelViewSet):
+    @action(detail=False, methods=['get'], url_path='feed')
+    def ranked_feed(self, request):
+        """
+        Articles ranked for the requesting user by how well their level and
+        their hub's level match the user's, then by recency, leaving out the
+        articles they have marked seen. ?k_id= limits the feed to one hub.
+        Not cached, as it changes with every article the user sees.
+        """
+        hub_id = request.GET.get('k_id')
+        if hub_id:
+            try:
+                hub_id = int(hub_id)
+            except ValueError:
+                raise ValidationError({"k_id": "Must be an integer."})
+        articles = self.filter_queryset(feed.feed(request.user, hub_id or None))
+        page = self.paginate_queryset(articles)
+        return self.get_paginated_response(self.get_serializer(page, many=True).data)
+
+    @action(detail=True, methods=['post'])
+    def seen(self, request, pk=None):
+        """Mark the article seen by the requesting user, which drops it from their feed."""
+        article = self.get_object()
+        feed.mark_seen(request.user, [article.id])
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    @action(detail=False, methods=['get'], url_path='tags')
+    def tag_facets(self, request):
+        """
+        Tags in use, most used first, with their article count overall and in
+        each knowledge hub, read from the precomputed counts. With ?k_id= only
+        that hub's counts are returned.
+        """
+        return self.cached_response(self.render_tag_facets, request)
+
+    def render_tag_facets(self, request):
+        hub_id = request.GET.get('k_id')
+        if hub_id:
+            try:
+                hub_id = int(hub_id)
+            except ValueError:
+                raise ValidationError({"k_id": "Must be an integer."})
+            counts = TagCount.objects.filter(knowledgehub_id=hub_id).order_by('-count', 'tag__name')
+            return Response({
+                "knowledgehub": hub_id,
+                "tags": [{"name": name, "count": count} for name, count in counts.values_list('tag__name', 'count')],
+            }, status=status.HTTP_200_OK)
+
+        by_hub = {}
+        for tag_id, knowledgehub_id, count in TagCount.objects.order_by('-count', 'knowledgehub_id').values_list(
+            'tag_id', 'knowledgehub_id', 'count'
+        ):
+            by_hub.setdefault(tag_id, []).append({"knowledgehub": knowledgehub_id, "count": count})
+        return Response({
+            "tags": [
+                {"name": tag.name, "count": tag.article_count, "knowledgehubs": by_hub.get(tag.id, [])}
+                for tag in Tag.objects.filter(article_count__gt=0).order_by('-article_count', 'name')
+            ],
+        }, status=status.HTTP_200_OK)
+
+
+class VisionBoardViewSet(CachedResponseMixin, SparseFieldsetMixin, EagerLoadingMixin, viewsets.ModelViewSet):
     serializer_class = VisionBoardSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = DashboardCursorPagination
+    cache_models = [VisionBoard, User]
 
     def get_queryset(self):
         return VisionBoard.objects.filter(user=self.request.user)
     
 
 
-   
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def generate_questionaire_score(request):
+    """
+    Submit a whole questionnaire in one request. Creates a new test session
+    (or adds to the user's `test_session` when given), stores every response
+    with a single bulk upsert and returns the scored session.
+    """
+    serializer = QuestionaireSubmissionSerializer(data=request.data, context={'request': request})
+    serializer.is_valid(raise_exception=True)
+    test_session = serializer.save()
+    return Response({
+        "message": "Questionaire score generated successfully",
+        "test_session": TestSessionSerializer(test_session).data,
+    }, status=status.HTTP_201_CREATED)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def dashboard(request):
+    """
+    Everything the home screen needs in one response: today's habits with
+    their completion state, today's journal entries, favorite vision board
+    items, the latest test session and the user's profile. Pass ?date=YYYY-MM-DD
+    to use the client's local day instead of the server's.
+    """
     user = request.user
-    print(request.data)
-    time_taken = timezone.datetime
-    test_session = TestSession.objects.create(user=user,date_taken=time_taken,score=0)
-    user_responses=[]
-    for res in request.data['responses']:
-        # question=DiscoveryQuestion.objects.
-        user_responses.append(QuestionaireUserResponse(test_session=test_session,question_id=res['question_id'],selected_option=res['selected_option']))
-        test_session.score+=res['selected_option']+1
-    test_session.save()
-    #bulk create user responses
-    QuestionaireUserResponse.objects.bulk_create(user_responses)
-    print("UserResponses Created",test_session,user_responses)
-    return Response({"message": "Questionaire score generated successfully"}, status=status.HTTP_201_CREATED)
+    today = parse_date_param(request, 'date', timezone.localdate())
 
+    todays_tracking = HabitTracking.objects.filter(habit=OuterRef('pk'), user=user, date=today).order_by('-id')
+    habits = (
+        Habits.objects.filter(Q(user=user) | Q(user__isnull=True))
+        .select_related('user')
+        .annotate(
+            tracking_id=Subquery(todays_tracking.values('id')[:1]),
+            is_done=Coalesce(Subquery(todays_tracking.values('is_done')[:1]), Value(False)),
+        )
+        .order_by('id')
+    )
+    journal = JournalEntry.objects.filter(user=user, date=today).select_related('user').order_by('-timestamp')
+    favorites = VisionBoard.objects.filter(user=user, favorite=True).select_related('user').order_by('-id')
+    latest_test = TestSession.objects.filter(user=user).select_related('user').order_by('-date_taken', '-id').first()
 
+    return Response({
+        "date": today,
+        "habits": DashboardHabitSerializer(habits, many=True).data,
+        "journal": JournalEntrySerializer(journal, many=True).data,
+        "vision_board": VisionBoardSerializer(favorites, many=True).data,
+        "latest_test": TestSessionSerializer(latest_test).data if latest_test else None,
+        "user": UserSerializer(user).data,
+    }, status=status.HTTP_200_OK)
+
+
+@api_view(['GET', 'POST'])
+@permission_classes([IsAuthenticated])
+def sync_changes(request):
+    """
+    Offline sync. GET ?since=<token> returns journal, habit, habit tracking and
+    vision board rows created, updated or deleted after the token, with the
+    token to send next time; keep pulling while has_more is true. POST
+    {"mutations": [{"collection", "op", "id", "client_id", "data"}, ...]}
+    applies client changes in one transaction; resending a mutation with the
+    same client_id updates the row it created.
+    """
+    if request.method == 'GET':
+        since = sync.parse_token(request.GET.get('since'))
+        return Response(sync.pull(request, since), status=status.HTTP_200_OK)
 
+    serializer = SyncPushSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    return Response(sync.push(request, serializer.validated_data['mutations']), status=status.HTTP_200_OK)